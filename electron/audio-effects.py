@@ -2,11 +2,48 @@
 """
 Voice of God - Divine Audio Effects
 
-Applies cathedral-like audio effects to TTS output using Spotify's Pedalboard library.
+Applies cathedral-like audio effects to TTS output using Spotify's Pedalboard library,
+or built-in NumPy versions of the same effects when Pedalboard isn't installed.
 Effects chain: Pitch Shift -> Reverb -> Delay/Echo -> Chorus
 
 Usage:
-    python audio-effects.py <input.wav> <output.wav> '<settings_json>'
+    python audio-effects.py <input.wav> <output.wav> '<settings_json>' [--timings | --metrics-file metrics.jsonl]
+    python audio-effects.py --server [--render-cache [DIR]] [--stage-cache-mb 64]
+    python audio-effects.py --cache-stats [--render-cache DIR]
+    python audio-effects.py --probe [--verify]
+    python audio-effects.py --calibrate [--rate 22050] [--channels 1] [--settings '<settings_json>']
+    python audio-effects.py <input.wav> 'out-{name}.wav' '[{"name": "a", ...settings}, {"name": "b", ...}]'
+    python audio-effects.py --batch manifest.json [--workers N] [--settings '<defaults_json>']
+    piper --output_raw ... | python audio-effects.py --stream --rate 22050 '<settings_json>' | aplay -r 22050 -f S16_LE -c 1
+
+Server mode keeps the interpreter, libraries and effect chain warm between
+utterances. It reads one JSON job per line on stdin and answers with JSON
+lines on stdout (logs stay on stderr):
+
+    -> {"id": "job-1", "input": "in.wav", "output": "out.wav", "settings": {...}}
+    <- {"id": "job-1", "status": "accepted"}
+    <- {"id": "job-1", "status": "done", "output": "out.wav", "elapsedMs": 41.7, "timings": {...}}
+    <- {"id": "job-1", "status": "error", "message": "..."}
+
+A job may carry "presets" (a list like the multi-preset settings array, each
+entry with its own "output" or named from the job's "output" template) instead
+of "settings"; the reply then lists "outputs" and how many stages were shared.
+
+Stage outputs (pitch-shifted stem, reverb, ..., pre-gain mix and its peak)
+are kept in memory for the latest input (--stage-cache-mb), so re-rendering
+the same clip with one setting changed only re-runs the stages after it; a
+volume change is a single multiply. Replies report "stagesReused", and
+"envelope" (the sidecar path) for jobs whose settings ask for one.
+
+Control messages: {"cmd": "ping"} -> {"status": "pong"},
+{"cmd": "stats"} -> {"status": "stats", "chainCache": {...}}, {"cmd": "shutdown"}.
+The server announces itself with {"status": "ready", ...} once imports are done.
+
+Timing records ("timings" in replies, --timings, --metrics-file) look like:
+
+    {"path": "whole", "totalMs": 48.2, "audioSeconds": 3.1, "rtf": 0.0155,
+     "stages": {"decode": 0.4, "pitch": 12.9, "chainSetup": 0.1, "board": 33.0, "normalize": 0.3, "encode": 1.1},
+     "effects": [{"effect": "Reverb", "ms": 21.7}, {"effect": "Delay", "ms": 3.2}, ...]}
 
 Settings JSON format:
 {
@@ -20,34 +57,279 @@ Settings JSON format:
     "chorusEnabled": true, // Enable chorus effect
     "chorusRate": 0.4,     // Chorus LFO rate in Hz
     "chorusDepth": 0.25,   // Chorus depth 0-1
-    "chorusMix": 0.2       // Chorus mix level 0-1
+    "chorusMix": 0.2,      // Chorus mix level 0-1
+    "pitchEngine": "auto", // "auto", "pedalboard" (PitchShift), "vocoder" or "resample"
+    "dspEngine": "auto",   // "auto" (pedalboard if installed), "pedalboard", "numpy" or
+                           // "convolution" (reverb + echo as one cached impulse response)
+    "inputFormat": "auto", // "auto" (WAV header, else s16le), "wav", "s16le" or "f32le"
+    "inputSampleRate": 22050, "inputChannels": 1,  // Raw input only
+    "outputFormat": "wav", // "wav", "s16le" or "f32le"
+    "trimSilence": false,  // Drop leading silence, shorten pauses to maxPauseMs and trailing
+                           // silence to the reverb tail (whole-clip renders, not block/stream)
+    "silenceDb": -45,      // Silence threshold, relative to the loudest 20ms frame
+    "maxPauseMs": 400,     // Longest pause kept when trimming
+    "reverbHalfRate": false,  // Reverb wet path at half the sample rate (cheaper, duller)
+    "quality": "auto",     // "full", "balanced" (vocoder pitch), "fast" (vocoder, half-rate
+                           // reverb, no chorus) or "auto": the best tier whose predicted
+                           // render time on this machine fits latencyBudgetMs ("full"
+                           // until the server or --calibrate has measured the tiers)
+    "latencyBudgetMs": 1500,  // Render time budget for "auto" (none = always "full")
+    "lowMemory": "auto",   // Block-wise bounded-memory path: true, false or "auto" (clips >= 60s
+                           // on single-core machines)
+    "parallel": "auto",    // Split at pauses and render segments in worker processes: true,
+                           // false, a worker count or "auto" (clips >= 20s, more than one core)
+    "envelope": false      // Also write per-20ms RMS/peak frames of the output for UI animation:
+                           // true/"json" (out.envelope.json) or "f16" (out.envelope.f16)
 }
+
+A JSON array of settings renders every preset from one decode; presets that
+start with the same stages (pitch shift, reverb, ...) share them.
+
+Either path may be '-' to read audio bytes from stdin / write them to stdout,
+so Piper -> effects -> player can be a pipe with no temp files:
+
+    piper --output_raw ... | python audio-effects.py - - '{"inputFormat": "s16le", "outputFormat": "s16le"}' | aplay -r 22050 -f S16_LE -c 1
 """
 
+import os
 import sys
 import json
-import numpy as np
+import io
+import time
+import wave
+import shutil
+import hashlib
+import argparse
+import queue
+import threading
+import importlib.util
+import atexit
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def lazy_import(name):
+    """
+    Bind a module now but only execute it on first attribute access, so
+    --probe, --cache-stats and usage errors start without loading numpy.
+    Returns None when the module isn't installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+np = lazy_import('numpy')
+
+# pedalboard is imported on first use by load_pedalboard()
+PEDALBOARD_AVAILABLE = None
+PITCH_SHIFT_AVAILABLE = None
+Pedalboard = AudioFile = PitchShift = None
+
+
+def load_pedalboard():
+    """Import pedalboard the first time it's needed. Returns PEDALBOARD_AVAILABLE."""
+    global PEDALBOARD_AVAILABLE, PITCH_SHIFT_AVAILABLE, Pedalboard, AudioFile, PitchShift
+    if PEDALBOARD_AVAILABLE is None:
+        try:
+            from pedalboard import Pedalboard
+            from pedalboard.io import AudioFile
+            PEDALBOARD_AVAILABLE = True
+        except ImportError:
+            PEDALBOARD_AVAILABLE = False
+            print("Pedalboard not installed, using the built-in NumPy effects. Install with: pip install pedalboard", file=sys.stderr)
+
+        # Try to import PitchShift (may not be available in all versions)
+        try:
+            from pedalboard import PitchShift
+            PITCH_SHIFT_AVAILABLE = True
+        except ImportError:
+            PITCH_SHIFT_AVAILABLE = False
+    return PEDALBOARD_AVAILABLE
+
+
+def pitch_shift_available():
+    return load_pedalboard() and PITCH_SHIFT_AVAILABLE
+
+
+class PhaseVocoderPitchShifter:
+    """
+    Duration-preserving pitch shifter (phase vocoder with spectral bin shifting).
+
+    All channels are processed together: frames are batched into one
+    (channels, frames, bins) FFT, only the peak-locked phase update steps
+    frame by frame, and overlap-add is a few slice additions. Working memory is
+    bounded by max_batch frames, independent of clip length. Output lags input
+    by roughly one frame; flush() returns the rest.
+    """
+
+    def __init__(self, sample_rate, num_channels, semitones, frame_size=None, overlap=4, max_batch=64):
+        if frame_size is None:
+            # ~46ms frames: 1024 at 22.05kHz, 2048 at 44.1/48kHz
+            frame_size = 1 << int(round(np.log2(sample_rate * 0.046)))
+        self.frame_size = frame_size
+        self.overlap = overlap
+        self.hop = frame_size // overlap
+        self.max_batch = max_batch
+        self.ratio = 2.0 ** (semitones / 12.0)
+
+        n = np.arange(frame_size)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * n / frame_size)).astype(np.float32)
+        # Analysis * synthesis window overlap-adds to sum(w^2) / hop
+        self.synthesis_window = self.window * (self.hop / float(np.sum(self.window ** 2)))
+
+        bins = frame_size // 2 + 1
+        self.expected = 2 * np.pi * self.hop * np.arange(bins) / frame_size
+
+        self.prev_phase = np.zeros((num_channels, bins))
+        self.synth_phase = np.zeros((num_channels, bins))
+        # Prime with silence so the first input sample sits under a full frame
+        self.buffer = np.zeros((num_channels, frame_size - self.hop), dtype=np.float32)
+        self.carry = np.zeros((num_channels, overlap - 1, self.hop), dtype=np.float32)
+        self.to_skip = frame_size - self.hop
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def _process_frames(self, buf, n_frames):
+        channels = buf.shape[0]
+        frames = np.lib.stride_tricks.sliding_window_view(buf, self.frame_size, axis=1)[:, ::self.hop][:, :n_frames]
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)
+        magnitude = np.abs(spectrum)
+        phase = np.angle(spectrum)
 
-try:
-    from pedalboard import Pedalboard, Reverb, Delay, Chorus, Gain
-    from pedalboard.io import AudioFile
-    PEDALBOARD_AVAILABLE = True
-except ImportError:
-    PEDALBOARD_AVAILABLE = False
-    print("Pedalboard not installed. Install with: pip install pedalboard", file=sys.stderr)
+        # True frequency of each bin, expressed as phase advance per hop
+        previous = np.concatenate([self.prev_phase[:, None, :], phase[:, :-1, :]], axis=1)
+        self.prev_phase = phase[:, -1, :]
+        deviation = phase - previous - self.expected
+        deviation -= 2 * np.pi * np.round(deviation / (2 * np.pi))
+        advance = self.expected + deviation
 
-# Try to import PitchShift (may not be available in all versions)
-try:
-    from pedalboard import PitchShift
-    PITCH_SHIFT_AVAILABLE = True
-except ImportError:
-    PITCH_SHIFT_AVAILABLE = False
+        # Shift whole peak regions by a whole number of bins (Laroche-Dolson):
+        # every bin moves with its nearest spectral peak, so the bins that make
+        # up one partial keep their relative phase and don't cancel
+        bins = np.arange(magnitude.shape[-1])
+        peaks = np.zeros(magnitude.shape, dtype=bool)
+        peaks[..., 1:-1] = (magnitude[..., 1:-1] > magnitude[..., :-2]) & (magnitude[..., 1:-1] >= magnitude[..., 2:])
+        before = np.maximum.accumulate(np.where(peaks, bins, -1), axis=-1)
+        after = np.minimum.accumulate(np.where(peaks, bins, bins.size)[..., ::-1], axis=-1)[..., ::-1]
+        nearest = np.where(bins - before <= after - bins, before, after)
+        nearest = np.where((nearest < 0) | (nearest >= bins.size), bins, nearest)
+
+        shift = np.round(nearest * self.ratio).astype(np.int64) - nearest
+        target = bins + shift
+        target = np.where((target >= 0) & (target < bins.size), target, bins.size)  # bins.size = dropped
+        peak_target = np.minimum(nearest + shift, bins.size - 1)
+        peak_advance = np.take_along_axis(advance, nearest, axis=-1) * self.ratio
+        offset = phase - np.take_along_axis(phase, nearest, axis=-1)
+
+        shifted = np.zeros(magnitude.shape[:-1] + (bins.size + 1,))
+        np.put_along_axis(shifted, target, magnitude, axis=-1)
+        magnitude = shifted[..., :-1]
+
+        # The phase update is the only sequential step; flatten (channel, bin)
+        # indices per frame so each step is two fancy-index operations
+        channel = np.arange(channels)[:, None, None]
+        target_flat = (target + channel * (bins.size + 1)).transpose(1, 0, 2).reshape(n_frames, -1)
+        peak_flat = (peak_target + channel * bins.size).transpose(1, 0, 2).reshape(n_frames, -1)
+        rotation = (peak_advance + offset).transpose(1, 0, 2).reshape(n_frames, -1)
+
+        synth_phase = np.empty(magnitude.shape)
+        current = self.synth_phase
+        for f in range(n_frames):
+            # Empty target bins free-run; occupied ones follow their peak
+            rotated = np.empty((channels, bins.size + 1))
+            rotated[:, :-1] = current + self.expected
+            rotated.ravel()[target_flat[f]] = current.ravel()[peak_flat[f]] + rotation[f]
+            current = rotated[:, :-1]
+            synth_phase[:, f] = current
+        self.synth_phase = np.mod(current, 2 * np.pi)
+
+        frames_out = np.fft.irfft(magnitude * np.exp(1j * synth_phase), n=self.frame_size, axis=-1)
+        frames_out = (frames_out * self.synthesis_window).astype(np.float32)
+
+        # Overlap-add: part k of frame f lands in output hop f + k
+        parts = frames_out.reshape(channels, n_frames, self.overlap, self.hop)
+        out = np.zeros((channels, n_frames + self.overlap - 1, self.hop), dtype=np.float32)
+        out[:, :self.overlap - 1] += self.carry
+        for k in range(self.overlap):
+            out[:, k:k + n_frames] += parts[:, :, k]
+        self.carry = out[:, n_frames:].copy()
+        return out[:, :n_frames].reshape(channels, -1)
+
+    def process(self, block):
+        """Feed a (channels, frames) block, returns whatever shifted audio is ready"""
+        self.frames_in += block.shape[1]
+        buf = np.concatenate([self.buffer, block.astype(np.float32, copy=False)], axis=1)
+
+        outputs = []
+        start = 0
+        while buf.shape[1] - start >= self.frame_size:
+            n_frames = min(self.max_batch, (buf.shape[1] - start - self.frame_size) // self.hop + 1)
+            end = start + (n_frames - 1) * self.hop + self.frame_size
+            outputs.append(self._process_frames(buf[:, start:end], n_frames))
+            start += n_frames * self.hop
+        self.buffer = buf[:, start:]
+
+        out = np.concatenate(outputs, axis=1) if outputs else buf[:, :0]
+        if self.to_skip:
+            skip = min(self.to_skip, out.shape[1])
+            out = out[:, skip:]
+            self.to_skip -= skip
+        self.frames_out += out.shape[1]
+        return out
+
+    def flush(self):
+        """Push the remaining input out with silence"""
+        remaining = self.frames_in - self.frames_out
+        if remaining <= 0:
+            return self.buffer[:, :0]
+        padding = np.zeros((self.buffer.shape[0], remaining + self.frame_size), dtype=np.float32)
+        frames_in = self.frames_in
+        out = self.process(padding)[:, :remaining]
+        self.frames_in = frames_in
+        self.frames_out = frames_in
+        return out
 
 
 def apply_pitch_shift_manual(audio, sample_rate, semitones):
     """
-    Simple pitch shift using resampling (fallback if PitchShift not available).
-    Not as high quality as proper pitch shifting but works.
+    Pitch shift without the PitchShift plugin (pitchEngine "vocoder").
+    Keeps duration; the input is fed through PhaseVocoderPitchShifter in
+    fixed-size chunks so working memory doesn't grow with clip length.
+    """
+    if semitones == 0:
+        return audio
+
+    mono = audio.ndim == 1
+    audio = audio[None, :] if mono else audio
+    shifter = PhaseVocoderPitchShifter(sample_rate, audio.shape[0], semitones)
+    shifted = np.empty(audio.shape, dtype=np.float32)
+
+    step = shifter.max_batch * shifter.hop
+    pos = 0
+    for start in range(0, audio.shape[1], step):
+        chunk = shifter.process(audio[:, start:start + step])
+        shifted[:, pos:pos + chunk.shape[1]] = chunk
+        pos += chunk.shape[1]
+    tail = shifter.flush()
+    shifted[:, pos:pos + tail.shape[1]] = tail
+
+    return shifted[0] if mono else shifted
+
+
+def apply_pitch_shift_resample(audio, sample_rate, semitones):
+    """
+    Legacy pitch shift using scipy resampling (pitchEngine "resample").
+    Changes duration along with pitch and runs a full-length FFT per channel;
+    kept for comparison benchmarks. Use apply_pitch_shift_manual instead.
     """
     if semitones == 0:
         return audio
@@ -73,56 +355,909 @@ def apply_pitch_shift_manual(audio, sample_rate, semitones):
     return resampled.astype(np.float32)
 
 
-def apply_divine_effects(input_path, output_path, settings):
+# ---------------------------------------------------------------------------
+# Pure-NumPy effects (used when pedalboard is missing, or "dspEngine": "numpy")
+# ---------------------------------------------------------------------------
+
+class NumpyPlugin:
     """
-    Apply divine audio effects to transform normal TTS into godly voice.
+    Base for the pure-NumPy effects used when pedalboard is missing.
+
+    Plugins are called like pedalboard plugins - plugin(audio, sample_rate,
+    reset=True) on (channels, frames) or 1-D float audio - and keep their
+    state between calls with reset=False, so they also run block-wise. State
+    is rebuilt for each new sample rate or channel count; long inputs are
+    processed in chunks of max_chunk frames to bound working memory.
+    Constructor parameters are kept in self.params.
     """
-    if not PEDALBOARD_AVAILABLE:
-        print("Pedalboard not available, copying input to output", file=sys.stderr)
-        import shutil
-        shutil.copy(input_path, output_path)
-        return
 
-    # Load audio file
-    with AudioFile(input_path) as f:
-        audio = f.read(f.frames)
-        sample_rate = f.samplerate
-        num_channels = f.num_channels
+    max_chunk = 16384
 
-    print(f"[Divine Effects] Loaded audio: {sample_rate}Hz, {num_channels} channels", file=sys.stderr)
+    def __init__(self, **params):
+        self.params = params
+        self._config = None
 
-    # Build the effects chain
-    effects = []
+    def reset(self):
+        self._config = None
 
-    # 1. Pitch Shift (make voice deeper)
-    pitch_semitones = settings.get('pitch', -2)
-    if pitch_semitones != 0:
-        if PITCH_SHIFT_AVAILABLE:
-            effects.append(PitchShift(semitones=pitch_semitones))
-            print(f"[Divine Effects] Pitch shift: {pitch_semitones} semitones", file=sys.stderr)
+    def _prepare(self, sample_rate, num_channels):
+        raise NotImplementedError
+
+    def _process(self, audio):
+        raise NotImplementedError
+
+    def __call__(self, audio, sample_rate, reset=True):
+        audio = np.asarray(audio, dtype=np.float32)
+        mono = audio.ndim == 1
+        if mono:
+            audio = audio[None, :]
+        config = (sample_rate, audio.shape[0])
+        if reset or self._config != config:
+            self._prepare(sample_rate, audio.shape[0])
+            self._config = config
+
+        out = np.empty(audio.shape, dtype=np.float32)
+        for start in range(0, audio.shape[1], self.max_chunk):
+            out[:, start:start + self.max_chunk] = self._process(audio[:, start:start + self.max_chunk])
+        return out[0] if mono else out
+
+
+class NumpyReverb(NumpyPlugin):
+    """
+    Freeverb as implemented by juce::Reverb (what pedalboard.Reverb wraps):
+    8 damped feedback combs per channel in parallel, then 4 allpasses in series.
+
+    A comb's output for the next `delay` samples is already in its buffer, so
+    every comb of every channel advances together in blocks of the shortest
+    comb delay using whole-block array operations. The one-pole damping
+    filter inside a block is expanded as a short doubling product. Allpasses
+    (g = 0.5) have no feedback through other stages, so each is applied as a
+    truncated sparse FIR with 32 taps (0.5 ** 32 residual).
+    """
+
+    COMB_TUNINGS = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)  # samples at 44.1kHz
+    ALLPASS_TUNINGS = (556, 441, 341, 225)
+    STEREO_SPREAD = 23
+    ALLPASS_STAGES = 5  # 2 ** 5 FIR taps
+
+    def __init__(self, room_size=0.5, damping=0.5, wet_level=0.33, dry_level=0.4, width=1.0):
+        super().__init__(room_size=room_size, damping=damping, wet_level=wet_level, dry_level=dry_level, width=width)
+        self.feedback = room_size * 0.28 + 0.7
+        self.damp = damping * 0.4
+        wet = wet_level * 3.0
+        self.wet1 = 0.5 * wet * (1.0 + width)
+        self.wet2 = 0.5 * wet * (1.0 - width)
+        self.dry = dry_level * 2.0
+        self.input_gain = 0.015
+
+    def _prepare(self, sample_rate, num_channels):
+        if num_channels > 2:
+            raise ValueError("Reverb supports mono or stereo audio")
+        rate = int(sample_rate)
+        spreads = (0, self.STEREO_SPREAD)[:num_channels]
+        self.comb_delays = np.array([rate * (t + s) // 44100 for s in spreads for t in self.COMB_TUNINGS])
+        self.allpass_delays = [[rate * (t + s) // 44100 for t in self.ALLPASS_TUNINGS] for s in spreads]
+
+        n_combs = self.comb_delays.size
+        self.block = int(self.comb_delays.min())
+        self.comb_history = np.zeros((n_combs, int(self.comb_delays.max())), dtype=np.float32)
+        self.comb_last = np.zeros(n_combs, dtype=np.float32)
+        self.allpass_history = [[np.zeros(d << self.ALLPASS_STAGES, dtype=np.float32) for d in row]
+                                for row in self.allpass_delays]
+
+        # Tables for the block loop: gather offsets into the comb buffers, the
+        # decay of the damping filter's state across a block, and the
+        # doubling stages (shift, coefficient) until the taps fall below 1e-7
+        self.comb_offsets = (self.comb_history.shape[1] - self.comb_delays)[:, None] + np.arange(self.block)
+        self.comb_rows = np.arange(n_combs)[:, None]
+        self.damp_decay = (self.damp ** np.arange(1, self.block + 1)).astype(np.float32)
+        self.damp_stages = []
+        shift = 1
+        while shift < self.block and self.damp ** shift > 1e-7:
+            self.damp_stages.append((shift, np.float32(self.damp ** shift)))
+            shift *= 2
+
+    def _process(self, audio):
+        channels, n = audio.shape
+        comb_input = (audio[0] + audio[1] if channels == 2 else audio[0]) * self.input_gain
+
+        # Comb bank: buffer = history followed by this chunk's comb inputs
+        history = self.comb_history.shape[1]
+        buffer = np.empty((self.comb_delays.size, history + n), dtype=np.float32)
+        buffer[:, :history] = self.comb_history
+        comb_out = np.empty((self.comb_delays.size, n), dtype=np.float32)
+        last = self.comb_last
+        for start in range(0, n, self.block):
+            length = min(self.block, n - start)
+            out = buffer[self.comb_rows, self.comb_offsets[:, :length] + start]
+            comb_out[:, start:start + length] = out
+            damped = out * (1.0 - self.damp)
+            for shift, coeff in self.damp_stages:
+                if shift < length:
+                    damped[:, shift:] += coeff * damped[:, :-shift]
+            damped += self.damp_decay[:length] * last[:, None]
+            last = damped[:, -1]
+            buffer[:, history + start:history + start + length] = comb_input[start:start + length] + self.feedback * damped
+        self.comb_last = last
+        self.comb_history = buffer[:, -history:].copy()
+
+        wet = comb_out.reshape(channels, len(self.COMB_TUNINGS), n).sum(axis=1)
+        for ch in range(channels):
+            signal = wet[ch]
+            for i, delay in enumerate(self.allpass_delays[ch]):
+                span = delay << self.ALLPASS_STAGES
+                extended = np.concatenate([self.allpass_history[ch][i], signal])
+                self.allpass_history[ch][i] = extended[-span:]
+                buffered = extended.copy()
+                for stage in range(self.ALLPASS_STAGES):
+                    shift = delay << stage
+                    buffered[shift:] += np.float32(0.5 ** (1 << stage)) * buffered[:-shift]
+                signal = buffered[span - delay:span - delay + n] - signal
+            wet[ch] = signal
+
+        if channels == 2:
+            return np.stack([
+                wet[0] * self.wet1 + wet[1] * self.wet2 + audio[0] * self.dry,
+                wet[1] * self.wet1 + wet[0] * self.wet2 + audio[1] * self.dry,
+            ])
+        return wet * self.wet1 + audio * self.dry
+
+
+class NumpyDelay(NumpyPlugin):
+    """Feedback delay matching pedalboard.Delay; runs in blocks of the delay length"""
+
+    def __init__(self, delay_seconds=0.5, feedback=0.0, mix=0.5):
+        super().__init__(delay_seconds=delay_seconds, feedback=feedback, mix=mix)
+        self.delay_seconds = delay_seconds
+        self.feedback = feedback
+        self.mix = mix
+
+    def _prepare(self, sample_rate, num_channels):
+        # pedalboard keeps the delay as float32 and truncates it to whole samples
+        self.delay = max(1, int(float(np.float32(self.delay_seconds)) * sample_rate))
+        self.history = np.zeros((num_channels, self.delay), dtype=np.float32)
+
+    def _process(self, audio):
+        channels, n = audio.shape
+        delay = self.delay
+        buffer = np.empty((channels, delay + n), dtype=np.float32)
+        buffer[:, :delay] = self.history
+        for start in range(0, n, delay):
+            end = min(n, start + delay)
+            buffer[:, delay + start:delay + end] = audio[:, start:end] + self.feedback * buffer[:, start:end]
+        self.history = buffer[:, -delay:].copy()
+        return audio * (1.0 - self.mix) + buffer[:, :n] * self.mix
+
+
+class NumpyChorus(NumpyPlugin):
+    """
+    LFO chorus matching juce::dsp::Chorus (pedalboard.Chorus): a linearly
+    interpolated modulated delay with negative feedback, mixed linearly.
+
+    JUCE's oscillator advances a float32 phase, and the rounding of each add
+    lets it drift from the exact LFO (about 3e-3 rad after 10s at 0.4Hz, a
+    fifth of a sample of delay, which is audible in the high end), so the
+    phase is accumulated the same way rather than computed. Blocks are no
+    longer than the shortest delay, so they only read samples written by
+    earlier blocks.
+    """
+
+    MAX_MODULATION_MS = 20.0
+
+    def __init__(self, rate_hz=1.0, depth=0.25, centre_delay_ms=7.0, feedback=0.0, mix=0.5):
+        super().__init__(rate_hz=rate_hz, depth=depth, centre_delay_ms=centre_delay_ms, feedback=feedback, mix=mix)
+        self.rate_hz = rate_hz
+        self.depth = depth
+        self.centre_delay_ms = centre_delay_ms
+        self.feedback = feedback
+        self.mix = mix
+
+    def _prepare(self, sample_rate, num_channels):
+        self.sample_rate = np.float32(sample_rate)
+        self.increment = np.float32(2 * np.pi) * np.float32(self.rate_hz) / self.sample_rate
+        self.phase = np.float32(0.0)
+        self.modulation = np.float32(self.MAX_MODULATION_MS) * np.float32(self.depth * 0.5)
+        shortest = max(1.0, self.centre_delay_ms - self.modulation) * sample_rate / 1000.0
+        longest = max(1.0, self.centre_delay_ms + self.modulation) * sample_rate / 1000.0
+        self.block = max(1, int(shortest) - 1)
+        self.history = np.zeros((num_channels, int(np.ceil(longest)) + 2), dtype=np.float32)
+        self.last_output = np.zeros(num_channels, dtype=np.float32)
+
+    def _lfo_phases(self, n):
+        """The next n oscillator phases, accumulated and wrapped in float32 like juce::dsp::Phase"""
+        two_pi = np.float32(2 * np.pi)
+        phases = np.empty(n, dtype=np.float32)
+        done = 0
+        while done < n:
+            steps = np.full(n - done + 1, self.increment, dtype=np.float32)
+            steps[0] = self.phase
+            run = np.add.accumulate(steps)  # one float32 add per sample, in order
+            wrap = int(np.searchsorted(run, two_pi))
+            if wrap > n - done:
+                phases[done:] = run[:-1]
+                self.phase = run[-1]
+                break
+            phases[done:done + wrap] = run[:wrap]
+            done += wrap
+            self.phase = run[wrap] - two_pi
+        return phases
+
+    def _process(self, audio):
+        channels, n = audio.shape
+        history = self.history.shape[1]
+        buffer = np.empty((channels, history + n), dtype=np.float32)
+        buffer[:, :history] = self.history
+
+        lfo = np.sin(self._lfo_phases(n) - np.float32(np.pi))
+        delay_ms = np.maximum(np.float32(1.0), self.modulation * lfo + np.float32(self.centre_delay_ms))
+        delays = delay_ms * self.sample_rate / np.float32(1000.0)
+        whole = np.floor(delays).astype(np.int64)
+        frac = delays - whole.astype(np.float32)
+        index = history + np.arange(n) - whole
+
+        wet = np.empty((channels, n), dtype=np.float32)
+        last = self.last_output
+        for start in range(0, n, self.block):
+            end = min(n, start + self.block)
+            newer = buffer[:, index[start:end]]
+            older = buffer[:, index[start:end] - 1]
+            out = newer + frac[start:end] * (older - newer)
+            wet[:, start:end] = out
+            previous = np.concatenate([last[:, None], out[:, :-1]], axis=1)
+            buffer[:, history + start:history + end] = audio[:, start:end] - self.feedback * previous
+            last = out[:, -1]
+        self.last_output = last
+        self.history = buffer[:, -history:].copy()
+        return audio * (1.0 - self.mix) + wet * self.mix
+
+
+class NumpyGain(NumpyPlugin):
+    def __init__(self, gain_db=0.0):
+        super().__init__(gain_db=gain_db)
+        self.gain = np.float32(10.0 ** (gain_db / 20.0))
+
+    def _prepare(self, sample_rate, num_channels):
+        pass
+
+    def _process(self, audio):
+        return audio * self.gain
+
+
+class HalfRateReverb(NumpyPlugin):
+    """
+    Reverb whose wet path runs at half the sample rate (quality tier "fast").
+
+    Input is averaged in pairs, reverberated at sample_rate / 2 by a wet-only
+    reverb (pedalboard's when installed, else NumpyReverb) and interpolated
+    back linearly; the dry signal stays at full rate. That halves the reverb's
+    work; the wet signal loses most content above sample_rate / 4, much of
+    which damping removes anyway. The wet path lags by two samples.
+    """
+
+    def __init__(self, room_size=0.5, damping=0.5, wet_level=0.33, dry_level=0.4, width=1.0):
+        super().__init__(room_size=room_size, damping=damping, wet_level=wet_level, dry_level=dry_level, width=width)
+        self.dry_level = np.float32(dry_level)
+        Reverb = NumpyReverb
+        if load_pedalboard():
+            from pedalboard import Reverb
+        self.reverb = Reverb(room_size=room_size, damping=damping, wet_level=wet_level, dry_level=0.0, width=width)
+
+    def _prepare(self, sample_rate, num_channels):
+        self.sample_rate = sample_rate
+        self.reverb.reset()
+        # pedalboard re-prepares (clearing the tail) whenever a call is longer than
+        # any before it, and the pair count here varies by one between calls
+        self.reverb(np.zeros((num_channels, self.max_chunk // 2 + 1), dtype=np.float32), sample_rate / 2, reset=False)
+        self.pending = np.zeros((num_channels, 0), dtype=np.float32)
+        self.last = np.zeros((num_channels, 1), dtype=np.float32)
+        self.ready = np.zeros((num_channels, 2), dtype=np.float32)
+
+    def _process(self, audio):
+        buf = np.concatenate([self.pending, audio], axis=1)
+        pairs = buf.shape[1] // 2
+        self.pending = buf[:, 2 * pairs:]
+        low = (buf[:, 0:2 * pairs:2] + buf[:, 1:2 * pairs:2]) * np.float32(0.5)
+        wet = self.reverb(low, self.sample_rate / 2, reset=False)
+
+        up = np.empty((buf.shape[0], 2 * pairs), dtype=np.float32)
+        up[:, 0::2] = (np.concatenate([self.last, wet[:, :-1]], axis=1) + wet) * np.float32(0.5)
+        up[:, 1::2] = wet
+        if pairs:
+            self.last = wet[:, -1:]
+        self.ready = np.concatenate([self.ready, up], axis=1)
+        out = audio * self.dry_level + self.ready[:, :audio.shape[1]]
+        self.ready = self.ready[:, audio.shape[1]:]
+        return out
+
+
+class NumpyBoard:
+    """Stand-in for pedalboard.Pedalboard over Numpy* plugins (callable, iterable, reset())"""
+
+    def __init__(self, plugins):
+        self.plugins = list(plugins)
+
+    def __iter__(self):
+        return iter(self.plugins)
+
+    def __len__(self):
+        return len(self.plugins)
+
+    def reset(self):
+        for plugin in self.plugins:
+            plugin.reset()
+
+    def __call__(self, audio, sample_rate, reset=True):
+        for plugin in self.plugins:
+            audio = plugin(audio, sample_rate, reset=reset)
+        return audio
+
+
+# Settings that shape the reverb + echo impulse response (the ConvolutionReverb cache key)
+IMPULSE_SETTINGS = ('reverbRoom', 'reverbWet', 'reverbDamping', 'echoDelay', 'echoFeedback', 'echoMix')
+IMPULSE_CACHE_VERSION = 1
+
+# --render-cache DIR, for the impulse response cache (set by configure_cache_dir)
+_configured_cache_dir = None
+
+
+def configure_cache_dir(cache_dir):
+    """Use cache_dir for impulse responses when no directory is passed in (None/'' = default)"""
+    global _configured_cache_dir
+    _configured_cache_dir = cache_dir or None
+
+
+def render_impulse_response(settings, sample_rate, num_channels, max_seconds=8.0, floor_db=-80.0):
+    """
+    Render the reverb + echo chain's impulse response as a (inputs, outputs,
+    taps) float32 array - a 2x2 matrix of responses for stereo, since the
+    reverb mixes both channels. The tail is cut once the energy left after
+    it is floor_db below the total (-80dB: ~3e-5 RMS error against the chain).
+    """
+    engine = 'pedalboard' if load_pedalboard() else 'numpy'
+    length = int(max_seconds * sample_rate)
+    response = np.zeros((num_channels, num_channels, length), dtype=np.float32)
+    for channel in range(num_channels):
+        impulse = np.zeros((num_channels, length), dtype=np.float32)
+        impulse[channel, 0] = 1.0
+        for plugin in build_space_effects(settings, engine):
+            impulse = plugin(impulse, sample_rate)
+        response[channel] = impulse
+
+    energy = np.sum(np.square(response, dtype=np.float64), axis=(0, 1))
+    remaining = np.cumsum(energy[::-1])[::-1]
+    below = remaining <= remaining[0] * 10 ** (floor_db / 10)
+    taps = max(1, int(np.argmax(below))) if below.any() else length
+    return np.ascontiguousarray(response[:, :, :taps])
+
+
+def load_impulse_response(settings, sample_rate, num_channels, cache_dir=None):
+    """
+    Impulse response for the settings, from <cache>/impulses/<key>.npy when
+    it was rendered before, otherwise rendered and stored there.
+    """
+    normalized = normalize_settings(settings)
+    key_data = {name: normalized[name] for name in IMPULSE_SETTINGS}
+    key_data.update(version=IMPULSE_CACHE_VERSION, sampleRate=sample_rate, channels=num_channels,
+                    source='pedalboard' if load_pedalboard() else 'numpy')
+    key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:32]
+    path = os.path.join(cache_dir or _configured_cache_dir or default_cache_dir(), 'impulses', f"{key}.npy")
+
+    try:
+        response = np.load(path)
+        if response.shape[:2] == (num_channels, num_channels):
+            print(f"[Divine Effects] Impulse response from cache ({response.shape[2] / sample_rate:.2f}s)", file=sys.stderr)
+            return response
+    except (OSError, ValueError):
+        pass
+
+    started = time.perf_counter()
+    response = render_impulse_response(normalized, sample_rate, num_channels)
+    print(f"[Divine Effects] Rendered impulse response: {response.shape[2] / sample_rate:.2f}s "
+          f"in {(time.perf_counter() - started) * 1000:.0f}ms", file=sys.stderr)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, response)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[Divine Effects] Could not cache impulse response: {e}", file=sys.stderr)
+    return response
+
+
+class ConvolutionReverb(NumpyPlugin):
+    """
+    Reverb + echo as one uniformly partitioned FFT convolution (overlap-save).
+
+    The impulse response is split into partitions of block_frames taps; a
+    frequency-domain delay line holds the spectra of past input blocks, so
+    each block costs two FFTs plus one multiply-add per partition. Whole
+    runs of blocks are transformed in one batch. A partly filled block is
+    convolved zero-padded and redone as more input arrives, which keeps the
+    plugin latency-free for any call size (the contribution of older blocks
+    is computed once per block).
+    """
+
+    def __init__(self, settings, block_frames=4096, cache_dir=None):
+        super().__init__(block_frames=block_frames, **{name: settings.get(name) for name in IMPULSE_SETTINGS})
+        self.settings = dict(settings)
+        self.block = block_frames
+        self.cache_dir = cache_dir
+        self._responses = {}
+
+    def _prepare(self, sample_rate, num_channels):
+        config = (sample_rate, num_channels)
+        if config not in self._responses:
+            response = load_impulse_response(self.settings, sample_rate, num_channels, self.cache_dir)
+            block = self.block
+            n_parts = -(-response.shape[2] // block)
+            parts = np.zeros((n_parts, num_channels, num_channels, 2 * block), dtype=np.float32)
+            padded = np.zeros((num_channels, num_channels, n_parts * block), dtype=np.float32)
+            padded[..., :response.shape[2]] = response
+            parts[..., :block] = padded.reshape(num_channels, num_channels, n_parts, block).transpose(2, 0, 1, 3)
+            self._responses[config] = np.fft.rfft(parts, axis=-1).astype(np.complex64)
+        self.spectra = self._responses[config]  # (partitions, inputs, outputs, bins)
+
+        bins = self.block + 1
+        n_parts = self.spectra.shape[0]
+        self.history = np.zeros((n_parts - 1, num_channels, bins), dtype=np.complex64)  # oldest first
+        self.previous = np.zeros((num_channels, self.block), dtype=np.float32)
+        self.current = np.zeros((num_channels, 0), dtype=np.float32)
+        self.older = None  # contribution of earlier blocks to the current one
+
+    def _apply(self, spectrum, partition):
+        """(..., inputs, bins) spectra through one partition -> (..., outputs, bins)"""
+        response = self.spectra[partition]
+        out = spectrum[..., 0, None, :] * response[0]
+        for i in range(1, response.shape[0]):
+            out += spectrum[..., i, None, :] * response[i]
+        return out
+
+    def _full_blocks(self, audio):
+        block = self.block
+        channels, n = audio.shape
+        count = n // block
+        signal = np.concatenate([self.previous, audio], axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(signal, 2 * block, axis=1)[:, ::block][:, :count]
+        spectra = np.fft.rfft(windows, axis=-1).astype(np.complex64).transpose(1, 0, 2)  # (blocks, channels, bins)
+
+        n_parts = self.spectra.shape[0]
+        delay_line = np.concatenate([self.history, spectra], axis=0)
+        out = self._apply(spectra, 0)
+        for p in range(1, n_parts):
+            out += self._apply(delay_line[n_parts - 1 - p:n_parts - 1 - p + count], p)
+
+        if n_parts > 1:
+            self.history = delay_line[-(n_parts - 1):]
+        self.previous = audio[:, -block:].copy()
+        frames = np.fft.irfft(out, n=2 * block, axis=-1)[..., block:]
+        return frames.transpose(1, 0, 2).reshape(channels, count * block)
+
+    def _partial_block(self, audio):
+        block = self.block
+        channels = audio.shape[0]
+        start = self.current.shape[1]
+        if start == 0:
+            n_parts = self.spectra.shape[0]
+            self.older = np.zeros((channels, block + 1), dtype=np.complex64)
+            for p in range(1, n_parts):
+                self.older += self._apply(self.history[n_parts - 1 - p], p)
+
+        self.current = np.concatenate([self.current, audio], axis=1)
+        filled = self.current.shape[1]
+        window = np.zeros((channels, 2 * block), dtype=np.float32)
+        window[:, :block] = self.previous
+        window[:, block:block + filled] = self.current
+        spectrum = np.fft.rfft(window, axis=-1).astype(np.complex64)
+        frames = np.fft.irfft(self._apply(spectrum, 0) + self.older, n=2 * block, axis=-1)
+        out = frames[:, block + start:block + filled]
+
+        if filled == block:
+            if self.history.shape[0]:
+                self.history = np.concatenate([self.history[1:], spectrum[None]], axis=0)
+            self.previous = self.current
+            self.current = self.current[:, :0]
+        return out
+
+    def _process(self, audio):
+        n = audio.shape[1]
+        outputs = []
+        pos = 0
+        while pos < n:
+            if self.current.shape[1] == 0 and n - pos >= self.block:
+                count = (n - pos) // self.block
+                outputs.append(self._full_blocks(audio[:, pos:pos + count * self.block]))
+                pos += count * self.block
+            else:
+                take = min(self.block - self.current.shape[1], n - pos)
+                outputs.append(self._partial_block(audio[:, pos:pos + take]))
+                pos += take
+        return np.concatenate(outputs, axis=1).astype(np.float32, copy=False)
+
+
+# Defaults for every setting the chain reads (same values as the settings JSON docs above)
+DEFAULT_SETTINGS = {
+    'pitch': -2,
+    'reverbRoom': 0.85,
+    'reverbWet': 0.4,
+    'reverbDamping': 0.7,
+    'echoDelay': 120,
+    'echoFeedback': 0.2,
+    'echoMix': 0.15,
+    'chorusEnabled': True,
+    'chorusRate': 0.4,
+    'chorusDepth': 0.25,
+    'chorusMix': 0.2,
+    'reverbHalfRate': False,
+    'volume': 1.0,
+    'trimSilence': False,
+    'silenceDb': -45,
+    'maxPauseMs': 400,
+    'pitchEngine': 'auto',
+    'dspEngine': 'auto',
+}
+
+PITCH_ENGINES = ('auto', 'pedalboard', 'vocoder', 'resample')
+DSP_ENGINES = ('auto', 'pedalboard', 'numpy', 'convolution')
+
+
+def normalize_settings(settings):
+    """
+    Fill in defaults and coerce values so equal chains compare equal
+    (e.g. 1 vs 1.0, missing vs default). Unknown keys are dropped, and null
+    (None) counts as missing.
+    """
+    normalized = {}
+    for key, default in DEFAULT_SETTINGS.items():
+        value = settings.get(key)
+        if value is None:
+            value = default
+        if isinstance(default, bool):
+            normalized[key] = bool(value)
+        elif isinstance(default, str):
+            normalized[key] = str(value)
+        else:
+            normalized[key] = round(float(value), 6)
+    return normalized
+
+
+def resolve_dsp_engine(settings):
+    """
+    Pick the effects implementation. "auto" uses pedalboard when it can be
+    imported and the built-in NumPy plugins otherwise. "convolution" works
+    either way (the impulse response is rendered with whichever is present).
+    """
+    engine = settings.get('dspEngine', 'auto')
+    if engine not in DSP_ENGINES:
+        print(f"[Divine Effects] Unknown dspEngine '{engine}', using auto", file=sys.stderr)
+        engine = 'auto'
+    if engine == 'convolution':
+        return engine
+    if engine == 'numpy' or not load_pedalboard():
+        return 'numpy'
+    return 'pedalboard'
+
+
+def resolve_pitch_engine(settings, streaming=False):
+    """
+    Pick the pitch shifter for a job. "auto" uses the PitchShift plugin for
+    files when it exists, and the phase vocoder otherwise. Streams always use
+    the vocoder: PitchShift holds back about a second of audio with reset=False.
+    """
+    engine = settings.get('pitchEngine', 'auto')
+    if engine not in PITCH_ENGINES:
+        print(f"[Divine Effects] Unknown pitchEngine '{engine}', using auto", file=sys.stderr)
+        engine = 'auto'
+    if streaming and engine != 'vocoder':
+        return 'vocoder'
+    plugin_available = pitch_shift_available() and resolve_dsp_engine(settings) != 'numpy'
+    if engine == 'pedalboard' and not plugin_available:
+        return 'vocoder'
+    if engine == 'auto':
+        return 'pedalboard' if plugin_available else 'vocoder'
+    return engine
+
+
+class ChainCache:
+    """
+    Bounded LRU of constructed Pedalboards keyed by normalized settings.
+
+    Building the chain (PitchShift especially) costs time on every utterance
+    even though settings rarely change, so boards are reused. A reused board
+    is reset() before it is handed out so no reverb/delay tail leaks between
+    jobs.
+    """
+
+    def __init__(self, max_size=8):
+        self.max_size = max_size
+        self.boards = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, settings, include_pitch=True):
+        normalized = normalize_settings(settings)
+        key = (include_pitch,) + tuple(sorted(normalized.items()))
+
+        board = self.boards.get(key)
+        if board is not None:
+            self.boards.move_to_end(key)
+            board.reset()
+            self.hits += 1
+            print(f"[Divine Effects] Reusing cached chain ({self.hits} hits, {self.misses} misses)", file=sys.stderr)
+            return board
+
+        self.misses += 1
+        engine = resolve_dsp_engine(normalized)
+        effects = build_effects(normalized, include_pitch=include_pitch, engine=engine)
+        # NumpyBoard also drives pedalboard plugins (convolution engine, half-rate reverb)
+        if engine == 'pedalboard' and not any(isinstance(effect, NumpyPlugin) for effect in effects):
+            board = Pedalboard(effects)
         else:
-            # Apply manual pitch shift before the pedalboard chain
+            board = NumpyBoard(effects)
+        self.boards[key] = board
+        while len(self.boards) > self.max_size:
+            self.boards.popitem(last=False)
+            self.evictions += 1
+        return board
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.boards),
+            'hitRatio': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+CHAIN_CACHE = ChainCache()
+
+
+class StageCache:
+    """
+    Bounded LRU of intermediate stage outputs across jobs (server mode).
+
+    Keys are a digest of the audio entering the chain plus the keys of every
+    stage up to that point (see preset_stages), so when one setting changes
+    only the stages from the first changed one onwards run again. Only the
+    stages of the max_inputs most recent inputs are kept: re-rendering the
+    last utterance with new settings is what reuses them, and one-off
+    utterances would otherwise fill max_bytes. Stored arrays are shared and
+    must never be modified in place.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_inputs=1):
+        self.max_bytes = max_bytes
+        self.max_inputs = max_inputs
+        self.entries = OrderedDict()
+        self.inputs = OrderedDict()  # input digest (keys[0]) -> None, least recent first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def deepest(self, keys):
+        """The stored entry for the last possible of keys[1:] as (index, entry), else (0, None)"""
+        for depth in range(len(keys) - 1, 0, -1):
+            entry = self.entries.get(keys[depth])
+            if entry is not None:
+                self.entries.move_to_end(keys[depth])
+                self.inputs.move_to_end(keys[depth][0])
+                self.hits += 1
+                return depth, entry
+        self.misses += 1
+        return 0, None
+
+    def put(self, key, audio, peak=None):
+        """Store a stage output; returns its [audio, peak] entry (peak can be filled in later)"""
+        entry = [audio, peak]
+        if key in self.entries or audio.nbytes > self.max_bytes:
+            return entry
+        self.inputs[key[0]] = None
+        self.inputs.move_to_end(key[0])
+        while len(self.inputs) > self.max_inputs:
+            stale_input, _ = self.inputs.popitem(last=False)
+            for stale in [k for k in self.entries if k[0] == stale_input]:
+                self.bytes -= self.entries.pop(stale)[0].nbytes
+                self.evictions += 1
+        self.entries[key] = entry
+        self.bytes += audio.nbytes
+        while self.bytes > self.max_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+        return entry
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'megabytes': round(self.bytes / (1024 * 1024), 1),
+            'hitRatio': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+# Bump when a DSP change makes old renders stale
+RENDER_CACHE_VERSION = 1
+
+
+def default_cache_dir():
+    """~/.cache/templeos/voice-of-god (honours XDG_CACHE_HOME)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'templeos', 'voice-of-god')
+
+
+def write_json_atomic(path, data):
+    """Write JSON next to its destination and rename over it"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class RenderCache:
+    """
+    Content-addressed cache of finished renders on disk.
+
+    Keyed by a hash of the decoded input PCM plus the canonical settings JSON
+    and the render path (parallel segments restart the pitch phase per
+    segment, so they are keyed apart from serial renders; the "lowMemory" and
+    "parallel" values themselves are not keyed, and block-wise renders are not
+    cached), so repeated phrases (greetings, errors, confirmations) skip the
+    chain entirely. Entries are written to a temp file and renamed into place, hits
+    bump the file mtime, and the oldest entries are evicted once the directory
+    exceeds max_bytes. Counters are merged into stats.json so they survive
+    restarts and several processes sharing the directory.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=200 * 1024 * 1024):
+        self.dir = os.path.join(cache_dir or default_cache_dir(), 'renders')
+        self.max_bytes = max_bytes
+        self.stats_path = os.path.join(self.dir, 'stats.json')
+        os.makedirs(self.dir, exist_ok=True)
+        self.pending = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def key(self, audio, sample_rate, settings, output_format='wav', segmented=False):
+        digest = hashlib.sha256()
+        canonical = json.dumps(normalize_settings(settings), sort_keys=True, separators=(',', ':'))
+        path = 'segments' if segmented else 'serial'
+        digest.update(f"v{RENDER_CACHE_VERSION}:{sample_rate}:{audio.shape}:{output_format}:{path}:{canonical}".encode())
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        return f"{digest.hexdigest()}.{output_format}"
+
+    def _path(self, key):
+        return os.path.join(self.dir, key)
+
+    def fetch(self, key, output_path):
+        """Copy a cached render to output_path ('-' = stdout). Returns True on a hit."""
+        path = self._path(key)
+        try:
+            if output_path == '-':
+                with open(path, 'rb') as f:
+                    data = f.read()
+                sys.stdout.buffer.write(data)
+                sys.stdout.buffer.flush()
+            else:
+                shutil.copyfile(path, output_path)
+            os.utime(path)  # LRU: mtime is the last use
+        except FileNotFoundError:
+            self.pending['misses'] += 1
+            self._flush_stats()
+            return False
+        self.pending['hits'] += 1
+        self._flush_stats()
+        return True
+
+    def store(self, key, rendered_path=None, data=None):
+        """Atomically add a finished render (a file or its bytes), then evict down to the size cap"""
+        tmp_path = os.path.join(self.dir, f".{key}.{os.getpid()}.tmp")
+        try:
+            if data is not None:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            else:
+                shutil.copyfile(rendered_path, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"[Divine Effects] Render cache store failed: {e}", file=sys.stderr)
             try:
-                audio = apply_pitch_shift_manual(audio, sample_rate, pitch_semitones)
-                print(f"[Divine Effects] Manual pitch shift: {pitch_semitones} semitones", file=sys.stderr)
-            except ImportError:
-                print("[Divine Effects] scipy not available, skipping pitch shift", file=sys.stderr)
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.pending['stores'] += 1
+        self._evict()
+        self._flush_stats()
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.dir) as it:
+            for entry in it:
+                if entry.name.endswith(AUDIO_FORMATS) and not entry.name.startswith('.'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.pending['evictions'] += 1
+            except OSError:
+                pass
+
+    def _read_stats(self):
+        try:
+            with open(self.stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-    # 2. Cathedral Reverb
+    def _flush_stats(self):
+        stats = self._read_stats()
+        for name, count in self.pending.items():
+            stats[name] = stats.get(name, 0) + count
+            self.pending[name] = 0
+        try:
+            write_json_atomic(self.stats_path, stats)
+        except OSError:
+            pass
+
+    def stats(self):
+        stats = self._read_stats()
+        for name, count in self.pending.items():
+            stats[name] = stats.get(name, 0) + count
+        entries = self._entries()
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats.update({
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'maxBytes': self.max_bytes,
+            'hitRatio': round(stats.get('hits', 0) / lookups, 3) if lookups else 0.0,
+            'dir': self.dir
+        })
+        return stats
+
+
+def build_space_effects(settings, engine='pedalboard'):
+    """
+    Reverb and echo plugins for the chain ("numpy" for the NumPy versions).
+    Together they are linear and time-invariant, which is what lets
+    ConvolutionReverb replace them with one impulse response.
+    """
+    if engine == 'numpy':
+        Reverb, Delay = NumpyReverb, NumpyDelay
+    else:
+        from pedalboard import Reverb, Delay
+    effects = []
+
+    # Cathedral Reverb
     reverb_room = settings.get('reverbRoom', 0.85)
     reverb_wet = settings.get('reverbWet', 0.4)
     reverb_damping = settings.get('reverbDamping', 0.7)
 
-    effects.append(Reverb(
+    half_rate = settings.get('reverbHalfRate', False)
+    reverb_cls = HalfRateReverb if half_rate else Reverb
+    effects.append(reverb_cls(
         room_size=reverb_room,
         wet_level=reverb_wet,
         dry_level=1.0 - reverb_wet,
         damping=reverb_damping,
         width=1.0  # Full stereo width
     ))
-    print(f"[Divine Effects] Reverb: room={reverb_room}, wet={reverb_wet}", file=sys.stderr)
+    print(f"[Divine Effects] Reverb: room={reverb_room}, wet={reverb_wet}"
+          f"{' (half rate)' if half_rate else ''}", file=sys.stderr)
 
-    # 3. Echo/Delay
+    # Echo/Delay
     echo_delay_ms = settings.get('echoDelay', 120)
     echo_feedback = settings.get('echoFeedback', 0.2)
     echo_mix = settings.get('echoMix', 0.15)
@@ -135,6 +1270,38 @@ def apply_divine_effects(input_path, output_path, settings):
         ))
         print(f"[Divine Effects] Echo: delay={echo_delay_ms}ms, feedback={echo_feedback}", file=sys.stderr)
 
+    return effects
+
+
+def build_effects(settings, include_pitch=True, engine='pedalboard'):
+    """
+    Build the plugin list for the divine voice chain, from pedalboard or (for
+    engine "numpy") the Numpy* stand-ins, which take the same parameters.
+    Engine "convolution" replaces reverb and echo with a ConvolutionReverb.
+    PitchShift is only included when include_pitch is set and the plugin exists;
+    callers handle the manual fallback themselves.
+    """
+    if engine == 'numpy' or not load_pedalboard():
+        Chorus, Gain = NumpyChorus, NumpyGain
+        include_pitch = False
+        print("[Divine Effects] Using built-in NumPy effects", file=sys.stderr)
+    else:
+        from pedalboard import Chorus, Gain
+    effects = []
+
+    # 1. Pitch Shift (make voice deeper)
+    pitch_semitones = settings.get('pitch', -2)
+    if include_pitch and pitch_semitones != 0 and pitch_shift_available():
+        effects.append(PitchShift(semitones=pitch_semitones))
+        print(f"[Divine Effects] Pitch shift: {pitch_semitones} semitones", file=sys.stderr)
+
+    # 2-3. Cathedral Reverb + Echo/Delay
+    if engine == 'convolution':
+        effects.append(ConvolutionReverb(settings))
+        print("[Divine Effects] Reverb + echo: partitioned convolution", file=sys.stderr)
+    else:
+        effects.extend(build_space_effects(settings, engine))
+
     # 4. Ethereal Chorus (optional)
     if settings.get('chorusEnabled', True):
         chorus_rate = settings.get('chorusRate', 0.4)
@@ -158,39 +1325,1780 @@ def apply_divine_effects(input_path, output_path, settings):
     effects.append(Gain(gain_db=total_gain_db))
     print(f"[Divine Effects] Volume: {volume:.1f}x ({volume_db:.1f}dB), total gain: {total_gain_db:.1f}dB", file=sys.stderr)
 
-    # Create the pedalboard and process audio
-    board = Pedalboard(effects)
-    effected = board(audio, sample_rate)
+    return effects
 
-    # Normalize to prevent clipping
-    max_val = np.max(np.abs(effected))
-    if max_val > 0.95:
-        effected = effected * (0.95 / max_val)
-        print(f"[Divine Effects] Normalized audio (peak was {max_val:.2f})", file=sys.stderr)
 
-    # Write output file
-    with AudioFile(output_path, 'w', sample_rate, num_channels) as f:
-        f.write(effected)
+def pcm16_to_float(data, num_channels):
+    """Decode interleaved signed 16-bit little-endian PCM to a (channels, frames) float32 array"""
+    samples = np.frombuffer(data, dtype='<i2').reshape(-1, num_channels)
+    return (samples.T * (1.0 / 32768.0)).astype(np.float32)
 
-    print(f"[Divine Effects] Saved to: {output_path}", file=sys.stderr)
 
+def float_to_pcm16(audio):
+    """Encode a (channels, frames) float array as interleaved signed 16-bit little-endian PCM"""
+    clipped = np.clip(audio, -1.0, 32767.0 / 32768.0)
+    return (clipped.T * 32768.0).astype('<i2').tobytes()
 
-def main():
-    if len(sys.argv) < 4:
-        print("Usage: audio-effects.py <input.wav> <output.wav> '<settings_json>'", file=sys.stderr)
-        sys.exit(1)
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
+# In-memory formats: "wav" (16-bit PCM WAV), "s16le" and "f32le" (raw interleaved)
+AUDIO_FORMATS = ('wav', 's16le', 'f32le')
 
-    try:
-        settings = json.loads(sys.argv[3])
-    except json.JSONDecodeError as e:
-        print(f"Invalid settings JSON: {e}", file=sys.stderr)
-        sys.exit(1)
 
-    try:
-        apply_divine_effects(input_path, output_path, settings)
+def decode_audio_bytes(data, settings):
+    """
+    Decode WAV or raw PCM bytes to ((channels, frames) float32, sample_rate, channels).
+    "inputFormat" is "auto" (WAV if there is a RIFF header, else s16le), "wav",
+    "s16le" or "f32le"; raw input takes "inputSampleRate" and "inputChannels".
+    """
+    fmt = settings.get('inputFormat', 'auto')
+    if fmt == 'wav' or (fmt == 'auto' and data[:4] == b'RIFF'):
+        with wave.open(io.BytesIO(data)) as w:
+            sample_rate = w.getframerate()
+            num_channels = w.getnchannels()
+            width = w.getsampwidth()
+            frames = w.readframes(w.getnframes())
+        if width == 2:
+            return pcm16_to_float(frames, num_channels), sample_rate, num_channels
+        if width == 4:
+            samples = np.frombuffer(frames, dtype='<i4').reshape(-1, num_channels)
+            return (samples.T * (1.0 / 2147483648.0)).astype(np.float32), sample_rate, num_channels
+        if width == 1:
+            samples = np.frombuffer(frames, dtype=np.uint8).reshape(-1, num_channels)
+            return ((samples.T - 128.0) * (1.0 / 128.0)).astype(np.float32), sample_rate, num_channels
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+
+    sample_rate = int(settings.get('inputSampleRate', 22050))
+    num_channels = int(settings.get('inputChannels', 1))
+    if fmt in ('auto', 's16le'):
+        data = data[:len(data) - len(data) % (2 * num_channels)]
+        return pcm16_to_float(data, num_channels), sample_rate, num_channels
+    if fmt == 'f32le':
+        data = data[:len(data) - len(data) % (4 * num_channels)]
+        samples = np.frombuffer(data, dtype='<f4').reshape(-1, num_channels)
+        return np.ascontiguousarray(samples.T), sample_rate, num_channels
+    raise ValueError(f"Unknown inputFormat: {fmt}")
+
+
+def encode_audio_bytes(audio, sample_rate, output_format='wav'):
+    """Encode (channels, frames) float audio as WAV, s16le or f32le bytes"""
+    if output_format == 's16le':
+        return float_to_pcm16(audio)
+    if output_format == 'f32le':
+        return np.ascontiguousarray(audio.T, dtype='<f4').tobytes()
+    if output_format != 'wav':
+        raise ValueError(f"Unknown outputFormat: {output_format}")
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(audio.shape[0])
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(float_to_pcm16(audio))
+    return buffer.getvalue()
+
+
+def read_audio(input_path, settings):
+    """Load audio from a file, or from stdin when input_path is '-'"""
+    if input_path == '-':
+        return decode_audio_bytes(sys.stdin.buffer.read(), settings)
+    if settings.get('inputFormat', 'auto') in ('s16le', 'f32le') or not load_pedalboard():
+        with open(input_path, 'rb') as f:
+            return decode_audio_bytes(f.read(), settings)
+    with AudioFile(input_path) as f:
+        return f.read(f.frames), f.samplerate, f.num_channels
+
+
+def write_audio(output_path, audio, sample_rate, output_format='wav'):
+    """
+    Write audio to a file, or to stdout when output_path is '-'.
+    Returns the encoded bytes for in-memory outputs (None for WAV files).
+    """
+    if output_path != '-' and output_format == 'wav' and load_pedalboard():
+        with AudioFile(output_path, 'w', sample_rate, audio.shape[0]) as f:
+            f.write(audio)
+        return None
+
+    data = encode_audio_bytes(audio, sample_rate, output_format)
+    if output_path == '-':
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    return data
+
+
+class StageTimer:
+    """
+    Wall-clock time per processing stage of one render.
+
+    Stages accumulate (the block-wise path enters them once per block) and
+    keep their first-seen order; board plugins are timed separately under
+    "effects". record() returns the JSON-ready summary.
+    """
+
+    def __init__(self, path='whole'):
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.effects = []
+        self.audio_seconds = None
+        self.quality = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def add_effect(self, name, seconds):
+        self.effects.append({'effect': name, 'ms': round(seconds * 1000, 2)})
+
+    def record(self):
+        total = time.perf_counter() - self.started
+        record = {
+            'path': self.path,
+            'totalMs': round(total * 1000, 2),
+            'stages': {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            'effects': self.effects,
+            'audioSeconds': None,
+            'rtf': None,
+        }
+        if self.audio_seconds:
+            record['audioSeconds'] = round(self.audio_seconds, 3)
+            record['rtf'] = round(total / self.audio_seconds, 5)
+        if self.quality:
+            record['quality'] = self.quality
+        return record
+
+
+def run_board_timed(board, audio, sample_rate, timer):
+    """
+    Run a board one plugin at a time so each effect gets its own timing.
+    Output is identical to board(audio, sample_rate) for a whole clip.
+    """
+    with timer.stage('board'):
+        for plugin in board:
+            started = time.perf_counter()
+            audio = plugin(audio, sample_rate)
+            timer.add_effect(type(plugin).__name__, time.perf_counter() - started)
+    return audio
+
+
+def emit_timings(record, metrics_file=None):
+    """Print a timing record as one JSON line on stderr, or append it to a JSONL metrics file"""
+    line = json.dumps(record)
+    if metrics_file:
+        with open(metrics_file, 'a') as f:
+            f.write(line + '\n')
+    else:
+        print(line, file=sys.stderr)
+
+
+def apply_divine_effects(input_path, output_path, settings, render_cache=None, stage_cache=None):
+    """
+    Apply divine audio effects to transform normal TTS into godly voice.
+    Either path may be '-' for stdin/stdout; formats are negotiated with the
+    "inputFormat"/"outputFormat" settings (see decode_audio_bytes).
+    With a StageCache, stage outputs are kept for later jobs on the same audio.
+    Returns a small report dict ({'cached': bool, 'timings': {...}}, plus
+    'envelope': the sidecar path when "envelope" is set).
+    """
+    output_format = settings.get('outputFormat', 'wav')
+    if output_format not in AUDIO_FORMATS:
+        raise ValueError(f"Unknown outputFormat: {output_format}")
+    envelope = envelope_format(settings, output_path)
+
+    if wants_low_memory(input_path, settings):
+        return apply_divine_effects_blockwise(input_path, output_path, settings)
+
+    timer = StageTimer()
+    report = {'cached': False}
+
+    # Load audio (file or stdin)
+    with timer.stage('decode'):
+        audio, sample_rate, num_channels = read_audio(input_path, settings)
+    timer.audio_seconds = audio.shape[1] / sample_rate
+
+    print(f"[Divine Effects] Loaded audio: {sample_rate}Hz, {num_channels} channels", file=sys.stderr)
+
+    settings, timer.quality = resolve_quality(settings, timer.audio_seconds, sample_rate, num_channels)
+
+    keyed_audio = audio
+    removed = 0
+    if settings.get('trimSilence', False):
+        with timer.stage('trim'):
+            audio, removed = trim_silence(audio, sample_rate, settings)
+        print(f"[Divine Effects] Trimmed {removed} silent samples ({removed / sample_rate:.2f}s), "
+              f"{audio.shape[1]} left", file=sys.stderr)
+    segments = plan_segments(audio, sample_rate, settings)
+
+    cache_key = None
+    if render_cache:
+        with timer.stage('cacheLookup'):
+            cache_key = render_cache.key(keyed_audio, sample_rate, settings, output_format,
+                                         segmented=len(segments) > 1)
+            hit = render_cache.fetch(cache_key, output_path)
+        if hit:
+            print(f"[Divine Effects] Render cache hit, copied to: {'stdout' if output_path == '-' else output_path}", file=sys.stderr)
+            timer.path = 'cached'
+            report['cached'] = True
+            if envelope:
+                with timer.stage('envelope'):
+                    report['envelope'] = write_envelope_from_render(output_path, envelope, output_format,
+                                                                    sample_rate, num_channels)
+            report['timings'] = timer.record()
+            return report
+    del keyed_audio  # only the cache key needs the untrimmed input
+
+    max_val = None  # set once the output is normalized
+    if len(segments) > 1:
+        # Long clip: segments split at pauses render in worker processes
+        timer.path = 'parallel'
+        with timer.stage('segments'):
+            effected, segment_summary = render_segments(audio, sample_rate, settings, segments)
+        print(f"[Divine Effects] Rendered {segment_summary['count']} segments on {segment_summary['workers']} workers "
+              f"(cuts at {segment_summary['cuts']}s, {segment_summary['overhead'] * 100:.0f}% pre-roll)", file=sys.stderr)
+    elif stage_cache is not None:
+        segment_summary = None
+        effected, max_val, report['stagesReused'] = render_memoized(audio, sample_rate, settings, timer, stage_cache)
+    else:
+        segment_summary = None
+        effected = render_serial(audio, sample_rate, settings, timer)
+    if segment_summary is None and not report.get('stagesReused') and audio.shape[1]:
+        # A whole serial render refines this machine's RTF for its tier (reused stages would understate it)
+        work = sum(timer.stages.get(name, 0.0) for name in ('pitch', 'chainSetup', 'board'))
+        QUALITY_PROFILE.observe(settings, sample_rate, num_channels, timer.quality, work * sample_rate / audio.shape[1])
+
+    # Normalize to prevent clipping (in place - no third full-size copy)
+    if max_val is None:
+        with timer.stage('normalize'):
+            max_val = np.max(np.abs(effected))
+            if max_val > 0.95:
+                effected *= 0.95 / max_val
+    if max_val > 0.95:
+        print(f"[Divine Effects] Normalized audio (peak was {max_val:.2f})", file=sys.stderr)
+
+    # Write output (file or stdout)
+    with timer.stage('encode'):
+        encoded = write_audio(output_path, effected, sample_rate, output_format)
+
+    print(f"[Divine Effects] Saved to: {'stdout' if output_path == '-' else output_path} ({output_format})", file=sys.stderr)
+
+    if envelope:
+        with timer.stage('envelope'):
+            report['envelope'] = write_envelope_for(output_path, effected, sample_rate, envelope)
+    if cache_key:
+        with timer.stage('cacheStore'):
+            render_cache.store(cache_key, rendered_path=output_path, data=encoded)
+    report['timings'] = timer.record()
+    if segment_summary:
+        report['timings']['segments'] = segment_summary
+    if settings.get('trimSilence', False):
+        report['timings']['removedSamples'] = removed
+    return report
+
+
+def render_serial(audio, sample_rate, settings, timer):
+    """Pitch shift and effects chain for a whole clip in this process"""
+    # Pitch shift without the PitchShift plugin happens before the pedalboard chain
+    pitch_semitones = settings.get('pitch', -2)
+    pitch_engine = resolve_pitch_engine(settings)
+    if pitch_semitones != 0 and pitch_engine == 'vocoder':
+        with timer.stage('pitch'):
+            audio = apply_pitch_shift_manual(audio, sample_rate, pitch_semitones)
+        print(f"[Divine Effects] Manual pitch shift: {pitch_semitones} semitones", file=sys.stderr)
+    elif pitch_semitones != 0 and pitch_engine == 'resample':
+        try:
+            with timer.stage('pitch'):
+                audio = apply_pitch_shift_resample(audio, sample_rate, pitch_semitones)
+            print(f"[Divine Effects] Resample pitch shift: {pitch_semitones} semitones", file=sys.stderr)
+        except ImportError:
+            print("[Divine Effects] scipy not available, skipping pitch shift", file=sys.stderr)
+
+    # Get the (cached) pedalboard and process audio
+    with timer.stage('chainSetup'):
+        board = CHAIN_CACHE.get(settings, include_pitch=pitch_engine == 'pedalboard')
+    return run_board_timed(board, audio, sample_rate, timer)
+
+
+def render_memoized(audio, sample_rate, settings, timer, stage_cache):
+    """
+    render_serial plus normalization, reusing stage outputs from stage_cache.
+    The final Gain is linear, so it isn't cached: the pre-gain mix is stored
+    with its peak, and gain and normalization become one multiply (a
+    volume-only change costs just that). Returns (output, peak before
+    normalization, stages reused).
+    """
+    stages = preset_stages(settings)
+    gain = None
+    if stages and stages[-1][1] in ('Gain', 'NumpyGain'):
+        plugin = stages.pop()[2]
+        gain_db = plugin.params['gain_db'] if isinstance(plugin, NumpyPlugin) else plugin.gain_db
+        gain = 10.0 ** (gain_db / 20.0)
+
+    digest = hashlib.blake2b(np.ascontiguousarray(audio).tobytes(), digest_size=16).hexdigest()
+    prefix = (digest, sample_rate, audio.shape)
+    keys = [prefix + tuple(key for key, _, _ in stages[:depth]) for depth in range(len(stages) + 1)]
+    reused, entry = stage_cache.deepest(keys)
+    if entry is None:
+        entry = [audio, None]
+
+    for depth in range(reused, len(stages)):
+        _, name, stage = stages[depth]
+        started = time.perf_counter()
+        with timer.stage('pitch' if name == 'pitch' else 'board'):
+            out = stage(entry[0], sample_rate)
+        if name != 'pitch':
+            timer.add_effect(name, time.perf_counter() - started)
+        entry = stage_cache.put(keys[depth + 1], out)
+    if reused:
+        print(f"[Divine Effects] Reused {reused} of {len(stages)} stages from the stage cache", file=sys.stderr)
+
+    with timer.stage('normalize'):
+        if entry[1] is None:
+            entry[1] = float(np.max(np.abs(entry[0]))) if entry[0].size else 0.0
+        factor = gain if gain is not None else 1.0
+        peak = entry[1] * factor
+        if peak > 0.95:
+            factor *= 0.95 / peak
+        effected = entry[0] * np.float32(factor)
+    return effected, peak, reused
+
+
+# Settings each chain plugin is built from (see build_effects), by plugin type
+STAGE_SETTINGS = {
+    'PitchShift': ('pitch',),
+    'Reverb': IMPULSE_SETTINGS[:3],
+    'NumpyReverb': IMPULSE_SETTINGS[:3],
+    'HalfRateReverb': IMPULSE_SETTINGS[:3],
+    'Delay': IMPULSE_SETTINGS[3:],
+    'NumpyDelay': IMPULSE_SETTINGS[3:],
+    'ConvolutionReverb': IMPULSE_SETTINGS,
+    'Chorus': ('chorusRate', 'chorusDepth', 'chorusMix'),
+    'NumpyChorus': ('chorusRate', 'chorusDepth', 'chorusMix'),
+    'Gain': ('volume',),
+    'NumpyGain': ('volume',),
+}
+
+
+def stage_key(name, normalized):
+    """Hashable plugin type + the normalized settings it was built from"""
+    return (name,) + tuple((setting, normalized[setting]) for setting in STAGE_SETTINGS[name])
+
+
+def preset_stages(settings):
+    """
+    The processing stages of one preset after decoding, as (key, name,
+    function(audio, sample_rate)) tuples. Presets whose stage lists start
+    with the same keys share the output of those stages.
+    """
+    stages = []
+    pitch_semitones = settings.get('pitch', -2)
+    pitch_engine = resolve_pitch_engine(settings)
+    if pitch_semitones != 0 and pitch_engine in ('vocoder', 'resample'):
+        shift = apply_pitch_shift_manual if pitch_engine == 'vocoder' else apply_pitch_shift_resample
+
+        def pitch(audio, sample_rate):
+            try:
+                return shift(audio, sample_rate, pitch_semitones)
+            except ImportError:
+                print("[Divine Effects] scipy not available, skipping pitch shift", file=sys.stderr)
+                return audio
+        stages.append((('pitch', pitch_engine, float(pitch_semitones)), 'pitch', pitch))
+
+    board = CHAIN_CACHE.get(settings, include_pitch=pitch_engine == 'pedalboard')
+    normalized = normalize_settings(settings)
+    for plugin in board:
+        name = type(plugin).__name__
+        stages.append((stage_key(name, normalized), name, plugin))
+    return stages
+
+
+def resolve_presets(presets, output_template=None):
+    """
+    Turn a preset list into [{'name', 'output', 'settings'}]. Entries are
+    either {"name", "output", "settings"} objects or bare settings dicts
+    (optionally with "name"/"output" keys). Missing outputs come from
+    output_template: "{name}"/"{index}" placeholders are filled in, otherwise
+    "-<name>" is added before the extension.
+    """
+    resolved = []
+    for index, preset in enumerate(presets):
+        if not isinstance(preset, dict):
+            raise ValueError(f"preset {index} must be a JSON object")
+        if 'settings' in preset:
+            settings = dict(preset['settings'] or {})
+        else:
+            settings = {k: v for k, v in preset.items() if k not in ('name', 'output')}
+        name = str(preset.get('name', index))
+        output = preset.get('output')
+        if not output:
+            if not output_template or output_template == '-':
+                raise ValueError(f"preset {name} needs an \"output\" path")
+            if '{name}' in output_template or '{index}' in output_template:
+                output = output_template.replace('{name}', name).replace('{index}', str(index))
+            else:
+                stem, ext = os.path.splitext(output_template)
+                output = f"{stem}-{name}{ext or '.wav'}"
+        if output == '-':
+            raise ValueError("presets can't be written to stdout")
+        resolved.append({'name': name, 'output': output, 'settings': settings})
+    return resolved
+
+
+def apply_divine_effects_presets(input_path, presets, render_cache=None):
+    """
+    Render one input with several presets ([{'name', 'output', 'settings'}],
+    see resolve_presets). The input is decoded once and the presets form a
+    trie of stages: pitch shift, then each board plugin, keyed by parameters.
+    A stage shared by several presets (e.g. the same pitch shift and reverb
+    with different volumes) runs once, and only the differing tails run per
+    preset. Returns {'presets': [...], 'stagesRun', 'stagesTotal', 'timings'}.
+    """
+    timer = StageTimer('presets')
+    input_settings = presets[0]['settings'] if presets else {}
+    with timer.stage('decode'):
+        audio, sample_rate, num_channels = read_audio(input_path, input_settings)
+    timer.audio_seconds = audio.shape[1] / sample_rate
+    print(f"[Divine Effects] Loaded audio: {sample_rate}Hz, {num_channels} channels, {len(presets)} presets", file=sys.stderr)
+
+    results = [{'name': p['name'], 'output': p['output'], 'cached': False} for p in presets]
+    pending = []
+    cache_keys = {}
+    for index, preset in enumerate(presets):
+        preset['settings'], results[index]['quality'] = resolve_quality(
+            preset['settings'], timer.audio_seconds, sample_rate, num_channels)
+        output_format = preset['settings'].get('outputFormat', 'wav')
+        if output_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown outputFormat: {output_format}")
+        if render_cache:
+            with timer.stage('cacheLookup'):
+                cache_keys[index] = render_cache.key(audio, sample_rate, preset['settings'], output_format)
+                hit = render_cache.fetch(cache_keys[index], preset['output'])
+            if hit:
+                results[index]['cached'] = True
+                envelope = envelope_format(preset['settings'], preset['output'])
+                if envelope:
+                    with timer.stage('envelope'):
+                        results[index]['envelope'] = write_envelope_from_render(
+                            preset['output'], envelope, output_format, sample_rate, num_channels)
+                continue
+        pending.append(index)
+
+    with timer.stage('chainSetup'):
+        stages = {index: trim_stages(presets[index]['settings']) + preset_stages(presets[index]['settings'])
+                  for index in pending}
+    stages_run = 0
+
+    def finish(index, effected):
+        preset = presets[index]
+        with timer.stage('normalize'):
+            max_val = np.max(np.abs(effected))
+            if max_val > 0.95:
+                effected = effected * (0.95 / max_val)  # copy: other presets may still use this buffer
+        with timer.stage('encode'):
+            encoded = write_audio(preset['output'], effected, sample_rate, preset['settings'].get('outputFormat', 'wav'))
+        envelope = envelope_format(preset['settings'], preset['output'])
+        if envelope:
+            with timer.stage('envelope'):
+                results[index]['envelope'] = write_envelope_for(preset['output'], effected, sample_rate, envelope)
+        if index in cache_keys:
+            with timer.stage('cacheStore'):
+                render_cache.store(cache_keys[index], rendered_path=preset['output'], data=encoded)
+        print(f"[Divine Effects] Preset {preset['name']} saved to: {preset['output']}", file=sys.stderr)
+
+    def run(audio, depth, group):
+        nonlocal stages_run
+        branches = OrderedDict()
+        for index in group:
+            if len(stages[index]) == depth:
+                finish(index, audio)
+            else:
+                branches.setdefault(stages[index][depth][0], []).append(index)
+        for members in branches.values():
+            _, name, stage = stages[members[0]][depth]
+            started = time.perf_counter()
+            with timer.stage(name if name in ('trim', 'pitch') else 'board'):
+                out = stage(audio, sample_rate)
+            if name not in ('trim', 'pitch'):
+                timer.add_effect(name, time.perf_counter() - started)
+            stages_run += 1
+            run(out, depth + 1, members)
+
+    run(audio, 0, pending)
+
+    stages_total = sum(len(stage_list) for stage_list in stages.values())
+    print(f"[Divine Effects] Rendered {len(pending)} presets with {stages_run} of {stages_total} stages "
+          f"({len(presets) - len(pending)} from render cache)", file=sys.stderr)
+    return {'presets': results, 'stagesRun': stages_run, 'stagesTotal': stages_total, 'timings': timer.record()}
+
+
+# ---------------------------------------------------------------------------
+# Quality tiers ("quality"): cheaper chains for seats that would miss the budget
+# ---------------------------------------------------------------------------
+
+# Settings each tier overrides, best first; "full" is the chain as configured
+QUALITY_TIERS = OrderedDict([
+    ('full', {}),
+    ('balanced', {'pitchEngine': 'vocoder'}),
+    ('fast', {'pitchEngine': 'vocoder', 'chorusEnabled': False, 'reverbHalfRate': True}),
+])
+# Streams have no length up front: "auto" takes the best tier this far under real time
+STREAM_RTF_LIMIT = 0.5
+QUALITY_PROFILE_VERSION = 1
+CALIBRATION_SECONDS = 1.5
+# "auto" tier while this machine has no profile yet (calibration runs off the job path)
+UNCALIBRATED_TIER = 'full'
+# Observed renders folded in before the profile is rewritten (also saved when idle and at exit)
+QUALITY_PROFILE_SAVE_EVERY = 20
+
+
+def calibration_audio(sample_rate, num_channels, seconds=CALIBRATION_SECONDS):
+    """Voiced, syllable-shaped test signal for timing the tiers"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 130 + 20 * np.sin(2 * np.pi * 0.8 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = sum(np.sin(h * phase) / h for h in range(1, 12))
+    audio = 0.2 * voice * np.clip(np.sin(2 * np.pi * 3.0 * t), 0, None)
+    return np.repeat(audio[None, :], num_channels, axis=0).astype(np.float32)
+
+
+class QualityProfile:
+    """
+    Per-machine real-time factor of each quality tier, kept as JSON in the
+    cache directory and keyed by DSP engine, sample rate and channel count.
+    A missing entry is queued and measured on a short synthetic clip by
+    calibrate_pending() (the server's worker when idle, one tier at a time so
+    a new job waits for one tier at most, or --calibrate), not by the job that
+    asked. Whole-clip renders then refine the tier they ran at (moving
+    average); those updates are saved in batches by flush().
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_cache_dir(), 'quality-profile.json')
+        self.entries = None
+        self.pending = OrderedDict()  # key -> (settings, sample_rate, num_channels)
+        self.measured = {}  # key -> RTFs of the tiers calibrated so far
+        self.unsaved = 0
+        self.flush_at_exit = False
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                self.entries = data['entries'] if data.get('version') == QUALITY_PROFILE_VERSION else {}
+            except (OSError, ValueError, KeyError):
+                self.entries = {}
+        return self.entries
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_json_atomic(self.path, {'version': QUALITY_PROFILE_VERSION, 'entries': self.entries})
+        except OSError as e:
+            print(f"[Divine Effects] Couldn't save quality profile: {e}", file=sys.stderr)
+
+    def key(self, settings, sample_rate, num_channels):
+        return f"{resolve_dsp_engine(settings)}:{int(pitch_shift_available())}:{sample_rate}:{num_channels}"
+
+    def calibrate(self, settings, sample_rate, num_channels, stop=None):
+        """
+        Time every tier on calibration_audio (after a warm-up) and store the
+        RTFs. stop() is checked before each tier; if it is true the tiers
+        measured so far are kept for the next call and None is returned.
+        """
+        key = self.key(settings, sample_rate, num_channels)
+        rtfs = self.measured.setdefault(key, {})
+        audio = calibration_audio(sample_rate, num_channels)
+        for tier, overrides in QUALITY_TIERS.items():
+            if tier in rtfs:
+                continue
+            if stop and stop():
+                return None
+            tier_settings = dict(settings, **overrides)
+            render_serial(audio[:, :sample_rate // 4], sample_rate, tier_settings, StageTimer())
+            started = time.perf_counter()
+            render_serial(audio, sample_rate, tier_settings, StageTimer())
+            rtfs[tier] = round((time.perf_counter() - started) / CALIBRATION_SECONDS, 5)
+        del self.measured[key]
+        self._load()[key] = rtfs
+        self.pending.pop(key, None)
+        self._save()
+        self.unsaved = 0
+        print(f"[Divine Effects] Measured quality tiers ({key}): {rtfs}", file=sys.stderr)
+        return rtfs
+
+    def rtfs(self, settings, sample_rate, num_channels):
+        """RTF per tier for this machine, or None (and queued for calibration) if not measured yet"""
+        key = self.key(settings, sample_rate, num_channels)
+        entry = self._load().get(key)
+        if not entry and key not in self.pending:
+            self.pending[key] = (dict(settings), sample_rate, num_channels)
+        return entry
+
+    def calibrate_pending(self, stop=None):
+        """Measure queued keys one tier at a time until none are left or stop() is true"""
+        while self.pending and not (stop and stop()):
+            key, (settings, sample_rate, num_channels) = next(iter(self.pending.items()))
+            try:
+                self.calibrate(settings, sample_rate, num_channels, stop=stop)
+            except Exception as e:
+                self.pending.pop(key, None)
+                self.measured.pop(key, None)
+                print(f"[Divine Effects] Quality calibration failed ({key}): {e}", file=sys.stderr)
+
+    def observe(self, settings, sample_rate, num_channels, tier, rtf):
+        """Fold a measured render into the profile (only once it has been calibrated)"""
+        entry = self._load().get(self.key(settings, sample_rate, num_channels))
+        if entry and tier in entry:
+            entry[tier] = round(0.7 * entry[tier] + 0.3 * rtf, 5)
+            if not self.flush_at_exit:
+                atexit.register(self.flush)
+                self.flush_at_exit = True
+            self.unsaved += 1
+            if self.unsaved >= QUALITY_PROFILE_SAVE_EVERY:
+                self.flush()
+
+    def flush(self):
+        """Save observations folded in since the last save"""
+        if self.unsaved:
+            self._save()
+            self.unsaved = 0
+
+
+QUALITY_PROFILE = QualityProfile()
+
+
+def resolve_quality(settings, audio_seconds, sample_rate, num_channels, streaming=False):
+    """
+    Settings for the quality tier a job runs at, and the tier's name.
+    "quality" is "full", "balanced", "fast" or "auto". With a "latencyBudgetMs",
+    "auto" takes the best tier whose predicted render time (this machine's RTF
+    for the tier x clip length, divided among parallel segments) fits the
+    budget, else "fast"; without one it means "full". Streams take the best
+    tier under STREAM_RTF_LIMIT instead. Before the tiers are measured,
+    "auto" is UNCALIBRATED_TIER.
+    """
+    quality = settings.get('quality', 'auto')
+    if quality not in QUALITY_TIERS and quality != 'auto':
+        print(f"[Divine Effects] Unknown quality '{quality}', using auto", file=sys.stderr)
+        quality = 'auto'
+    budget_ms = settings.get('latencyBudgetMs')
+    if quality == 'auto' and not budget_ms:
+        quality = 'full'
+
+    rtfs = QUALITY_PROFILE.rtfs(settings, sample_rate, num_channels) if quality == 'auto' else None
+    if quality == 'auto' and rtfs is None:
+        quality = UNCALIBRATED_TIER
+        print(f"[Divine Effects] Quality: {quality} (tiers not measured yet on this machine)", file=sys.stderr)
+    if quality == 'auto':
+        parallel = 1
+        if not streaming and segment_workers(settings) > 1 and (
+                settings.get('parallel') not in (None, 'auto') or audio_seconds >= PARALLEL_AUTO_SECONDS):
+            # Segments share the work, less the pre-roll each one repeats
+            parallel = max(1.0, min(segment_workers(settings), audio_seconds // MIN_SEGMENT_SECONDS) * 0.8)
+        quality = 'fast'
+        for tier in QUALITY_TIERS:
+            rtf = rtfs.get(tier, float('inf'))
+            fits = rtf < STREAM_RTF_LIMIT if streaming else rtf * audio_seconds * 1000 / parallel <= budget_ms
+            if fits:
+                quality = tier
+                break
+        if streaming:
+            print(f"[Divine Effects] Quality: {quality} (RTF {rtfs.get(quality)})", file=sys.stderr)
+        else:
+            print(f"[Divine Effects] Quality: {quality} (predicted {rtfs.get(quality, 0) * audio_seconds * 1000 / parallel:.0f}ms "
+                  f"for {audio_seconds:.1f}s, budget {budget_ms}ms)", file=sys.stderr)
+
+    return dict(settings, **QUALITY_TIERS[quality]), quality
+
+
+# ---------------------------------------------------------------------------
+# Silence trimming ("trimSilence"): less audio through the chain, speech sooner
+# ---------------------------------------------------------------------------
+
+# Silence kept before the first word, so soft onsets aren't clipped
+TRIM_LEAD_SECONDS = 0.06
+TRIM_FRAME_SECONDS = 0.02
+MAX_TAIL_SECONDS = 8.0
+
+
+def reverb_tail_seconds(settings, floor_db=60.0):
+    """
+    How long reverb and echo ring after the input stops: the time the
+    longest Freeverb comb takes to decay by floor_db (damping ignored, so
+    this errs long), then the echo decaying by the same amount. At most 8s.
+    """
+    feedback = min(settings.get('reverbRoom', 0.85) * 0.28 + 0.7, 0.999)
+    comb_seconds = (1617 + 23) / 44100.0  # longest comb + stereo spread, scaled to any rate
+    seconds = comb_seconds * floor_db / -(20 * np.log10(feedback))
+
+    echo_delay = settings.get('echoDelay', 120) / 1000.0
+    echo_feedback = settings.get('echoFeedback', 0.2)
+    if echo_delay > 0 and settings.get('echoMix', 0.15) > 0:
+        if echo_feedback >= 1:
+            return MAX_TAIL_SECONDS
+        if echo_feedback > 0:
+            seconds += echo_delay * (1 + floor_db / -(20 * np.log10(echo_feedback)))
+        else:
+            seconds += echo_delay
+    return min(seconds, MAX_TAIL_SECONDS)
+
+
+def trim_silence(audio, sample_rate, settings):
+    """
+    Drop silence the chain would otherwise process: leading silence (but
+    TRIM_LEAD_SECONDS), pauses longer than "maxPauseMs" (shortened to that,
+    keeping both ends), and trailing silence beyond the reverb tail.
+    Silence is any 20ms frame whose RMS is "silenceDb" below the loudest one.
+    Returns (audio, removed_frames).
+    """
+    total = audio.shape[1]
+    hop = max(1, int(sample_rate * TRIM_FRAME_SECONDS))
+    frames = -(-total // hop)
+    padded = np.zeros((audio.shape[0], frames * hop), dtype=np.float32)
+    padded[:, :total] = audio
+    power = np.square(padded).reshape(audio.shape[0], frames, hop).mean(axis=(0, 2))
+    loud = power > np.max(power) * 10 ** (settings.get('silenceDb', -45) / 10)
+    if not loud.any():
+        return audio, 0
+
+    # Silent runs [start, end) in frames
+    edges = np.diff(np.concatenate(([1], loud, [1])).astype(np.int8))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+
+    max_pause = int(settings.get('maxPauseMs', 400) / 1000.0 * sample_rate / hop)
+    lead = int(np.ceil(TRIM_LEAD_SECONDS * sample_rate / hop))
+    tail = int(np.ceil(reverb_tail_seconds(settings) * sample_rate / hop))
+    # Inner pauses keep their first and last halves
+    drop_start = starts + (max_pause + 1) // 2
+    drop_end = ends - max_pause // 2
+    leading = starts == 0
+    drop_start[leading], drop_end[leading] = 0, ends[leading] - lead
+    trailing = ends == frames
+    drop_start[trailing], drop_end[trailing] = starts[trailing] + tail, frames
+    valid = drop_end > drop_start
+    if not valid.any():
+        return audio, 0
+
+    marks = np.zeros(frames + 1, dtype=np.int32)
+    np.add.at(marks, drop_start[valid], 1)
+    np.add.at(marks, drop_end[valid], -1)
+    keep = np.repeat(np.cumsum(marks[:-1]) == 0, hop)[:total]
+    trimmed = audio[:, keep]
+    return trimmed, total - trimmed.shape[1]
+
+
+def trim_stages(settings):
+    """The trim pre-pass as a preset stage list (see preset_stages); empty when off"""
+    if not settings.get('trimSilence', False):
+        return []
+
+    def trim(audio, sample_rate):
+        trimmed, removed = trim_silence(audio, sample_rate, settings)
+        print(f"[Divine Effects] Trimmed {removed} silent samples ({removed / sample_rate:.2f}s)", file=sys.stderr)
+        return trimmed
+    key = ('trim', float(settings.get('silenceDb', -45)), float(settings.get('maxPauseMs', 400)),
+           round(reverb_tail_seconds(settings), 3))
+    return [(key, 'trim', trim)]
+
+
+# ---------------------------------------------------------------------------
+# Envelope sidecar ("envelope"): per-frame loudness for UI animation
+# ---------------------------------------------------------------------------
+
+# One RMS/peak pair per frame of output audio
+ENVELOPE_FRAME_SECONDS = 0.02
+ENVELOPE_FORMATS = ('json', 'f16')
+
+
+def envelope_format(settings, output_path):
+    """The sidecar format asked for ("envelope": true/"json" or "f16"), or None"""
+    fmt = settings.get('envelope', False)
+    if fmt is True:
+        fmt = 'json'
+    if not fmt:
+        return None
+    if fmt not in ENVELOPE_FORMATS:
+        print(f"[Divine Effects] Unknown envelope format '{fmt}', not writing one", file=sys.stderr)
+        return None
+    if output_path == '-':
+        print("[Divine Effects] Envelope sidecar needs an output file, not writing one", file=sys.stderr)
+        return None
+    return fmt
+
+
+def envelope_path(output_path, fmt):
+    """out.wav -> out.envelope.json / out.envelope.f16"""
+    return f"{os.path.splitext(output_path)[0]}.envelope.{fmt}"
+
+
+class EnvelopeTracker:
+    """
+    RMS and peak of the output per ENVELOPE_FRAME_SECONDS frame, over all
+    channels. add() takes the audio as it is written (the whole clip, or the
+    block path's blocks) and carries a partial frame to the next call, so no
+    extra pass over the output file is needed. finish() closes the last,
+    shorter frame and returns (rms, peak) as float32 arrays.
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.hop = max(1, int(round(sample_rate * ENVELOPE_FRAME_SECONDS)))
+        self.rms = []
+        self.peak = []
+        self.carry = None
+
+    def _append(self, frames):
+        # frames: (channels, n, length); einsum and max/min avoid full-size temporaries
+        power = np.einsum('cnh,cnh->n', frames, frames) / (frames.shape[0] * frames.shape[2])
+        self.rms.append(np.sqrt(power).astype(np.float32))
+        self.peak.append(np.abs(np.maximum(frames.max(axis=(0, 2)), -frames.min(axis=(0, 2)))))
+
+    def add(self, audio):
+        if self.carry is not None:
+            need = self.hop - self.carry.shape[1]
+            self.carry = np.concatenate([self.carry, audio[:, :need]], axis=1)
+            audio = audio[:, need:]
+            if self.carry.shape[1] < self.hop:
+                return
+            self._append(self.carry[:, None, :])
+            self.carry = None
+        n_frames = audio.shape[1] // self.hop
+        if n_frames:
+            self._append(audio[:, :n_frames * self.hop].reshape(audio.shape[0], n_frames, self.hop))
+        if audio.shape[1] > n_frames * self.hop:
+            self.carry = audio[:, n_frames * self.hop:].copy()
+
+    def finish(self):
+        if self.carry is not None:
+            self._append(self.carry[:, None, :])
+            self.carry = None
+        if not self.rms:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(self.rms), np.concatenate(self.peak).astype(np.float32, copy=False)
+
+
+def write_envelope(output_path, tracker, fmt):
+    """
+    Write the sidecar next to output_path and return its path.
+    "json": {"frameMs", "sampleRate", "frames", "rms": [...], "peak": [...]}
+    (linear, 0-1 of full scale); "f16": little-endian float16 rms, peak pairs,
+    one per ENVELOPE_FRAME_SECONDS frame, with no header.
+    """
+    rms, peak = tracker.finish()
+    path = envelope_path(output_path, fmt)
+    if fmt == 'json':
+        write_json_atomic(path, {
+            'frameMs': ENVELOPE_FRAME_SECONDS * 1000,
+            'sampleRate': tracker.sample_rate,
+            'frames': len(rms),
+            'rms': rms.astype(np.float64).round(4).tolist(),
+            'peak': peak.astype(np.float64).round(4).tolist(),
+        })
+    else:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.stack([rms, peak], axis=1).astype('<f2').tobytes())
+        os.replace(tmp_path, path)
+    return path
+
+
+def write_envelope_for(output_path, audio, sample_rate, fmt):
+    """EnvelopeTracker + write_envelope for a whole rendered clip"""
+    tracker = EnvelopeTracker(sample_rate)
+    tracker.add(audio)
+    return write_envelope(output_path, tracker, fmt)
+
+
+def write_envelope_from_render(output_path, fmt, output_format, sample_rate, num_channels):
+    """Sidecar for a render-cache hit: decode the copied render (no chain ran to track it)"""
+    with open(output_path, 'rb') as f:
+        audio, sample_rate, _ = decode_audio_bytes(f.read(), {
+            'inputFormat': output_format, 'inputSampleRate': sample_rate, 'inputChannels': num_channels})
+    return write_envelope_for(output_path, audio, sample_rate, fmt)
+
+
+# ---------------------------------------------------------------------------
+# Parallel segments: long clips split at pauses and rendered across processes
+# ---------------------------------------------------------------------------
+
+# Clips at least this long are split across worker processes ("parallel": "auto")
+PARALLEL_AUTO_SECONDS = 20
+# Shortest segment worth a worker (each one re-renders its pre-roll on top)
+MIN_SEGMENT_SECONDS = 8
+# Crossfade where two segments meet; both sides have full context there
+JOIN_FADE_SECONDS = 0.02
+
+
+def segment_workers(settings):
+    """Worker processes for one render: "parallel" false, true/"auto" (CPU count) or a number"""
+    mode = settings.get('parallel')
+    if mode is False:
+        return 1
+    if mode is True or mode in (None, 'auto'):
+        return os.cpu_count() or 1
+    if isinstance(mode, (int, float)) or (isinstance(mode, str) and mode.isdigit()):
+        return max(1, int(mode))
+    raise ValueError(f'Invalid "parallel" setting: {mode!r} (expected true, false, "auto" or a worker count)')
+
+
+def segment_preroll_frames(settings, sample_rate):
+    """
+    Input each segment renders before its first kept frame, so reverb, echo
+    and chorus state at the join matches the serial render: the reverb tail
+    plus pitch shifter and chorus windows.
+    """
+    return int((reverb_tail_seconds(settings) + 0.25) * sample_rate)
+
+
+def plan_segments(audio, sample_rate, settings):
+    """
+    Split a clip for parallel rendering into (start, cut, end) frame ranges:
+    input start..end is rendered and its output from cut on is kept. Cuts sit
+    on the quietest 20ms frame near even split points. start is at least the
+    pre-roll before cut and on a whole chorus LFO period, since each segment's
+    chorus restarts at the phase the serial render had at frame 0 (less the
+    float32 phase drift of JUCE's LFO, which NumpyChorus reproduces).
+    A single range means the clip renders serially.
+    """
+    total = audio.shape[1]
+    whole = [(0, 0, total)]
+    workers = segment_workers(settings)
+    if workers < 2:
+        return whole
+    if settings.get('parallel') in (None, 'auto') and total < PARALLEL_AUTO_SECONDS * sample_rate:
+        return whole
+    if resolve_pitch_engine(settings) == 'resample':
+        return whole  # changes duration, so output frames don't line up with input frames
+    count = min(workers, int(total / (MIN_SEGMENT_SECONDS * sample_rate)))
+    if count < 2:
+        return whole
+
+    hop = max(1, int(sample_rate * 0.02))
+    frames = total // hop
+    energy = np.square(audio[:, :frames * hop]).reshape(audio.shape[0], frames, hop).mean(axis=(0, 2))
+    search = max(1, frames // count // 3)
+    cuts = [0]
+    for k in range(1, count):
+        target = k * frames // count
+        lo, hi = max(target - search, 1), min(target + search, frames - 1)
+        cuts.append((lo + int(np.argmin(energy[lo:hi]))) * hop)
+
+    preroll = segment_preroll_frames(settings, sample_rate)
+    rate = settings.get('chorusRate', 0.4)
+    period = sample_rate / rate if settings.get('chorusEnabled', True) and rate > 0 else 1.0
+    fade = int(JOIN_FADE_SECONDS * sample_rate)
+    segments = []
+    for k, cut in enumerate(cuts):
+        end = min(cuts[k + 1] + fade, total) if k + 1 < count else total
+        start = 0 if k == 0 else max(0, int(round(np.floor((cut - preroll) / period) * period)))
+        segments.append((start, cut, end))
+    return segments
+
+
+# Pool kept between renders (server mode), as (workers, executor)
+_segment_pool = None
+
+
+def pool_context():
+    """
+    Start method for worker pools. Not fork: server mode runs reader and
+    worker threads, and forking a threaded process can copy a held lock.
+    forkserver forks from a clean single-threaded process (spawn where missing).
+    """
+    import multiprocessing
+
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def segment_pool(workers):
+    """Process pool for segment rendering, created on first use and resized when needed"""
+    global _segment_pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    if _segment_pool is None or _segment_pool[0] != workers:
+        if _segment_pool is not None:
+            _segment_pool[1].shutdown()
+        _segment_pool = (workers, ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                                      initializer=configure_cache_dir,
+                                                      initargs=(_configured_cache_dir,)))
+    return _segment_pool[1]
+
+
+def _render_segment(audio, sample_rate, settings, skip):
+    """Run one segment through the chain in a pool worker; drops the first `skip` output frames"""
+    started = time.perf_counter()
+    for _, _, stage in preset_stages(settings):
+        audio = stage(audio, sample_rate)
+    return audio[:, skip:], time.perf_counter() - started
+
+
+def render_segments(audio, sample_rate, settings, segments):
+    """
+    Render planned segments in parallel and stitch them into one output the
+    size of the input (before normalization). Returns (output, summary).
+    """
+    workers = min(len(segments), segment_workers(settings))
+    pool = segment_pool(workers)
+    futures = [pool.submit(_render_segment, audio[:, start:end], sample_rate, settings, cut - start)
+               for start, cut, end in segments]
+
+    output = np.empty(audio.shape, dtype=np.float32)
+    worker_seconds = 0.0
+    for k, ((start, cut, end), future) in enumerate(zip(segments, futures)):
+        part, seconds = future.result()
+        worker_seconds += seconds
+        if k:
+            # The previous segment already wrote its last fade frames past this cut
+            fade = segments[k - 1][2] - cut
+            ramp = np.linspace(0.0, 1.0, fade, endpoint=False, dtype=np.float32)
+            part[:, :fade] = output[:, cut:cut + fade] * (1 - ramp) + part[:, :fade] * ramp
+        output[:, cut:end] = part
+
+    rendered = sum(end - start for start, _, end in segments)
+    summary = {
+        'count': len(segments),
+        'workers': workers,
+        'cuts': [round(cut / sample_rate, 3) for _, cut, _ in segments[1:]],
+        'overhead': round(rendered / audio.shape[1] - 1, 3),
+        'workerMs': round(worker_seconds * 1000, 1),
+    }
+    return output, summary
+
+
+class LookaheadLimiter:
+    """
+    Streaming peak limiter used instead of whole-file normalization.
+
+    Audio is split into short hops. The gain at each hop boundary is low enough
+    for the peaks of both neighbouring hops, so it is already down when a
+    transient arrives, and recovers with an exponential release. Gain is
+    interpolated linearly inside a hop. Output lags input by about one hop.
+    """
+
+    def __init__(self, sample_rate, num_channels, ceiling=0.95, lookahead_ms=3.0, release_ms=80.0):
+        self.ceiling = ceiling
+        self.hop = max(16, int(sample_rate * lookahead_ms / 1000.0))
+        self.release = 1.0 - np.exp(-self.hop / (sample_rate * release_ms / 1000.0))
+        self.ramp = np.arange(self.hop, dtype=np.float32) / self.hop
+        self.pending = np.zeros((num_channels, 0), dtype=np.float32)
+        self.gain = None           # gain at the start of the first pending hop
+        self.max_reduction = 1.0   # lowest gain applied so far (for logging)
+
+    def _emit(self, buf, n_hops):
+        """Limit the first n_hops - 1 hops of buf; the last hop is the lookahead."""
+        emit_hops = n_hops - 1
+        hops = buf[:, :n_hops * self.hop].reshape(buf.shape[0], n_hops, self.hop)
+        peaks = np.abs(hops).max(axis=(0, 2))
+        with np.errstate(divide='ignore'):
+            targets = np.minimum(1.0, self.ceiling / np.maximum(peaks[:-1], peaks[1:]))
+
+        if self.gain is None:
+            self.gain = min(1.0, self.ceiling / peaks[0]) if peaks[0] > 0 else 1.0
+
+        gains = np.empty(emit_hops + 1, dtype=np.float32)
+        gains[0] = g = self.gain
+        for k in range(emit_hops):
+            g = min(targets[k], g + self.release * (1.0 - g))
+            gains[k + 1] = g
+        self.gain = g
+        self.max_reduction = min(self.max_reduction, float(gains.min()))
+
+        curve = gains[:-1, None] + (gains[1:] - gains[:-1])[:, None] * self.ramp[None, :]
+        return hops[:, :emit_hops, :].reshape(buf.shape[0], -1) * curve.reshape(1, -1)
+
+    def process(self, block):
+        """Feed a (channels, frames) block, returns whatever limited audio is ready"""
+        buf = np.concatenate([self.pending, block], axis=1) if self.pending.shape[1] else block
+        n_hops = buf.shape[1] // self.hop
+        if n_hops < 2:
+            self.pending = buf
+            return buf[:, :0]
+        out = self._emit(buf, n_hops)
+        self.pending = buf[:, (n_hops - 1) * self.hop:]
+        return out
+
+    def flush(self):
+        """Return the remaining delayed audio"""
+        remaining = self.pending.shape[1]
+        if remaining == 0:
+            return self.pending
+        n_hops = -(-remaining // self.hop) + 1
+        buf = np.zeros((self.pending.shape[0], n_hops * self.hop), dtype=np.float32)
+        buf[:, :remaining] = self.pending
+        self.pending = self.pending[:, :0]
+        return self._emit(buf, n_hops)[:, :remaining]
+
+
+class BlockChain:
+    """
+    Pitch shifter -> board -> limiter, driven one block at a time.
+
+    Reverb, delay and chorus state carries across blocks (reset=False) and the
+    LookaheadLimiter replaces whole-clip normalization, so working memory is a
+    few blocks regardless of clip length. flush() drains the shifter and plugin
+    latency with silence; output has exactly as many frames as the input.
+    """
+
+    def __init__(self, settings, sample_rate, num_channels, pitch_engine='vocoder', timer=None):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.timer = timer or StageTimer('block')
+        self.shifter = None
+        pitch_semitones = settings.get('pitch', -2)
+        if pitch_semitones != 0 and pitch_engine != 'pedalboard':
+            self.shifter = PhaseVocoderPitchShifter(sample_rate, num_channels, pitch_semitones)
+            print(f"[Divine Effects] Block pitch shift: {pitch_semitones} semitones (vocoder)", file=sys.stderr)
+        self.board = CHAIN_CACHE.get(settings, include_pitch=pitch_engine == 'pedalboard')
+        self.limiter = LookaheadLimiter(sample_rate, num_channels)
+        self.frames_in = 0
+        self.frames_out = 0
+        self.board_frames = 0
+
+    def _run_board(self, audio):
+        # Plugin state carries across blocks, so the board runs as a whole here
+        with self.timer.stage('board'):
+            out = self.board(audio, self.sample_rate, reset=False)
+        self.board_frames += out.shape[1]
+        with self.timer.stage('normalize'):
+            limited = self.limiter.process(out)[:, :self.frames_in - self.frames_out]
+        self.frames_out += limited.shape[1]
+        return limited
+
+    def process(self, block):
+        """Feed a (channels, frames) block, returns whatever output is ready"""
+        self.frames_in += block.shape[1]
+        if self.shifter:
+            with self.timer.stage('pitch'):
+                block = self.shifter.process(block)
+        return self._run_board(block)
+
+    def flush(self, block_frames=1024):
+        """Yield the remaining output blocks"""
+        if self.shifter:
+            with self.timer.stage('pitch'):
+                tail = self.shifter.flush()
+            yield self._run_board(tail)
+        silence = np.zeros((self.num_channels, block_frames), dtype=np.float32)
+        for _ in range(1000):
+            if self.board_frames >= self.frames_in:
+                break
+            yield self._run_board(silence)
+        with self.timer.stage('normalize'):
+            tail = self.limiter.flush()[:, :self.frames_in - self.frames_out]
+        self.frames_out += tail.shape[1]
+        yield tail
+
+
+def stream_divine_effects(settings, sample_rate, num_channels, in_stream=None, out_stream=None, block_frames=1024):
+    """
+    Apply divine effects to a raw PCM stream (s16le, interleaved) as it arrives.
+
+    Blocks go through a BlockChain and are written immediately. Pitch is
+    shifted with PhaseVocoderPitchShifter (about one frame of latency) rather
+    than PitchShift. Returns the stage timing record.
+    """
+    in_stream = in_stream or sys.stdin.buffer
+    out_stream = out_stream or sys.stdout.buffer
+    frame_bytes = 2 * num_channels
+    block_bytes = block_frames * frame_bytes
+
+    timer = StageTimer('stream')
+    settings, timer.quality = resolve_quality(settings, None, sample_rate, num_channels, streaming=True)
+    chain = BlockChain(settings, sample_rate, num_channels, pitch_engine=resolve_pitch_engine(settings, streaming=True),
+                       timer=timer)
+    first_input = None
+    first_output = None
+    first_output_frames = 0
+    leftover = b''
+
+    def write(audio):
+        nonlocal first_output, first_output_frames
+        if audio.shape[1] == 0:
+            return
+        if first_output is None:
+            first_output = time.perf_counter()
+            first_output_frames = chain.frames_in
+        with timer.stage('encode'):
+            out_stream.write(float_to_pcm16(audio))
+            out_stream.flush()
+
+    read = getattr(in_stream, 'read1', in_stream.read)
+    while True:
+        data = read(block_bytes - len(leftover))
+        if not data:
+            break
+        if first_input is None:
+            first_input = time.perf_counter()
+        data = leftover + data
+        usable = len(data) - len(data) % frame_bytes
+        leftover = data[usable:]
+        if usable:
+            with timer.stage('decode'):
+                block = pcm16_to_float(data[:usable], num_channels)
+            write(chain.process(block))
+
+    for block in chain.flush(block_frames):
+        write(block)
+
+    if first_output is not None:
+        print(f"[Divine Effects] Streamed {chain.frames_in} frames, first audio after "
+              f"{(first_output - first_input) * 1000:.1f}ms / "
+              f"{first_output_frames * 1000 / sample_rate:.1f}ms of input "
+              f"(block {block_frames * 1000 / sample_rate:.1f}ms)", file=sys.stderr)
+    if chain.limiter.max_reduction < 1.0:
+        print(f"[Divine Effects] Limiter max gain reduction: {20 * np.log10(chain.limiter.max_reduction):.1f}dB", file=sys.stderr)
+    timer.audio_seconds = chain.frames_in / sample_rate
+    record = timer.record()
+    if first_output is not None:
+        record['firstAudioMs'] = round((first_output - first_input) * 1000, 2)
+    return record
+
+
+# Clips at least this long take the bounded-memory block path ("lowMemory": "auto")
+LOW_MEMORY_AUTO_SECONDS = 60
+
+
+def wants_low_memory(input_path, settings):
+    """Decide between the whole-clip path and apply_divine_effects_blockwise"""
+    mode = settings.get('lowMemory')
+    if mode is True or mode is False:
+        return mode
+    if mode not in (None, 'auto'):
+        raise ValueError(f'Invalid "lowMemory" setting: {mode!r} (expected true, false or "auto")')
+    if segment_workers(settings) > 1:
+        return False  # long clips take the parallel segment path instead
+    if input_path == '-' or settings.get('inputFormat', 'auto') not in ('auto', 'wav'):
+        return False
+    try:
+        if load_pedalboard():
+            with AudioFile(input_path) as f:
+                return f.duration >= LOW_MEMORY_AUTO_SECONDS
+        with wave.open(input_path, 'rb') as w:
+            return w.getnframes() / w.getframerate() >= LOW_MEMORY_AUTO_SECONDS
+    except Exception:
+        return False
+
+
+def apply_divine_effects_blockwise(input_path, output_path, settings, block_frames=8192):
+    """
+    Bounded-memory variant of apply_divine_effects for long answers.
+
+    Reads, processes and writes fixed-size blocks through a BlockChain; the
+    LookaheadLimiter stands in for whole-clip normalization, so no full-size
+    copy of the audio is ever held. Peak memory is independent of clip length
+    (stdin input is still read whole, since the WAV has to arrive first).
+    """
+    output_format = settings.get('outputFormat', 'wav')
+    timer = StageTimer('blockwise')
+    if settings.get('trimSilence', False):
+        print("[Divine Effects] trimSilence needs the whole clip, not trimming block-wise", file=sys.stderr)
+
+    if input_path == '-':
+        with timer.stage('decode'):
+            audio, sample_rate, num_channels = read_audio(input_path, settings)
+        total_frames = audio.shape[1]
+        blocks = (audio[:, i:i + block_frames] for i in range(0, total_frames, block_frames))
+        source = None
+    elif load_pedalboard():
+        source = AudioFile(input_path)
+        sample_rate, num_channels, total_frames = source.samplerate, source.num_channels, source.frames
+        blocks = (source.read(block_frames) for _ in range(0, total_frames, block_frames))
+    else:
+        source = wave.open(input_path, 'rb')
+        sample_rate, num_channels, total_frames = source.getframerate(), source.getnchannels(), source.getnframes()
+        if source.getsampwidth() != 2:
+            source.close()
+            raise ValueError("Block processing without pedalboard needs 16-bit WAV input")
+        blocks = (pcm16_to_float(source.readframes(block_frames), num_channels)
+                  for _ in range(0, total_frames, block_frames))
+    timer.audio_seconds = total_frames / sample_rate
+    settings, timer.quality = resolve_quality(settings, timer.audio_seconds, sample_rate, num_channels)
+    # Blocks run with reset=False like a stream, where PitchShift only emits silence
+    pitch_engine = resolve_pitch_engine(settings, streaming=True)
+    if settings.get('pitch', -2) != 0 and resolve_pitch_engine(settings) != pitch_engine:
+        print("[Divine Effects] Block-wise pitch shift uses the vocoder", file=sys.stderr)
+
+    print(f"[Divine Effects] Block processing: {sample_rate}Hz, {num_channels} channels, "
+          f"{total_frames / sample_rate:.1f}s in {block_frames}-frame blocks", file=sys.stderr)
+
+    stream = None
+    if output_path != '-' and output_format == 'wav' and load_pedalboard():
+        sink = AudioFile(output_path, 'w', sample_rate, num_channels)
+        write = sink.write
+    else:
+        stream = sys.stdout.buffer if output_path == '-' else open(output_path, 'wb')
+        if output_format == 'wav':
+            # Length is known up front, so the header never needs patching (stdout can't seek)
+            sink = wave.open(stream, 'wb')
+            sink.setnchannels(num_channels)
+            sink.setsampwidth(2)
+            sink.setframerate(sample_rate)
+            sink.setnframes(total_frames)
+            write = lambda block: sink.writeframes(float_to_pcm16(block))
+        else:
+            sink = None
+            write = lambda block: stream.write(encode_audio_bytes(block, sample_rate, output_format))
+
+    envelope = envelope_format(settings, output_path)
+    if envelope:
+        # Tracked per written block, like the output itself (timed under "encode")
+        tracker = EnvelopeTracker(sample_rate)
+        encode = write
+
+        def write(block):
+            encode(block)
+            tracker.add(block)
+
+    chain = BlockChain(settings, sample_rate, num_channels, pitch_engine=pitch_engine, timer=timer)
+    try:
+        while True:
+            with timer.stage('decode'):
+                block = next(blocks, None)
+            if block is None:
+                break
+            out = chain.process(block)
+            if out.shape[1]:
+                with timer.stage('encode'):
+                    write(out)
+        for out in chain.flush(block_frames):
+            if out.shape[1]:
+                with timer.stage('encode'):
+                    write(out)
+    finally:
+        if source is not None:
+            source.close()
+        if sink is not None:
+            sink.close()
+        if stream is not None and stream is not sys.stdout.buffer:
+            stream.close()
+        elif stream is not None:
+            stream.flush()
+
+    if chain.limiter.max_reduction < 1.0:
+        print(f"[Divine Effects] Limiter max gain reduction: {20 * np.log10(chain.limiter.max_reduction):.1f}dB", file=sys.stderr)
+    print(f"[Divine Effects] Saved to: {'stdout' if output_path == '-' else output_path} ({output_format})", file=sys.stderr)
+    report = {'cached': False}
+    if envelope:
+        with timer.stage('envelope'):
+            report['envelope'] = write_envelope(output_path, tracker, envelope)
+    report['timings'] = timer.record()
+    return report
+
+
+# Seconds without a job before the server worker does background work (quality profile)
+SERVER_IDLE_SECONDS = 1.0
+
+
+class EffectsServer:
+    """
+    Long-lived job server speaking JSON lines over stdin/stdout.
+
+    stdin is read on the main thread so new jobs are acknowledged immediately;
+    a single worker thread runs the DSP so jobs finish in submission order.
+    """
+
+    def __init__(self, stdin=None, stdout=None, render_cache=None, metrics_file=None, stage_cache_bytes=64 * 1024 * 1024):
+        self.render_cache = render_cache
+        self.stage_cache = StageCache(stage_cache_bytes) if stage_cache_bytes else None
+        self.metrics_file = metrics_file
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self.jobs = queue.Queue()
+        self.write_lock = threading.Lock()
+        self.next_id = 1
+        self.worker = threading.Thread(target=self._work, name='divine-effects-worker', daemon=True)
+
+    def send(self, message):
+        """Write a single JSON reply line"""
+        with self.write_lock:
+            self.stdout.write(json.dumps(message) + '\n')
+            self.stdout.flush()
+
+    def _work(self):
+        while True:
+            idle_work = QUALITY_PROFILE.pending or QUALITY_PROFILE.unsaved
+            try:
+                job = self.jobs.get(timeout=SERVER_IDLE_SECONDS if idle_work else None)
+            except queue.Empty:
+                # Idle: save profile updates, then measure tiers "auto" jobs asked for
+                # (between tiers, a new job goes first)
+                QUALITY_PROFILE.flush()
+                QUALITY_PROFILE.calibrate_pending(stop=lambda: not self.jobs.empty())
+                continue
+            if job is None:
+                return
+            job_id = job['id']
+            started = time.perf_counter()
+            try:
+                if job.get('presets'):
+                    self._work_presets(job, started)
+                    continue
+                report = apply_divine_effects(job['input'], job['output'], job.get('settings') or {},
+                                              render_cache=self.render_cache, stage_cache=self.stage_cache)
+                if self.metrics_file:
+                    emit_timings(dict(report['timings'], id=job_id), self.metrics_file)
+                self.send({
+                    'id': job_id,
+                    'status': 'done',
+                    'output': job['output'],
+                    'cached': report['cached'],
+                    'stagesReused': report.get('stagesReused', 0),
+                    'envelope': report.get('envelope'),
+                    'elapsedMs': round((time.perf_counter() - started) * 1000, 1),
+                    'timings': report['timings'],
+                    'chainCache': CHAIN_CACHE.stats()
+                })
+            except Exception as e:
+                print(f"[Divine Effects] Job {job_id} failed: {e}", file=sys.stderr)
+                self.send({'id': job_id, 'status': 'error', 'message': str(e)})
+
+    def _work_presets(self, job, started):
+        presets = resolve_presets(job['presets'], job.get('output'))
+        report = apply_divine_effects_presets(job['input'], presets, render_cache=self.render_cache)
+        if self.metrics_file:
+            emit_timings(dict(report['timings'], id=job['id']), self.metrics_file)
+        self.send({
+            'id': job['id'],
+            'status': 'done',
+            'outputs': report['presets'],
+            'stagesRun': report['stagesRun'],
+            'stagesTotal': report['stagesTotal'],
+            'elapsedMs': round((time.perf_counter() - started) * 1000, 1),
+            'timings': report['timings'],
+            'chainCache': CHAIN_CACHE.stats()
+        })
+
+    def handle(self, line):
+        """Handle one request line. Returns False when the server should stop."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except ValueError as e:
+            self.send({'status': 'error', 'message': f'Invalid request: {e}'})
+            return True
+
+        cmd = request.get('cmd', 'process')
+        if cmd == 'ping':
+            self.send({'status': 'pong', 'id': request.get('id')})
+            return True
+        if cmd == 'stats':
+            self.send({
+                'status': 'stats',
+                'id': request.get('id'),
+                'chainCache': CHAIN_CACHE.stats(),
+                'stageCache': self.stage_cache.stats() if self.stage_cache else None,
+                'renderCache': self.render_cache.stats() if self.render_cache else None
+            })
+            return True
+        if cmd == 'shutdown':
+            return False
+        if cmd != 'process':
+            self.send({'id': request.get('id'), 'status': 'error', 'message': f'Unknown command: {cmd}'})
+            return True
+
+        job_id = request.get('id')
+        if job_id is None:
+            job_id = self.next_id
+            self.next_id += 1
+        if not request.get('input') or not (request.get('output') or request.get('presets')):
+            self.send({'id': job_id, 'status': 'error', 'message': 'Job needs "input" and "output" paths (or "presets")'})
+            return True
+        if '-' in (request['input'], request.get('output')):
+            self.send({'id': job_id, 'status': 'error', 'message': 'stdin/stdout carry the job protocol in server mode'})
+            return True
+
+        request['id'] = job_id
+        self.jobs.put(request)
+        self.send({'id': job_id, 'status': 'accepted', 'queued': self.jobs.qsize()})
+        return True
+
+    def serve(self):
+        # Import everything up front so the first job doesn't pay for it
+        load_pedalboard()
+        np.zeros(1)
+        # Queue the usual key (default chain, Piper medium) so it is measured once idle
+        QUALITY_PROFILE.rtfs(DEFAULT_SETTINGS, 22050, 1)
+        self.worker.start()
+        self.send({
+            'status': 'ready',
+            'pedalboard': load_pedalboard(),
+            'pitchShift': pitch_shift_available()
+        })
+        print("[Divine Effects] Server ready", file=sys.stderr)
+
+        for line in self.stdin:
+            line = line.strip()
+            if line and not self.handle(line):
+                break
+
+        # stdin closed or shutdown requested: finish queued jobs, then exit
+        self.jobs.put(None)
+        self.worker.join()
+        print("[Divine Effects] Server stopped", file=sys.stderr)
+
+
+def load_batch_manifest(path):
+    """
+    Read a batch manifest: a JSON array of {"input", "output", "settings"}
+    objects, or the same objects as JSON lines.
+    """
+    with open(path) as f:
+        text = f.read()
+    try:
+        jobs = json.loads(text)
+    except json.JSONDecodeError:
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(jobs, list):
+        raise ValueError('manifest must be a list of jobs')
+    return jobs
+
+
+# Per-worker state for batch mode (set by _init_batch_worker in each pool process)
+_batch_render_cache = None
+
+
+def _init_batch_worker(cache_dir, cache_max_bytes):
+    global _batch_render_cache
+    configure_cache_dir(cache_dir)
+    if cache_dir is not None:
+        _batch_render_cache = RenderCache(cache_dir or None, max_bytes=cache_max_bytes)
+
+
+def _run_batch_job(index, job, default_settings):
+    """Process one manifest entry in a pool worker; never raises"""
+    result = {'index': index, 'input': job.get('input'), 'output': job.get('output'), 'worker': os.getpid()}
+    started = time.perf_counter()
+    try:
+        if not job.get('input') or not job.get('output'):
+            raise ValueError('job needs "input" and "output" paths')
+        settings = dict(default_settings)
+        settings.update(job.get('settings') or {})
+        settings['parallel'] = False  # the batch pool already uses every core
+        report = apply_divine_effects(job['input'], job['output'], settings, render_cache=_batch_render_cache)
+        result.update(status='done', cached=report['cached'], timings=report['timings'])
+        if report.get('envelope'):
+            result['envelope'] = report['envelope']
+    except Exception as e:
+        result.update(status='error', message=str(e))
+    result['elapsedMs'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def run_batch(jobs, default_settings=None, workers=None, cache_dir=None, cache_max_bytes=200 * 1024 * 1024):
+    """
+    Render many files across a process pool sized to the cores. Each worker
+    imports the libraries once and keeps its own chain cache across jobs.
+    A failing job is reported and the rest carry on.
+    Returns a summary dict with per-file results in manifest order.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    print(f"[Divine Effects] Batch: {len(jobs)} jobs on {workers} workers", file=sys.stderr)
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(), initializer=_init_batch_worker,
+                             initargs=(cache_dir, cache_max_bytes)) as pool:
+        futures = [pool.submit(_run_batch_job, i, job, default_settings or {}) for i, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            detail = 'cached' if result.get('cached') else result.get('message', '')
+            print(f"[Divine Effects] Batch [{len(results)}/{len(jobs)}] {result['status']} "
+                  f"{result['elapsedMs']:.0f}ms {result['output']} {detail}".rstrip(), file=sys.stderr)
+
+    results.sort(key=lambda r: r['index'])
+    failed = sum(1 for r in results if r['status'] != 'done')
+    return {
+        'total': len(jobs),
+        'done': len(jobs) - failed,
+        'failed': failed,
+        'workers': workers,
+        'wallMs': round((time.perf_counter() - started) * 1000, 1),
+        'cpuMs': round(sum(r['elapsedMs'] for r in results), 1),
+        'jobs': results
+    }
+
+
+def probe_engines(verify=False):
+    """
+    Report which engines this Python can run (--probe). Packages are only
+    looked up on sys.path (versions come from the dist-info directory name),
+    so nothing heavy is imported; with verify the pedalboard wheel is imported
+    to confirm it loads and has PitchShift.
+    """
+    import importlib.machinery
+
+    started = time.perf_counter()
+
+    def installed(name):
+        # PathFinder skips sys.modules, where numpy is already bound lazily
+        spec = importlib.machinery.PathFinder.find_spec(name)
+        if spec is None:
+            return None
+        location = spec.submodule_search_locations[0] if spec.submodule_search_locations else spec.origin
+        site_dir = os.path.dirname(location)
+        prefix = name + '-'
+        for entry in os.listdir(site_dir):
+            if entry.startswith(prefix) and entry.endswith(('.dist-info', '.egg-info')):
+                return entry[len(prefix):].rsplit('.', 1)[0]
+        return 'unknown'
+
+    numpy_version = installed('numpy')
+    pedalboard_version = installed('pedalboard') if numpy_version else None
+    scipy_version = installed('scipy') if numpy_version else None
+    pitch_shift = None  # unknown without importing pedalboard
+    if verify and pedalboard_version:
+        if not load_pedalboard():
+            pedalboard_version = None
+        pitch_shift = bool(pitch_shift_available())
+
+    dsp_engines = (['pedalboard'] if pedalboard_version else []) + (['numpy', 'convolution'] if numpy_version else [])
+    pitch_engines = (['pedalboard'] if pedalboard_version and pitch_shift is not False else []) + \
+        (['vocoder'] if numpy_version else []) + (['resample'] if scipy_version else [])
+    return {
+        'python': sys.version.split()[0],
+        'executable': sys.executable,
+        'numpy': numpy_version,
+        'pedalboard': pedalboard_version,
+        'scipy': scipy_version,
+        'pitchShift': pitch_shift,
+        'verified': verify,
+        'dspEngines': dsp_engines,
+        'pitchEngines': pitch_engines,
+        'effectsAvailable': bool(numpy_version),
+        'probeMs': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Voice of God - Divine Audio Effects')
+    parser.add_argument('input', nargs='?', help='Input WAV file')
+    parser.add_argument('output', nargs='?', help='Output WAV file')
+    parser.add_argument('settings', nargs='?', help='Effect settings JSON')
+    parser.add_argument('--server', action='store_true',
+                        help='Run as a persistent JSON-lines job server on stdin/stdout')
+    parser.add_argument('--stream', action='store_true',
+                        help='Process raw s16le PCM from stdin to stdout block by block')
+    parser.add_argument('--settings', dest='settings_option', help='Effect settings JSON (for --stream)')
+    parser.add_argument('--rate', type=int, default=22050,
+                        help='Stream/calibration sample rate (default: 22050, Piper medium)')
+    parser.add_argument('--channels', type=int, default=1, help='Stream/calibration channel count (default: 1)')
+    parser.add_argument('--block-size', type=int, default=1024, help='Stream block size in frames (default: 1024)')
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='Render every job in a JSON/JSONL manifest of {input, output, settings}')
+    parser.add_argument('--workers', type=int,
+                        help='Worker processes for --batch, or for the segments of one long clip (default: CPU count)')
+    parser.add_argument('--render-cache', nargs='?', const='', metavar='DIR',
+                        help=f'Reuse finished renders from an on-disk cache (default dir: {default_cache_dir()})')
+    parser.add_argument('--cache-size-mb', type=float, default=200, help='Render cache size cap (default: 200)')
+    parser.add_argument('--stage-cache-mb', type=float, default=64,
+                        help='Server memory for reusable stage outputs, 0 to disable (default: 64)')
+    parser.add_argument('--cache-stats', action='store_true', help='Print render cache statistics as JSON and exit')
+    parser.add_argument('--timings', action='store_true',
+                        help='Print per-stage timings as one JSON line on stderr')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='Append per-stage timings as JSON lines to PATH (also in --server mode)')
+    parser.add_argument('--probe', action='store_true',
+                        help='Print available engines as JSON and exit (imports nothing heavy)')
+    parser.add_argument('--verify', action='store_true',
+                        help='With --probe: import pedalboard to confirm it loads and has PitchShift')
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Measure the RTF of each quality tier for --rate/--channels, save and print it')
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe_engines(verify=args.verify)))
+        sys.exit(0)
+
+    configure_cache_dir(args.render_cache)
+    render_cache = None
+    if args.render_cache is not None or args.cache_stats:
+        render_cache = RenderCache(args.render_cache or None, max_bytes=int(args.cache_size_mb * 1024 * 1024))
+
+    if args.cache_stats:
+        print(json.dumps(render_cache.stats(), indent=2))
+        sys.exit(0)
+
+    if np is None:
+        print("numpy is required for audio effects. Install with: pip install numpy", file=sys.stderr)
+        sys.exit(1)
+
+    if args.calibrate:
+        settings = json.loads(args.settings_option or args.input or '{}')
+        print(json.dumps(QUALITY_PROFILE.calibrate(settings, args.rate, args.channels)))
+        sys.exit(0)
+
+    if args.server:
+        EffectsServer(render_cache=render_cache, metrics_file=args.metrics_file,
+                      stage_cache_bytes=int(args.stage_cache_mb * 1024 * 1024)).serve()
+        sys.exit(0)
+
+    if args.batch:
+        try:
+            jobs = load_batch_manifest(args.batch)
+            default_settings = json.loads(args.settings_option or '{}')
+        except (OSError, ValueError) as e:
+            print(f"Invalid batch manifest: {e}", file=sys.stderr)
+            sys.exit(1)
+        summary = run_batch(jobs, default_settings, workers=args.workers,
+                            cache_dir=args.render_cache, cache_max_bytes=int(args.cache_size_mb * 1024 * 1024))
+        print(json.dumps(summary, indent=2))
+        sys.exit(1 if summary['failed'] else 0)
+
+    if args.stream:
+        # In stream mode a lone positional argument is the settings JSON
+        settings_json = args.settings_option or args.input or '{}'
+    else:
+        if not args.output or not (args.settings or args.settings_option):
+            print("Usage: audio-effects.py <input.wav> <output.wav> '<settings_json>'", file=sys.stderr)
+            print("       audio-effects.py --server", file=sys.stderr)
+            print("       audio-effects.py --stream [--rate 22050] [--channels 1] '<settings_json>'", file=sys.stderr)
+            print("       audio-effects.py --batch <manifest.json> [--workers N]", file=sys.stderr)
+            sys.exit(1)
+        settings_json = args.settings or args.settings_option
+
+    try:
+        settings = json.loads(settings_json)
+    except json.JSONDecodeError as e:
+        print(f"Invalid settings JSON: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.stream:
+        try:
+            record = stream_divine_effects(settings, args.rate, args.channels, block_frames=args.block_size)
+            if args.timings or args.metrics_file:
+                emit_timings(record, args.metrics_file)
+            sys.exit(0)
+        except BrokenPipeError:
+            # Player went away (speech stopped) - not an error
+            sys.exit(0)
+        except Exception as e:
+            print(f"Error streaming effects: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    input_path = args.input
+    output_path = args.output
+
+    try:
+        if isinstance(settings, list):
+            presets = resolve_presets(settings, output_path)
+            report = apply_divine_effects_presets(input_path, presets, render_cache=render_cache)
+        else:
+            if args.workers:
+                settings.setdefault('parallel', args.workers)
+            report = apply_divine_effects(input_path, output_path, settings, render_cache=render_cache)
+        if args.timings or args.metrics_file:
+            emit_timings(report['timings'], args.metrics_file)
         print("Divine effects applied successfully!", file=sys.stderr)
         sys.exit(0)
     except Exception as e:
@@ -3,7 +3,7 @@
  * Text-to-speech with divine audio effects
  */
 
-const { ipcMain } = require('electron');
+const { ipcMain, BrowserWindow } = require('electron');
 const { VoiceOfGod, DEFAULT_SETTINGS } = require('../voice-of-god.cjs');
 
 let voiceOfGod = null;
@@ -16,6 +16,12 @@ function registerTTSHandlers() {
 
     // Initialize Voice of God instance
     voiceOfGod = new VoiceOfGod();
+    voiceOfGod.onPlaybackStart = (playback) => {
+        // Precomputed loudness envelope for speech animation
+        for (const win of BrowserWindow.getAllWindows()) {
+            if (!win.isDestroyed()) win.webContents.send('tts:playback', playback);
+        }
+    };
 
     // ============================================
     // TTS STATUS & INFO
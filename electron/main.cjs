@@ -1705,6 +1705,12 @@ function getVoiceOfGod() {
         console.log('[TTS] Initializing VoiceOfGod...');
         try {
             voiceOfGod = new VoiceOfGod();
+            voiceOfGod.onPlaybackStart = (playback) => {
+                // Precomputed loudness envelope for speech animation
+                if (mainWindow && !mainWindow.isDestroyed()) {
+                    mainWindow.webContents.send('tts:playback', playback);
+                }
+            };
             console.log('[TTS] VoiceOfGod initialized successfully');
         } catch (e) {
             console.error('[TTS] VoiceOfGod initialization failed:', e.message);
@@ -2474,8 +2480,49 @@ function showSnapLayoutsPopup(xidHex) {
 // ============================================
 // X11 SNAP DETECTOR DAEMON (Windows 11 Style)
 // ============================================
-// Uses XQueryPointer polling to detect drag-to-edge gestures in real-time
-// Works even during window manager grabs
+// Wakes on XInput2 raw button/motion events (XQueryPointer polling as fallback)
+// to detect drag-to-edge gestures in real-time. Works even during window manager grabs
+
+// Binary event records (snap-detector.py --format binary); codes are indexes,
+// keep in sync with EVENT_CODES / ZONE_CODES / EVENT_RECORD there. An error
+// record's xid field is the byte length of the UTF-8 message after it.
+const SNAP_EVENT_CODES = [null, 'zone_enter', 'zone_leave', 'drag_position', 'snap_apply', 'drag_end', 'error'];
+const SNAP_ZONE_CODES = [null, 'top', 'topleft', 'topright', 'left', 'right', 'bottomleft', 'bottomright'];
+const SNAP_RECORD_SIZE = 20;
+
+function snapRecordSize(buf, offset) {
+    if (SNAP_EVENT_CODES[buf.readUInt8(offset)] === 'error') {
+        return SNAP_RECORD_SIZE + buf.readUInt32LE(offset + 6);
+    }
+    return SNAP_RECORD_SIZE;
+}
+
+function decodeSnapRecord(buf, offset) {
+    const event = { event: SNAP_EVENT_CODES[buf.readUInt8(offset)] };
+    if (event.event === 'drag_end') return event;
+    if (event.event === 'error') {
+        const start = offset + SNAP_RECORD_SIZE;
+        event.message = buf.toString('utf8', start, start + buf.readUInt32LE(offset + 6));
+        return event;
+    }
+    const zone = SNAP_ZONE_CODES[buf.readUInt8(offset + 1)];
+    if (zone) event.zone = zone;
+    event.x = buf.readInt16LE(offset + 2);
+    event.y = buf.readInt16LE(offset + 4);
+    if (event.event === 'zone_leave') return event;
+    const xid = buf.readUInt32LE(offset + 6);
+    event.xid = xid ? '0x' + xid.toString(16) : null;
+    const width = buf.readUInt16LE(offset + 14);
+    if (width) {
+        event.monitor = {
+            x: buf.readInt16LE(offset + 10),
+            y: buf.readInt16LE(offset + 12),
+            width,
+            height: buf.readUInt16LE(offset + 16)
+        };
+    }
+    return event;
+}
 
 function startSnapDetector() {
     if (snapDetectorProcess) return; // Already running
@@ -2495,28 +2542,28 @@ function startSnapDetector() {
 
     console.log('[SnapDetector] Starting daemon...', { scriptPath, protectedArgs });
 
-    snapDetectorProcess = spawn('python3', [scriptPath, ...protectedArgs], {
+    // Fixed-size binary records: no per-event JSON text to build, log or parse
+    snapDetectorProcess = spawn('python3', [scriptPath, '--format', 'binary', ...protectedArgs], {
         stdio: ['ignore', 'pipe', 'pipe']
     });
 
-    let buffer = '';
+    let pending = Buffer.alloc(0);
 
     snapDetectorProcess.stdout.on('data', (data) => {
-        buffer += data.toString();
-        const lines = buffer.split('\n');
-        buffer = lines.pop(); // Keep incomplete line in buffer
-
-        for (const line of lines) {
-            if (!line.trim()) continue;
-            console.log('[SnapDetector RAW]', line.substring(0, 200)); // Log raw input
-            try {
-                const event = JSON.parse(line);
+        const buf = pending.length ? Buffer.concat([pending, data]) : data;
+        let offset = 0;
+        while (buf.length - offset >= SNAP_RECORD_SIZE) {
+            const size = snapRecordSize(buf, offset);
+            if (buf.length - offset < size) break; // error message still arriving
+            const event = decodeSnapRecord(buf, offset);
+            if (event.event) {
                 handleSnapDetectorEvent(event);
-            } catch (e) {
-                // Not JSON, probably debug output
-                console.log('[SnapDetector] Non-JSON:', line.substring(0, 100));
+            } else {
+                console.warn('[SnapDetector] Unknown event code:', buf.readUInt8(offset));
             }
+            offset += size;
         }
+        pending = buf.subarray(offset); // Keep an incomplete record for the next chunk
     });
 
     snapDetectorProcess.stderr.on('data', (data) => {
@@ -2555,7 +2602,9 @@ function stopSnapDetector() {
 function handleSnapDetectorEvent(event) {
     if (!mainWindow || mainWindow.isDestroyed()) return;
 
-    console.log(`[SnapDetector] Event received: ${event.event}`, JSON.stringify(event));
+    if (event.event !== 'drag_position') {
+        console.log(`[SnapDetector] Event received: ${event.event}`, JSON.stringify(event));
+    }
 
     switch (event.event) {
         case 'zone_enter':
@@ -8257,6 +8306,7 @@ app.on('before-quit', () => {
     const vog = getVoiceOfGod();
     if (vog) {
         vog.stop();
+        vog.stopEffectsServer();
     }
 });
 
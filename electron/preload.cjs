@@ -343,6 +343,11 @@ contextBridge.exposeInMainWorld('electronAPI', {
         ipcRenderer.on('tts:progress', handler);
         return () => ipcRenderer.removeListener('tts:progress', handler);
     },
+    onTtsPlayback: (callback) => {
+        const handler = (event, playback) => callback(playback);
+        ipcRenderer.on('tts:playback', handler);
+        return () => ipcRenderer.removeListener('tts:playback', handler);
+    },
 
     // ============================================
     // TRAY POPUP (X11-compatible floating popups)
@@ -26,6 +26,10 @@ const DEFAULT_SETTINGS = {
     chorusDepth: 0.15,      // Chorus depth (was 0.25)
     chorusMix: 0.12,        // Chorus mix level (was 0.2)
     speed: 1.33,            // Speaking speed multiplier (33% faster)
+    trimSilence: false,     // Opt-in: drop lead/trail silence and shorten long pauses before effects
+    maxPauseMs: 400,        // Longest pause kept when trimming
+    quality: 'auto',        // 'full', 'balanced', 'fast' or 'auto' (best tier within the budget)
+    latencyBudgetMs: 1500,  // Effects render time allowed per utterance in 'auto'
     volume: 0.4             // Volume level (0.0 to 2.0, 0.4 = 40%)
 };
 
@@ -69,6 +73,16 @@ class VoiceOfGod {
         this.audioQueue = [];
         this.isProcessingQueue = false;
 
+        // Persistent audio-effects.py --server process (started on first use)
+        this.effectsServer = null;
+        this.effectsJobs = new Map();
+        this.effectsJobCounter = 0;
+        this.effectsProbe = null;  // audio-effects.py --probe result
+
+        // Called as each utterance starts playing with { text, envelope, startedAt };
+        // envelope is the effects script's per-20ms RMS/peak sidecar (null without effects)
+        this.onPlaybackStart = null;
+
         // Temp directory for audio files
         this.tempDir = path.join(os.tmpdir(), 'voice-of-god');
         if (!fs.existsSync(this.tempDir)) {
@@ -78,12 +92,12 @@ class VoiceOfGod {
         // Load settings
         this.settings = { ...DEFAULT_SETTINGS, ...options };
 
-        // Check Python and Pedalboard availability
+        // Check Python and effects engine availability
         this.pythonAvailable = this._checkPython();
-        this.pedalboardAvailable = this._checkPedalboard();
+        this.effectsAvailable = this._probeEffects();
 
-        if (!this.pedalboardAvailable) {
-            console.warn('[VoiceOfGod] Pedalboard not available - divine effects disabled');
+        if (!this.effectsAvailable) {
+            console.warn('[VoiceOfGod] No effects engine available - divine effects disabled');
         }
 
         // Summary log
@@ -91,7 +105,8 @@ class VoiceOfGod {
         console.log('  - Piper available:', !!this.modelPath && fs.existsSync(this.piperPath));
         console.log('  - Model:', this.modelPath ? path.basename(this.modelPath) : 'none');
         console.log('  - Python available:', this.pythonAvailable);
-        console.log('  - Pedalboard available:', this.pedalboardAvailable);
+        console.log('  - Effects available:', this.effectsAvailable,
+            this.effectsProbe ? `(pedalboard: ${this.effectsProbe.pedalboard || 'no'})` : '');
         console.log('  - TTS Enabled:', this.settings.enabled);
         console.log('  - Windows SAPI fallback:', process.platform === 'win32' ? 'available' : 'N/A');
     }
@@ -127,11 +142,14 @@ class VoiceOfGod {
     }
 
     /**
-     * Check if Pedalboard is installed
+     * Probe the effects script for usable engines (audio-effects.py --probe).
+     * The probe only looks packages up, so each candidate Python costs its
+     * startup time rather than a numpy + pedalboard import. A Python with
+     * pedalboard is preferred; numpy alone runs the built-in NumPy engine.
      */
-    _checkPedalboard() {
+    _probeEffects() {
         if (!this.pythonAvailable) {
-            console.log('[VoiceOfGod] Pedalboard check: Python not available');
+            console.log('[VoiceOfGod] Effects probe: Python not available');
             return false;
         }
 
@@ -139,6 +157,8 @@ class VoiceOfGod {
         const pythonPaths = process.platform === 'win32'
             ? [this.pythonCmd, 'python', 'python3']
             : [this.pythonCmd, '/usr/bin/python3', 'python3', 'python'];
+        const effectsScript = path.join(__dirname, 'audio-effects.py');
+        let fallback = null;
 
         for (const python of pythonPaths) {
             if (!python) continue;
@@ -146,9 +166,7 @@ class VoiceOfGod {
                 // Use shell: true to get proper environment
                 const env = { ...process.env };
 
-                const cmd = `${python} -c "import pedalboard; print('OK')"`;
-                console.log('[VoiceOfGod] Checking pedalboard with:', cmd);
-
+                const cmd = `${python} "${effectsScript}" --probe`;
                 const result = execSync(cmd, {
                     stdio: 'pipe',
                     timeout: 10000,
@@ -156,17 +174,20 @@ class VoiceOfGod {
                     env: env
                 });
 
-                const output = result.toString().trim();
-                console.log('[VoiceOfGod] Pedalboard check result:', output);
+                const probe = JSON.parse(result.toString().trim());
+                console.log('[VoiceOfGod] Effects probe with', python + ':', JSON.stringify(probe));
 
-                if (output === 'OK') {
-                    // Store which Python works
+                if (probe.effectsAvailable && probe.pedalboard) {
                     this.pythonCmd = python;
+                    this.effectsProbe = probe;
                     console.log('[VoiceOfGod] Pedalboard found using:', python);
                     return true;
                 }
+                if (probe.effectsAvailable && !fallback) {
+                    fallback = { python, probe };
+                }
             } catch (err) {
-                console.log(`[VoiceOfGod] Pedalboard check failed with ${python}:`, err.message);
+                console.log(`[VoiceOfGod] Effects probe failed with ${python}:`, err.message);
                 if (err.stderr) {
                     console.log('[VoiceOfGod] stderr:', err.stderr.toString().substring(0, 200));
                 }
@@ -174,18 +195,25 @@ class VoiceOfGod {
             }
         }
 
-        console.log('[VoiceOfGod] Pedalboard not found in any Python installation');
+        if (fallback) {
+            this.pythonCmd = fallback.python;
+            this.effectsProbe = fallback.probe;
+            console.log('[VoiceOfGod] Pedalboard not found, using built-in NumPy effects with:', fallback.python);
+            return true;
+        }
+
+        console.log('[VoiceOfGod] No Python installation can run the effects (numpy missing)');
         return false;
     }
 
     /**
-     * Re-check pedalboard availability (call after installing)
+     * Re-check effects availability (call after installing)
      */
     recheckEffects() {
-        const wasAvailable = this.pedalboardAvailable;
-        this.pedalboardAvailable = this._checkPedalboard();
-        console.log('[VoiceOfGod] Effects re-check:', wasAvailable, '->', this.pedalboardAvailable);
-        return this.pedalboardAvailable;
+        const wasAvailable = this.effectsAvailable;
+        this.effectsAvailable = this._probeEffects();
+        console.log('[VoiceOfGod] Effects re-check:', wasAvailable, '->', this.effectsAvailable);
+        return this.effectsAvailable;
     }
 
     /**
@@ -196,7 +224,7 @@ class VoiceOfGod {
             available: !!this.modelPath && fs.existsSync(this.piperPath),
             modelLoaded: !!this.modelPath,
             modelName: this.modelPath ? path.basename(this.modelPath) : null,
-            effectsAvailable: this.pedalboardAvailable,
+            effectsAvailable: this.effectsAvailable,
             speaking: this.speaking,
             settings: { ...this.settings },
             piperDir: this.piperDir  // Absolute path for install command
@@ -242,7 +270,7 @@ class VoiceOfGod {
             }
             return {
                 success: true,
-                effectsAvailable: this.pedalboardAvailable,
+                effectsAvailable: this.effectsAvailable,
                 effectsInstallCommand: 'sudo apt-get install -y python3-pip && sudo python3 -m pip install --break-system-packages pedalboard scipy numpy'
             };
         }
@@ -373,7 +401,7 @@ class VoiceOfGod {
 
             // Apply divine effects if available
             let finalAudioPath = rawAudioPath;
-            if (this.pedalboardAvailable) {
+            if (this.effectsAvailable) {
                 console.log('[VoiceOfGod] Step 2: Applying divine effects...');
                 finalAudioPath = await this._applyDivineEffects(rawAudioPath);
                 console.log('[VoiceOfGod] Step 2 complete:', finalAudioPath);
@@ -381,6 +409,16 @@ class VoiceOfGod {
                 console.log('[VoiceOfGod] Step 2: Skipping effects (not available)');
             }
 
+            // Hand the UI the precomputed envelope so it can animate without analysing playback
+            if (this.onPlaybackStart) {
+                const envelope = finalAudioPath !== rawAudioPath ? this._loadEnvelope(finalAudioPath) : null;
+                try {
+                    this.onPlaybackStart({ text, envelope, startedAt: Date.now() });
+                } catch (err) {
+                    console.warn('[VoiceOfGod] Playback listener error:', err.message);
+                }
+            }
+
             // Play the audio
             console.log('[VoiceOfGod] Step 3: Playing audio...');
             await this._playAudio(finalAudioPath);
@@ -390,6 +428,7 @@ class VoiceOfGod {
             this._cleanupTempFile(rawAudioPath);
             if (finalAudioPath !== rawAudioPath) {
                 this._cleanupTempFile(finalAudioPath);
+                this._cleanupTempFile(this._envelopePath(finalAudioPath));
             }
             console.log('[VoiceOfGod] Cleanup complete');
         } catch (error) {
@@ -463,15 +502,10 @@ class VoiceOfGod {
     }
 
     /**
-     * Apply divine audio effects using Python Pedalboard
+     * Settings passed to audio-effects.py
      */
-    async _applyDivineEffects(inputPath) {
-        const outputPath = inputPath.replace('.wav', '_divine.wav');
-        const python = this.pythonCmd || (process.platform === 'win32' ? 'python' : 'python3');
-        const effectsScript = path.join(__dirname, 'audio-effects.py');
-
-        // Settings for the effects script
-        const settings = JSON.stringify({
+    _getEffectsSettings() {
+        return {
             pitch: this.settings.pitch,
             reverbRoom: this.settings.reverbRoom,
             reverbWet: this.settings.reverbWet,
@@ -483,8 +517,213 @@ class VoiceOfGod {
             chorusRate: this.settings.chorusRate,
             chorusDepth: this.settings.chorusDepth,
             chorusMix: this.settings.chorusMix,
+            trimSilence: this.settings.trimSilence,
+            maxPauseMs: this.settings.maxPauseMs,
+            quality: this.settings.quality,
+            latencyBudgetMs: this.settings.latencyBudgetMs,
+            envelope: !!this.onPlaybackStart,
             volume: this.settings.volume
+        };
+    }
+
+    /**
+     * Start the persistent effects server (audio-effects.py --server) if needed.
+     * Keeps Python, numpy and Pedalboard loaded so each utterance only pays DSP time.
+     */
+    _ensureEffectsServer() {
+        if (this.effectsServer) return this.effectsServer;
+
+        const python = this.pythonCmd || (process.platform === 'win32' ? 'python' : 'python3');
+        const pythonArgs = python === 'py' ? (this.pythonArgs || []) : [];
+        const effectsScript = path.join(__dirname, 'audio-effects.py');
+
+        console.log('[VoiceOfGod] Starting effects server:', python, effectsScript);
+        // --render-cache: repeated phrases are served from ~/.cache/templeos/voice-of-god
+        const proc = spawn(python, [...pythonArgs, effectsScript, '--server', '--render-cache'], {
+            stdio: ['pipe', 'pipe', 'pipe'],
+            env: process.env
+        });
+
+        const server = { proc, stdoutBuffer: '', stderrTail: '' };
+        this.effectsServer = server;
+
+        proc.stdout.on('data', (data) => {
+            server.stdoutBuffer += data.toString();
+            let newline;
+            while ((newline = server.stdoutBuffer.indexOf('\n')) !== -1) {
+                const line = server.stdoutBuffer.slice(0, newline).trim();
+                server.stdoutBuffer = server.stdoutBuffer.slice(newline + 1);
+                if (line) this._handleEffectsServerMessage(line);
+            }
+        });
+
+        proc.stderr.on('data', (data) => {
+            // Keep only the tail for error reports
+            server.stderrTail = (server.stderrTail + data.toString()).slice(-2000);
+        });
+
+        const onExit = (reason) => {
+            if (this.effectsServer === server) {
+                this.effectsServer = null;
+            }
+            for (const [id, job] of this.effectsJobs) {
+                clearTimeout(job.timeout);
+                job.reject(new Error(`Effects server ${reason}`));
+                this.effectsJobs.delete(id);
+            }
+        };
+
+        proc.on('close', (code) => {
+            console.warn('[VoiceOfGod] Effects server exited with code', code);
+            if (code && server.stderrTail) {
+                console.warn('[VoiceOfGod] Effects server stderr:', server.stderrTail.substring(0, 500));
+            }
+            onExit(`exited with code ${code}`);
+        });
+
+        proc.on('error', (err) => {
+            console.error('[VoiceOfGod] Effects server error:', err.message);
+            onExit(`failed: ${err.message}`);
+        });
+
+        return server;
+    }
+
+    /**
+     * Handle one JSON line from the effects server
+     */
+    _handleEffectsServerMessage(line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch {
+            console.warn('[VoiceOfGod] Unexpected effects server output:', line.substring(0, 200));
+            return;
+        }
+
+        if (message.status === 'ready') {
+            console.log('[VoiceOfGod] Effects server ready (pedalboard:', message.pedalboard, 'pitchShift:', message.pitchShift + ')');
+            return;
+        }
+
+        const job = this.effectsJobs.get(message.id);
+        if (!job) return;
+
+        if (message.status === 'done') {
+            clearTimeout(job.timeout);
+            this.effectsJobs.delete(message.id);
+            console.log('[VoiceOfGod] Effects job', message.id, 'done in', message.elapsedMs, 'ms',
+                message.cached ? '(render cache hit)' : message.stagesReused ? `(${message.stagesReused} stages reused)` : '');
+            if (message.timings && !message.cached) {
+                console.log('[VoiceOfGod] Effects timings:', JSON.stringify({
+                    quality: message.timings.quality,
+                    stages: message.timings.stages,
+                    effects: message.timings.effects,
+                    rtf: message.timings.rtf
+                }));
+            }
+            job.resolve(message);
+        } else if (message.status === 'error') {
+            clearTimeout(job.timeout);
+            this.effectsJobs.delete(message.id);
+            job.reject(new Error(message.message || 'Effects job failed'));
+        }
+    }
+
+    /**
+     * Submit a job to the effects server and wait for completion
+     */
+    _runEffectsJob(inputPath, outputPath, settings) {
+        return new Promise((resolve, reject) => {
+            const server = this._ensureEffectsServer();
+            const id = `job-${++this.effectsJobCounter}`;
+
+            const timeout = setTimeout(() => {
+                this.effectsJobs.delete(id);
+                // The server is still rendering into outputPath: stop it before the caller falls back
+                this._killEffectsServer(server).then(() => {
+                    reject(new Error('Effects job timed out after 30s'));
+                });
+            }, 30000);
+
+            this.effectsJobs.set(id, { resolve, reject, timeout });
+
+            try {
+                server.proc.stdin.write(JSON.stringify({ id, input: inputPath, output: outputPath, settings }) + '\n');
+            } catch (err) {
+                clearTimeout(timeout);
+                this.effectsJobs.delete(id);
+                reject(err);
+            }
         });
+    }
+
+    /**
+     * Kill an effects server (e.g. stuck on a job) and resolve once it has exited.
+     * Its other pending jobs are rejected by the exit handler.
+     */
+    _killEffectsServer(server) {
+        if (this.effectsServer === server) {
+            this.effectsServer = null;
+        }
+        const { proc } = server;
+        if (proc.exitCode !== null || proc.signalCode !== null) {
+            return Promise.resolve();
+        }
+        return new Promise((resolve) => {
+            const forceKill = setTimeout(() => {
+                try { proc.kill('SIGKILL'); } catch { }
+            }, 2000);
+            proc.once('exit', () => {
+                clearTimeout(forceKill);
+                resolve();
+            });
+            try { proc.kill(); } catch { }
+        });
+    }
+
+    /**
+     * Stop the persistent effects server
+     */
+    stopEffectsServer() {
+        if (!this.effectsServer) return;
+        const { proc } = this.effectsServer;
+        this.effectsServer = null;
+        try {
+            proc.stdin.end(JSON.stringify({ cmd: 'shutdown' }) + '\n');
+        } catch {
+            try { proc.kill(); } catch { }
+        }
+    }
+
+    /**
+     * Apply divine audio effects using Python Pedalboard
+     */
+    async _applyDivineEffects(inputPath) {
+        const outputPath = inputPath.replace('.wav', '_divine.wav');
+
+        try {
+            await this._runEffectsJob(inputPath, outputPath, this._getEffectsSettings());
+            if (fs.existsSync(outputPath)) {
+                return outputPath;
+            }
+            console.warn('[VoiceOfGod] Effects server did not create output, retrying one-shot');
+        } catch (err) {
+            console.warn('[VoiceOfGod] Effects server failed, falling back to one-shot:', err.message);
+        }
+
+        return this._applyDivineEffectsOnce(inputPath, outputPath);
+    }
+
+    /**
+     * Apply divine audio effects with a one-shot audio-effects.py process
+     */
+    _applyDivineEffectsOnce(inputPath, outputPath) {
+        const python = this.pythonCmd || (process.platform === 'win32' ? 'python' : 'python3');
+        const effectsScript = path.join(__dirname, 'audio-effects.py');
+
+        // Settings for the effects script
+        const settings = JSON.stringify(this._getEffectsSettings());
 
         console.log('[VoiceOfGod] Applying divine effects...');
         console.log('[VoiceOfGod] Python:', python);
@@ -522,6 +761,28 @@ class VoiceOfGod {
         }
     }
 
+    /**
+     * Path of the envelope sidecar audio-effects.py writes next to an output
+     */
+    _envelopePath(audioPath) {
+        return audioPath.replace(/\.wav$/, '.envelope.json');
+    }
+
+    /**
+     * Read the envelope sidecar ({ frameMs, sampleRate, frames, rms, peak }), or null
+     */
+    _loadEnvelope(audioPath) {
+        const envelopePath = this._envelopePath(audioPath);
+        try {
+            if (fs.existsSync(envelopePath)) {
+                return JSON.parse(fs.readFileSync(envelopePath, 'utf8'));
+            }
+        } catch (err) {
+            console.warn('[VoiceOfGod] Could not read envelope:', err.message);
+        }
+        return null;
+    }
+
     /**
      * Play audio file
      */
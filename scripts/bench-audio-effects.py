@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for electron/audio-effects.py (Voice of God divine effects)
+======================================================================
+Loads the effects script as a module and times its building blocks on
+synthetic speech-like audio, so changes can be compared without Piper.
+
+Real-time factor (RTF) = processing time / audio duration; below 1.0 is
+faster than real time.
+
+Usage:
+    python3 scripts/bench-audio-effects.py chain [--lengths 2 10 30] [--rates 22050 44100] [--channels 1 2]
+                                                 [--output results.json] [--compare baseline.json]
+    python3 scripts/bench-audio-effects.py pitch [--lengths 2 10 60] [--rate 22050] [--channels 1]
+    python3 scripts/bench-audio-effects.py memory [--lengths 10 60 300]
+    python3 scripts/bench-audio-effects.py space [--lengths 2 10 60] [--rate 22050] [--channels 1]
+    python3 scripts/bench-audio-effects.py startup [--repeats 5] [--script path/to/audio-effects.py]
+    python3 scripts/bench-audio-effects.py segments [--lengths 30 120] [--workers 4] [--rate 22050]
+
+`space` compares the reverb + echo stage: pedalboard Reverb+Delay, the NumPy
+plugins and ConvolutionReverb (impulse response cold and from the disk cache,
+whole clip and 1024-frame stream blocks), with the error against pedalboard.
+
+`startup` times whole-process runs of --probe, the usage error, --cache-stats
+and a short render, and sums their `-X importtime` output; --script measures
+another copy of the effects script (e.g. an older revision) the same way.
+
+`segments` renders long clips serially and as parallel segments and compares
+them: wall time, speedup, the largest sample difference and SNR against the
+serial render, the median 20ms-envelope difference and the largest one within
+0.25s of a join. Without pitch shift the two agree to float precision (less
+JUCE's chorus LFO drift); the pitch shifters restart their phase in each
+segment, so with pitch only the envelopes agree.
+
+`chain` renders every configuration below through apply_divine_effects and
+records wall time, RTF and peak RSS (measured in a fresh process per
+configuration). Results are saved as JSON; --compare prints the wall-time
+ratio against an earlier results file for every matching configuration.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import wave
+import argparse
+import resource
+import subprocess
+import tempfile
+import importlib.util
+import tracemalloc
+
+import numpy as np
+
+EFFECTS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'electron', 'audio-effects.py')
+
+
+def load_effects_module():
+    """Import electron/audio-effects.py (the hyphen keeps it out of normal imports)"""
+    spec = importlib.util.spec_from_file_location('audio_effects', EFFECTS_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # so process pools can pickle its functions
+    spec.loader.exec_module(module)
+    return module
+
+
+def synth_speech(seconds, sample_rate, channels=1, seed=0):
+    """
+    Speech-like test signal: a glottal pulse train with a wandering pitch,
+    three formant-ish resonances and a syllable-rate envelope with pauses.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+
+    f0 = 120 + 25 * np.sin(2 * np.pi * 0.7 * t) + 10 * np.sin(2 * np.pi * 2.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voice = np.zeros(n)
+    for harmonic in range(1, 30):
+        freq = harmonic * f0
+        gain = sum(np.exp(-((freq - formant) / width) ** 2) for formant, width in ((700, 150), (1200, 200), (2600, 300)))
+        voice += (0.3 + gain) / harmonic * np.sin(harmonic * phase) * (freq < sample_rate / 2)
+
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t), 0, None) ** 0.5
+    pauses = (np.sin(2 * np.pi * 0.25 * t) > -0.7).astype(float)
+    audio = voice * syllables * pauses + 0.003 * rng.standard_normal(n)
+    audio *= 0.5 / max(np.max(np.abs(audio)), 1e-9)
+
+    return np.repeat(audio[None, :], channels, axis=0).astype(np.float32)
+
+
+def write_wav(path, audio, sample_rate):
+    """Write (channels, frames) float audio as 16-bit PCM WAV"""
+    pcm = (np.clip(audio, -1.0, 32767.0 / 32768.0).T * 32768.0).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(audio.shape[0])
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+
+
+def max_rss_mb():
+    """
+    Peak resident set size of this process. Prefers VmHWM: Linux carries
+    ru_maxrss over from the parent across fork+exec, VmHWM starts fresh.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def measure(func, *args):
+    """
+    Returns (seconds, peak traced MB, result). Timing and memory come from
+    separate runs because tracemalloc slows allocation-heavy code down.
+    """
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, result
+
+
+def bench_pitch(args):
+    effects = load_effects_module()
+    engines = [('vocoder', effects.apply_pitch_shift_manual)]
+    try:
+        import scipy  # noqa: F401
+        engines.append(('resample (scipy)', effects.apply_pitch_shift_resample))
+    except ImportError:
+        print("scipy not installed, skipping the resample fallback", file=sys.stderr)
+    if effects.pitch_shift_available():
+        def pedalboard_shift(audio, sample_rate, semitones):
+            return effects.PitchShift(semitones=semitones)(audio, sample_rate)
+        engines.append(('pedalboard PitchShift', pedalboard_shift))
+
+    print(f"Pitch shift {args.semitones} semitones, {args.rate}Hz, {args.channels} channel(s)")
+    print(f"{'length':>8}  {'engine':<22} {'wall ms':>9} {'RTF':>8} {'peak MB':>8} {'out/in len':>10}")
+    for seconds in args.lengths:
+        audio = synth_speech(seconds, args.rate, args.channels)
+        for name, func in engines:
+            elapsed, peak_mb, shifted = measure(func, audio, args.rate, args.semitones)
+            print(f"{seconds:>7}s  {name:<22} {elapsed * 1000:>9.1f} {elapsed / seconds:>8.4f} "
+                  f"{peak_mb:>8.1f} {shifted.shape[-1] / audio.shape[-1]:>10.3f}")
+
+
+def bench_space(args):
+    effects = load_effects_module()
+    settings = effects.normalize_settings({})
+    rate, channels = args.rate, args.channels
+
+    def run_plugins(plugins, audio):
+        for plugin in plugins:
+            audio = plugin(audio, rate)
+        return audio
+
+    def run_stream(plugin, audio, block=1024):
+        plugin.reset()
+        return np.concatenate([plugin(audio[:, i:i + block], rate, reset=False)
+                               for i in range(0, audio.shape[1], block)], axis=1)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.perf_counter()
+        effects.load_impulse_response(settings, rate, channels, cache_dir)
+        cold_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        response = effects.load_impulse_response(settings, rate, channels, cache_dir)
+        warm_ms = (time.perf_counter() - started) * 1000
+        print(f"Impulse response: {response.shape[2] / rate:.2f}s, {channels}x{channels}, "
+              f"render {cold_ms:.0f}ms, from disk cache {warm_ms:.1f}ms")
+
+        engines = [('numpy Reverb+Delay', lambda a: run_plugins(effects.build_space_effects(settings, 'numpy'), a))]
+        convolution = effects.ConvolutionReverb(settings, cache_dir=cache_dir)
+        engines.append(('convolution', lambda a: convolution(a, rate)))
+        engines.append(('convolution stream', lambda a: run_stream(convolution, a)))
+        reference = None
+        if effects.load_pedalboard():
+            engines.insert(0, ('pedalboard Reverb+Delay',
+                               lambda a: run_plugins(effects.build_space_effects(settings, 'pedalboard'), a)))
+            reference = engines[0][1]
+
+        print(f"Reverb + echo, {rate}Hz, {channels} channel(s)")
+        print(f"{'length':>8}  {'engine':<24} {'wall ms':>9} {'RTF':>8} {'RMS err':>9}")
+        for seconds in args.lengths:
+            audio = synth_speech(seconds, rate, channels)
+            expected = reference(audio) if reference else None
+            for name, func in engines:
+                func(audio[:, :rate])  # warm-up
+                started = time.perf_counter()
+                out = func(audio)
+                elapsed = time.perf_counter() - started
+                error = '-'
+                if expected is not None:
+                    error = f"{np.sqrt(np.mean((out - expected) ** 2) / np.mean(expected ** 2)):.1e}"
+                print(f"{seconds:>7}s  {name:<24} {elapsed * 1000:>9.1f} {elapsed / seconds:>8.4f} {error:>9}")
+
+
+def parse_importtime(stderr):
+    """Total ms of top-level imports in `python -X importtime` output, and the heaviest few"""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # one space after the bar = imported by the script itself
+            top_level.append((int(cumulative) / 1000.0, name.strip()))
+    top_level.sort(reverse=True)
+    return sum(ms for ms, _ in top_level), top_level[:3]
+
+
+def bench_startup(args):
+    script = os.path.abspath(args.script or EFFECTS_SCRIPT)
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'in.wav')
+        write_wav(input_path, synth_speech(2, 22050), 22050)
+        commands = [
+            ('python -c pass', ['-c', 'pass']),
+            ('--probe', [script, '--probe']),
+            ('--probe --verify', [script, '--probe', '--verify']),
+            ('usage error', [script]),
+            ('--cache-stats', [script, '--cache-stats', '--render-cache', os.path.join(tmp, 'cache')]),
+            ('render 2s', [script, input_path, os.path.join(tmp, 'out.wav'), '{}']),
+        ]
+
+        print(f"Startup of {script}")
+        print(f"{'command':<18} {'wall ms':>9} {'imports ms':>11}  heaviest imports")
+        for name, argv in commands:
+            walls = []
+            for _ in range(args.repeats):
+                started = time.perf_counter()
+                subprocess.run([sys.executable] + argv, capture_output=True)
+                walls.append((time.perf_counter() - started) * 1000)
+            traced = subprocess.run([sys.executable, '-X', 'importtime'] + argv, capture_output=True, text=True)
+            total, heaviest = parse_importtime(traced.stderr)
+            modules = ', '.join(f"{module} {ms:.0f}" for ms, module in heaviest)
+            print(f"{name:<18} {statistics.median(walls):>9.1f} {total:>11.1f}  {modules}")
+
+
+def run_job_child(args):
+    """Hidden helper: run one render in a fresh process and report its peak RSS"""
+    effects = load_effects_module()
+    import_mb = max_rss_mb()
+    started = time.perf_counter()
+    effects.apply_divine_effects(args.input, args.output, json.loads(args.settings))
+    print(json.dumps({
+        'wallS': time.perf_counter() - started,
+        'importMb': import_mb,
+        'peakMb': max_rss_mb()
+    }))
+
+
+def run_job_in_child(input_path, output_path, settings):
+    """Run run_job_child in a subprocess so every measurement starts from a clean RSS"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '_job', input_path, output_path, json.dumps(settings)],
+        capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def frame_rms_db(audio, sample_rate, frame_seconds=0.02):
+    hop = int(sample_rate * frame_seconds)
+    frames = audio.shape[1] // hop
+    power = np.square(audio[:, :frames * hop]).reshape(audio.shape[0], frames, hop).mean(axis=(0, 2))
+    return 10 * np.log10(np.maximum(power, 1e-12))
+
+
+def bench_segments(args):
+    effects = load_effects_module()
+    effects.load_pedalboard()
+    rate = args.rate
+    configs = [('full', {}), ('no-pitch', {'pitch': 0}), ('numpy-engine', {'dspEngine': 'numpy'}),
+               ('numpy no-pitch', {'dspEngine': 'numpy', 'pitch': 0})]
+    print(f"Parallel segments vs serial render, {rate}Hz, {args.workers} workers on {os.cpu_count()} CPU(s)")
+    print(f"{'length':>8}  {'config':<15} {'segs':>4} {'pre-roll':>8} {'serial ms':>10} {'parallel ms':>11} "
+          f"{'speedup':>7} {'max err':>8} {'SNR dB':>7} {'env dB':>7} {'join dB':>7}")
+    for seconds in args.lengths:
+        audio = synth_speech(seconds, rate, args.channels)
+        for name, overrides in configs:
+            settings = dict(overrides, parallel=args.workers)
+            segments = effects.plan_segments(audio, rate, settings)
+            if len(segments) < 2:
+                print(f"{seconds:>7g}s  {name:<15} clip too short to split")
+                continue
+            effects.render_segments(audio[:, :segments[1][2]], rate, settings, segments[:1])  # warm the pool
+
+            started = time.perf_counter()
+            serial = effects.render_serial(audio, rate, settings, effects.StageTimer())
+            serial_s = time.perf_counter() - started
+            started = time.perf_counter()
+            parallel, summary = effects.render_segments(audio, rate, settings, segments)
+            parallel_s = time.perf_counter() - started
+
+            diff = parallel - serial
+            snr = 10 * np.log10(np.sum(serial ** 2) / max(np.sum(diff ** 2), 1e-30))
+            envelope = np.abs(frame_rms_db(parallel, rate) - frame_rms_db(serial, rate))
+            envelope[frame_rms_db(serial, rate) < -50] = 0
+            near_joins = [envelope[max(0, cut // int(rate * 0.02) - 12):cut // int(rate * 0.02) + 13]
+                          for _, cut, _ in segments[1:]]
+            print(f"{seconds:>7g}s  {name:<15} {summary['count']:>4} {summary['overhead'] * 100:>7.0f}% "
+                  f"{serial_s * 1000:>10.1f} {parallel_s * 1000:>11.1f} {serial_s / parallel_s:>6.2f}x "
+                  f"{np.max(np.abs(diff)):>8.1e} {snr:>7.1f} {np.median(envelope[envelope > 0]):>7.2f} "
+                  f"{np.max(np.concatenate(near_joins)):>7.2f}")
+
+
+def bench_memory(args):
+    paths = [('whole clip', {'lowMemory': False}), ('block-wise', {'lowMemory': True})]
+    print(f"Peak RSS per render ({args.rate}Hz, {args.channels} channel(s)); delta = peak - after imports")
+    print(f"{'length':>8}  {'path':<12} {'wall s':>8} {'peak MB':>8} {'delta MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in args.lengths:
+            input_path = os.path.join(tmp, f"speech_{seconds:g}s.wav")
+            write_wav(input_path, synth_speech(seconds, args.rate, args.channels), args.rate)
+            for name, settings in paths:
+                stats = run_job_in_child(input_path, os.path.join(tmp, 'out.wav'), settings)
+                print(f"{seconds:>7g}s  {name:<12} {stats['wallS']:>8.2f} {stats['peakMb']:>8.1f} "
+                      f"{stats['peakMb'] - stats['importMb']:>9.1f}")
+
+
+# name -> settings overrides on top of the script defaults
+CHAIN_CONFIGS = {
+    'full': {},
+    'no-pitch': {'pitch': 0},
+    'chorus-off': {'chorusEnabled': False},
+    'pitchshift-plugin': {'pitchEngine': 'pedalboard'},
+    'vocoder': {'pitchEngine': 'vocoder'},
+    'scipy-fallback': {'pitchEngine': 'resample'},
+    'numpy-engine': {'dspEngine': 'numpy'},
+    'convolution': {'dspEngine': 'convolution'},
+    'trim-silence': {'trimSilence': True, 'silenceDb': -35},  # above synth_speech's noise floor
+    'quality-balanced': {'quality': 'balanced'},
+    'quality-fast': {'quality': 'fast'},
+}
+
+
+def available_configs(effects):
+    configs = dict(CHAIN_CONFIGS)
+    if not effects.pitch_shift_available():
+        configs.pop('pitchshift-plugin')
+    try:
+        import scipy  # noqa: F401
+    except ImportError:
+        configs.pop('scipy-fallback')
+    return configs
+
+
+def environment_info(effects):
+    """Versions and machine details stored with every results file"""
+    info = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'pedalboard': None,
+    }
+    if effects.load_pedalboard():
+        import pedalboard
+        info['pedalboard'] = getattr(pedalboard, '__version__', 'unknown')
+    return info
+
+
+def time_render(effects, input_path, output_path, settings, repeats):
+    """Median wall time of apply_divine_effects after one warm-up run"""
+    effects.apply_divine_effects(input_path, output_path, settings)
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        effects.apply_divine_effects(input_path, output_path, settings)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def bench_chain(args):
+    effects = load_effects_module()
+    configs = available_configs(effects)
+    if args.configs:
+        configs = {name: configs[name] for name in args.configs if name in configs}
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'out.wav')
+        for rate in args.rates:
+            for channels in args.channels:
+                for seconds in args.lengths:
+                    input_path = os.path.join(tmp, f"speech_{rate}_{channels}_{seconds:g}.wav")
+                    write_wav(input_path, synth_speech(seconds, rate, channels), rate)
+                    for name, overrides in configs.items():
+                        settings = dict(overrides, lowMemory=False)
+                        wall = time_render(effects, input_path, output_path, settings, args.repeats)
+                        entry = {
+                            'config': name,
+                            'sampleRate': rate,
+                            'channels': channels,
+                            'seconds': seconds,
+                            'wallMs': round(wall * 1000, 2),
+                            'rtf': round(wall / seconds, 5),
+                            'peakRssMb': None,
+                        }
+                        if not args.no_memory:
+                            stats = run_job_in_child(input_path, output_path, settings)
+                            entry['peakRssMb'] = round(stats['peakMb'], 1)
+                            entry['rssOverImportsMb'] = round(stats['peakMb'] - stats['importMb'], 1)
+                        results.append(entry)
+                        print(f"{name:<18} {rate:>6}Hz {channels}ch {seconds:>6g}s  "
+                              f"wall {entry['wallMs']:>9.1f}ms  RTF {entry['rtf']:.4f}  "
+                              f"peak {entry['peakRssMb'] if entry['peakRssMb'] is not None else '-':>6} MB",
+                              flush=True)
+
+    report = {'environment': environment_info(effects), 'repeats': args.repeats, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.compare:
+        compare_results(args.compare, report)
+
+
+def result_key(entry):
+    return (entry['config'], entry['sampleRate'], entry['channels'], entry['seconds'])
+
+
+def compare_results(baseline_path, report):
+    """Print new/old wall-time ratios for configurations present in both runs"""
+    with open(baseline_path) as f:
+        baseline = {result_key(e): e for e in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path} (ratio > 1 = slower now)")
+    for entry in report['results']:
+        old = baseline.get(result_key(entry))
+        if not old:
+            continue
+        ratio = entry['wallMs'] / old['wallMs'] if old['wallMs'] else float('inf')
+        flag = '  <-- slower' if ratio > 1.1 else ''
+        print(f"{entry['config']:<18} {entry['sampleRate']:>6}Hz {entry['channels']}ch {entry['seconds']:>6g}s  "
+              f"{old['wallMs']:>9.1f}ms -> {entry['wallMs']:>9.1f}ms  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the divine audio effects chain')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    chain = sub.add_parser('chain', help='Benchmark the full chain across configurations')
+    chain.add_argument('--lengths', type=float, nargs='+', default=[2, 10, 30], help='Clip lengths in seconds')
+    chain.add_argument('--rates', type=int, nargs='+', default=[22050, 44100], help='Sample rates')
+    chain.add_argument('--channels', type=int, nargs='+', default=[1, 2], help='Channel counts')
+    chain.add_argument('--configs', nargs='+', choices=sorted(CHAIN_CONFIGS), help='Only run these configurations')
+    chain.add_argument('--repeats', type=int, default=3, help='Timed runs per configuration (median is kept)')
+    chain.add_argument('--no-memory', action='store_true', help='Skip the per-configuration peak RSS run')
+    chain.add_argument('--output', help='Save results as JSON')
+    chain.add_argument('--compare', help='Compare against an earlier results JSON')
+    chain.set_defaults(func=bench_chain)
+
+    pitch = sub.add_parser('pitch', help='Compare pitch shift engines')
+    pitch.add_argument('--lengths', type=float, nargs='+', default=[2, 10, 60], help='Clip lengths in seconds')
+    pitch.add_argument('--rate', type=int, default=22050, help='Sample rate (default: 22050)')
+    pitch.add_argument('--channels', type=int, default=1, help='Channel count (default: 1)')
+    pitch.add_argument('--semitones', type=float, default=-2, help='Pitch shift (default: -2)')
+    pitch.set_defaults(func=bench_pitch)
+
+    space = sub.add_parser('space', help='Compare reverb + echo engines (plugins vs partitioned convolution)')
+    space.add_argument('--lengths', type=float, nargs='+', default=[2, 10, 60], help='Clip lengths in seconds')
+    space.add_argument('--rate', type=int, default=22050, help='Sample rate (default: 22050)')
+    space.add_argument('--channels', type=int, default=1, help='Channel count (default: 1)')
+    space.set_defaults(func=bench_space)
+
+    startup = sub.add_parser('startup', help='Process startup and import time of the effects script')
+    startup.add_argument('--repeats', type=int, default=5, help='Runs per command (median is kept)')
+    startup.add_argument('--script', help='Effects script to measure (default: electron/audio-effects.py)')
+    startup.set_defaults(func=bench_startup)
+
+    segments = sub.add_parser('segments', help='Parallel segment rendering vs the serial render')
+    segments.add_argument('--lengths', type=float, nargs='+', default=[30, 120], help='Clip lengths in seconds')
+    segments.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 1),
+                          help='Worker processes (default: CPU count, at least 2)')
+    segments.add_argument('--rate', type=int, default=22050, help='Sample rate (default: 22050)')
+    segments.add_argument('--channels', type=int, default=1, help='Channel count (default: 1)')
+    segments.set_defaults(func=bench_segments)
+
+    memory = sub.add_parser('memory', help='Peak RSS of whole-clip vs block-wise rendering')
+    memory.add_argument('--lengths', type=float, nargs='+', default=[10, 60, 300], help='Clip lengths in seconds')
+    memory.add_argument('--rate', type=int, default=22050, help='Sample rate (default: 22050)')
+    memory.add_argument('--channels', type=int, default=1, help='Channel count (default: 1)')
+    memory.set_defaults(func=bench_memory)
+
+    job = sub.add_parser('_job')
+    job.add_argument('input')
+    job.add_argument('output')
+    job.add_argument('settings')
+    job.set_defaults(func=run_job_child)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
+elif __name__ == '__mp_main__':
+    # forkserver/spawn pool workers re-import this script, not the effects
+    # module; register it under the name its pickled functions refer to
+    load_effects_module()
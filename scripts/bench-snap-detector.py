@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Replay harness and latency benchmark for scripts/snap-detector.py
+=================================================================
+Loads the detector as a module and feeds pointer traces through
+SnapDetector.poll with a virtual clock and a fake X backend, so the state
+machine (drag confirmation, hysteresis, sticky top zone, grace re-entry) and
+its scheduling can be checked without a display.
+
+Traces are JSON lines as written by `snap-detector.py --record` (see its
+docstring): a monitors record, then pointer samples with monotonic times.
+`synth` writes built-in gestures in the same format.
+
+Usage:
+    python3 scripts/bench-snap-detector.py synth traces/ [--interval 5]
+    python3 scripts/bench-snap-detector.py replay traces/*.trace [--backends poll xi2] [--schedulers adaptive fixed]
+                                                  [--events] [--output results.json] [--compare baseline.json]
+
+The replay runs the detector's own SnapDetector.loop() (what run() calls)
+with a virtual clock and injected sleep/wait, so the scheduler under test is
+the real one. poll: wakes after poll_delay(). xi2: wait() also returns on
+trace samples that raw events would have reported (button changes; motion
+only while a drag is tracked). Input timing is therefore only as fine as the
+trace's sampling interval.
+
+Per trace, backend and scheduler it reports the emitted events and:
+  edge -> zone_enter   from the first sample (button held) in the zone to
+                       zone_enter; includes the hold time, "+" is the rest
+  release -> snap_apply  from the first sample with the button up
+  polls                poll() calls, and their wall time in this process
+
+--compare exits with status 1 when any event sequence differs from the
+baseline, and prints latency changes for the runs present in both.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import importlib.util
+from bisect import bisect_right
+
+DETECTOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snap-detector.py')
+
+DRAG_XID = 0x3a00007  # active window while a synthetic gesture holds the button
+
+
+def load_detector_module():
+    """Import scripts/snap-detector.py (the hyphen keeps it out of normal imports)"""
+    spec = importlib.util.spec_from_file_location('snap_detector', DETECTOR_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_trace(path):
+    """(monitor records, samples) of a trace file, times relative to its first record"""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    start = records[0]['t']
+    monitors, samples = [], []
+    for record in records:
+        record['t'] -= start
+        (monitors if 'monitors' in record else samples).append(record)
+    if not monitors or monitors[0]['t'] > 0:
+        raise ValueError(f"{path}: trace must start with a monitors record")
+    return monitors, samples
+
+
+# ============================================================================
+# Fake X backend
+# ============================================================================
+
+def make_replay_detector(snap, monitors, samples):
+    """
+    SnapDetector subclass answering X queries from the trace at the virtual
+    time self.now (seconds), and collecting events instead of writing them
+    """
+
+    class ReplayDetector(snap.SnapDetector):
+        def connect(self):
+            self.now = 0.0
+            self.clock = lambda: self.now
+            self.times = [s['t'] for s in samples]
+            self.monitor_times = [m['t'] for m in monitors]
+            self.monitors_applied = None
+            self.events = []
+            self.poll_wall = []
+            self.apply_monitors()
+            self.protected_xids = {int(xid, 16) for xid in monitors[0].get('protected', [])}
+
+        def log(self, message):
+            pass
+
+        def current(self):
+            i = bisect_right(self.times, self.now) - 1
+            return samples[max(i, 0)]
+
+        def apply_monitors(self):
+            i = bisect_right(self.monitor_times, self.now) - 1
+            if i == self.monitors_applied:
+                return
+            record = monitors[i]
+            self.set_monitors(
+                snap.build_monitor(m['name'], m['x'], m['y'], m['width'], m['height'],
+                                   workarea=(m['area']['x'], m['area']['y'], m['area']['width'], m['area']['height']))
+                for m in record['monitors'])
+            self.screen_width, self.screen_height = record['screen']
+            self.monitors_applied = i
+
+        def drain_events(self):
+            self.apply_monitors()
+
+        def check_workarea(self):
+            self.apply_monitors()
+
+        def query_pointer(self):
+            sample = self.current()
+            return sample['x'], sample['y'], sample['mask']
+
+        def get_active_window_xid(self):
+            return self.current()['xid']
+
+        def get_window_position(self, xid):
+            sample = self.current()
+            if sample['xid'] != xid or not sample['window']:
+                return None
+            return tuple(sample['window'])
+
+        def write_event(self, event_data):
+            data = self.encode(event_data)
+            self.events.append((self.now, event_data))
+            self.events_out += 1
+            self.bytes_out += len(data)
+
+        def poll(self):
+            started = time.perf_counter()
+            super().poll()
+            self.poll_wall.append(time.perf_counter() - started)
+
+        def select_raw_events(self, motion=False):
+            self.raw_motion_selected = motion
+            return True
+
+    return ReplayDetector()
+
+
+def input_times(samples):
+    """Times of samples a raw event would report: (button changes, any change)"""
+    buttons, motion = [], []
+    for prev, sample in zip(samples, samples[1:]):
+        if sample['mask'] != prev['mask']:
+            buttons.append(sample['t'])
+            motion.append(sample['t'])
+        elif (sample['x'], sample['y']) != (prev['x'], prev['y']):
+            motion.append(sample['t'])
+    return buttons, motion
+
+
+def next_after(times, t):
+    i = bisect_right(times, t)
+    return times[i] if i < len(times) else None
+
+
+def replay(snap, monitors, samples, backend, scheduler, tail=1.0):
+    """
+    Run SnapDetector.loop() over a trace with virtual sleep/wait until tail
+    seconds after its last sample; returns the detector (end time in .ended)
+    """
+    detector = make_replay_detector(snap, monitors, samples)
+    buttons, motion = input_times(samples)
+    end = samples[-1]['t'] + tail
+    last_wake = [0.0]
+
+    def advance(t):
+        detector.now = t
+        if t >= end:
+            detector.stop()
+
+    def sleep(seconds):
+        advance(detector.now + seconds)
+
+    def wait(timeout):
+        # Input since the last wakeup is already queued; raw motion only counts once selected
+        pending = next_after(motion if detector.raw_motion_selected else buttons, last_wake[0])
+        deadline = end if timeout is None else detector.now + timeout
+        wake = detector.now if pending is not None and pending <= detector.now else min(pending or end, deadline)
+        last_wake[0] = wake
+        advance(wake)
+        detector.drain_events()
+        return pending is not None and pending <= wake
+
+    detector.backend = backend
+    detector.raw_motion_selected = False
+    detector.loop(backend == 'xi2', scheduler, sleep=sleep, wait=wait)
+    detector.ended = detector.now
+    return detector
+
+
+# ============================================================================
+# Latency metrics
+# ============================================================================
+
+def measure_latencies(snap, detector, samples):
+    """edge -> zone_enter and release -> snap_apply latencies (ms) from the ground truth trace"""
+    times = [s['t'] for s in samples]
+    zone_enter, snap_apply = [], []
+    ended = detector.now
+    for t, event in detector.events:
+        i = bisect_right(times, t) - 1
+        if event['event'] == 'zone_enter':
+            detector.now = t
+            detector.apply_monitors()  # zones as of the event
+            j = i
+            while j > 0 and snap.Button1Mask & samples[j - 1]['mask'] and \
+                    detector.get_zone(samples[j - 1]['x'], samples[j - 1]['y']) == event['zone']:
+                j -= 1
+            hold = snap.HOLD_TIME_TOP_MS if event['zone'] == 'top' else snap.HOLD_TIME_EDGE_MS
+            zone_enter.append({'zone': event['zone'], 'ms': (t - times[j]) * 1000, 'holdMs': hold})
+        elif event['event'] == 'snap_apply':
+            j = i
+            while j > 0 and not snap.Button1Mask & samples[j - 1]['mask']:
+                j -= 1
+            snap_apply.append({'zone': event['zone'], 'ms': (t - times[j]) * 1000})
+    detector.now = ended
+    detector.apply_monitors()
+    return zone_enter, snap_apply
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {'avgMs': round(statistics.mean(values), 2), 'maxMs': round(max(values), 2)}
+
+
+def run_trace(snap, path, backend, scheduler):
+    monitors, samples = load_trace(path)
+    detector = replay(snap, monitors, samples, backend, scheduler)
+    zone_enter, snap_apply = measure_latencies(snap, detector, samples)
+    wall = detector.poll_wall
+    duration = max(detector.ended, 1e-9)
+    return {
+        'trace': os.path.basename(path),
+        'backend': backend,
+        'scheduler': scheduler,
+        'events': [dict(event, tMs=round(t * 1000, 1)) for t, event in detector.events],
+        'zoneEnter': summarize([z['ms'] for z in zone_enter]),
+        'zoneEnterOverHold': summarize([max(0.0, z['ms'] - z['holdMs']) for z in zone_enter]),
+        'snapApply': summarize([s['ms'] for s in snap_apply]),
+        'polls': detector.wakeups,
+        'pollsPerSecond': round(detector.wakeups / duration, 1),
+        'pollWallUs': round(statistics.mean(wall) * 1e6, 1) if wall else None,
+        'bytesOut': detector.bytes_out,
+    }
+
+
+def format_latency(summary):
+    return '-' if summary is None else f"{summary['avgMs']:.1f}/{summary['maxMs']:.1f}ms"
+
+
+def describe_event(event):
+    text = f"{event['tMs']:>8.1f}ms  {event['event']}"
+    if event.get('zone'):
+        text += f" {event['zone']}"
+    if 'x' in event:
+        text += f" ({event['x']}, {event['y']})"
+    if event.get('monitor'):
+        m = event['monitor']
+        text += f" on {m['width']}x{m['height']}+{m['x']}+{m['y']}"
+    return text
+
+
+def bench_replay(args):
+    snap = load_detector_module()
+    results = []
+    for path in args.traces:
+        for backend in args.backends:
+            for scheduler in args.schedulers:
+                entry = run_trace(snap, path, backend, scheduler)
+                results.append(entry)
+                counts = {}
+                for event in entry['events']:
+                    counts[event['event']] = counts.get(event['event'], 0) + 1
+                print(f"{entry['trace']:<22} {backend:>4}/{scheduler:<8}  "
+                      f"edge->zone_enter {format_latency(entry['zoneEnter']):>13} "
+                      f"(+{format_latency(entry['zoneEnterOverHold'])})  "
+                      f"release->snap_apply {format_latency(entry['snapApply']):>11}  "
+                      f"polls {entry['polls']:>4} ({entry['pollsPerSecond']}/s, {entry['pollWallUs']}us)  "
+                      f"{', '.join(f'{n} {e}' for e, n in counts.items()) or 'no events'}", flush=True)
+                if args.events:
+                    for event in entry['events']:
+                        if event['event'] != 'drag_position':
+                            print(f"    {describe_event(event)}")
+
+    report = {'detector': DETECTOR_SCRIPT, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.output}")
+    if args.compare and not compare_results(args.compare, report):
+        sys.exit(1)
+
+
+def result_key(entry):
+    return (entry['trace'], entry['backend'], entry['scheduler'])
+
+
+def compare_results(baseline_path, report):
+    """Print event sequence changes and latency changes; False if any sequence changed"""
+    with open(baseline_path) as f:
+        baseline = {result_key(e): e for e in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}")
+    unchanged = True
+    for entry in report['results']:
+        old = baseline.get(result_key(entry))
+        if not old:
+            continue
+        label = f"{entry['trace']:<22} {entry['backend']:>4}/{entry['scheduler']:<8}"
+        if entry['events'] != old['events']:
+            unchanged = False
+            print(f"{label}  EVENTS CHANGED")
+            for side, events in (('-', old['events']), ('+', entry['events'])):
+                for event in events:
+                    if event['event'] != 'drag_position':
+                        print(f"    {side} {describe_event(event)}")
+        for key in ('zoneEnter', 'snapApply'):
+            if entry[key] and old[key] and entry[key]['avgMs'] != old[key]['avgMs']:
+                print(f"{label}  {key} avg {old[key]['avgMs']:.1f}ms -> {entry[key]['avgMs']:.1f}ms")
+    if unchanged:
+        print("Event sequences unchanged")
+    return unchanged
+
+
+# ============================================================================
+# Synthetic traces
+# ============================================================================
+
+# Monitor layouts: (name, x, y, width, height), _NET_WORKAREA
+SINGLE = ([('DP-1', 0, 0, 1920, 1080)], (0, 0, 1920, 1050))
+DUAL = ([('DP-1', 0, 0, 1920, 1080), ('HDMI-1', 1920, 0, 2560, 1440)], (0, 0, 4480, 1410))
+
+# name -> (layout, keyframes (ms, x, y, button held), window follows the pointer while held)
+SYNTH_GESTURES = {
+    'edge-left': (SINGLE, [(0, 900, 400, 0), (300, 900, 400, 1), (350, 900, 400, 1),
+                           (650, 15, 420, 1), (1000, 15, 420, 1), (1001, 15, 420, 0), (1500, 15, 420, 0)], True),
+    'corner-bottomleft': (SINGLE, [(0, 900, 400, 0), (300, 900, 400, 1), (700, 10, 1040, 1),
+                                   (1000, 10, 1040, 1), (1001, 10, 1040, 0), (1500, 10, 1040, 0)], True),
+    # Popup stays open while wandering below the top zone; released back at the top
+    'top-popup': (SINGLE, [(0, 900, 500, 0), (300, 900, 500, 1), (600, 900, 20, 1), (900, 900, 20, 1),
+                           (1100, 700, 300, 1), (1300, 600, 450, 1), (1600, 960, 120, 1),
+                           (1700, 960, 120, 1), (1701, 960, 120, 0), (2200, 960, 120, 0)], True),
+    # Jitter across the right edge inside the hysteresis band, leave, re-enter within the grace period
+    'edge-jitter': (SINGLE, [(0, 900, 500, 0), (300, 900, 500, 1), (600, 1900, 500, 1), (800, 1900, 500, 1),
+                             (850, 1860, 500, 1), (900, 1895, 500, 1), (950, 1860, 500, 1), (1000, 1895, 500, 1),
+                             (1100, 1500, 500, 1), (1300, 1900, 500, 1), (1500, 1900, 500, 1),
+                             (1501, 1900, 500, 0), (2000, 1900, 500, 0)], True),
+    # Inner edges: HDMI-1's left edge, then DP-1's right edge, zones sized per monitor
+    'dual-monitor': (DUAL, [(0, 2800, 600, 0), (300, 2800, 600, 1), (600, 1930, 600, 1), (900, 1930, 600, 1),
+                            (1000, 1900, 600, 1), (1300, 1900, 600, 1), (1301, 1900, 600, 0),
+                            (1800, 1900, 600, 0)], True),
+    # Button held but the window never moves (scrollbar, text selection): no events
+    'no-window-move': (SINGLE, [(0, 1900, 500, 0), (300, 1900, 500, 1), (700, 5, 500, 1), (1000, 5, 500, 1),
+                                (1001, 5, 500, 0), (1500, 5, 500, 0)], False),
+}
+
+
+def synth_trace(snap, layout, keyframes, moves_window, interval_ms, grab=(40, 12)):
+    """Trace records for a gesture, sampled every interval_ms like --record"""
+    rects, workarea = layout
+    monitors = [snap.build_monitor(*rect, workarea=workarea) for rect in rects]
+    records = [{
+        't': 0.0,
+        'monitors': [{'name': m.name, 'x': m.x, 'y': m.y, 'width': m.width, 'height': m.height, 'area': m.area}
+                     for m in monitors],
+        'screen': [max(m.x + m.width for m in monitors), max(m.y + m.height for m in monitors)],
+        'protected': [],
+    }]
+    last = None
+    pressed_at = None
+    steps = int(keyframes[-1][0] / interval_ms) + 1
+    for step in range(steps):
+        ms = step * interval_ms
+        k = max(i for i, key in enumerate(keyframes) if key[0] <= ms)
+        t0, x0, y0, held = keyframes[k]
+        if k + 1 < len(keyframes):
+            t1, x1, y1, _ = keyframes[k + 1]
+            f = (ms - t0) / (t1 - t0)
+            x, y = round(x0 + (x1 - x0) * f), round(y0 + (y1 - y0) * f)
+        else:
+            x, y = x0, y0
+        sample = {'x': x, 'y': y, 'mask': snap.Button1Mask if held else 0, 'xid': None, 'window': None}
+        if held:
+            pressed_at = pressed_at or (x, y)
+            anchor = (x, y) if moves_window else pressed_at
+            sample.update(xid=DRAG_XID, window=[anchor[0] - grab[0], anchor[1] - grab[1]])
+        else:
+            pressed_at = None
+        if sample != last:
+            records.append(dict(sample, t=ms / 1000.0))
+            last = sample
+    return records
+
+
+def bench_synth(args):
+    snap = load_detector_module()
+    os.makedirs(args.directory, exist_ok=True)
+    for name, (layout, keyframes, moves_window) in SYNTH_GESTURES.items():
+        path = os.path.join(args.directory, f"{name}.trace")
+        records = synth_trace(snap, layout, keyframes, moves_window, args.interval)
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        print(f"Wrote {path} ({len(records) - 1} samples)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay traces through the snap detector and measure its latency')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    synth = sub.add_parser('synth', help='Write the built-in synthetic gesture traces')
+    synth.add_argument('directory', help='Output directory (one .trace per gesture)')
+    synth.add_argument('--interval', type=float, default=5, help='Sampling interval in ms (default: 5, like --record)')
+    synth.set_defaults(func=bench_synth)
+
+    replay_cmd = sub.add_parser('replay', help='Replay traces and report events and latencies')
+    replay_cmd.add_argument('traces', nargs='+', help='Trace files (snap-detector.py --record or synth)')
+    replay_cmd.add_argument('--backends', nargs='+', choices=['poll', 'xi2'], default=['poll', 'xi2'],
+                            help='Backends to simulate')
+    replay_cmd.add_argument('--schedulers', nargs='+', choices=['adaptive', 'fixed'], default=['adaptive', 'fixed'],
+                            help='Poll schedulers to simulate')
+    replay_cmd.add_argument('--events', action='store_true', help='Print every event (except drag_position)')
+    replay_cmd.add_argument('--output', help='Save results as JSON')
+    replay_cmd.add_argument('--compare', help='Compare against an earlier results JSON (exit 1 if events changed)')
+    replay_cmd.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
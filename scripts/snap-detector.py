@@ -2,35 +2,74 @@
 """
 X11 Snap Layout Detector - Windows 11 Style (v3 - Anti-Flicker)
 ================================================================
-Polls XQueryPointer to detect drag-to-edge gestures in real-time.
+Watches XQueryPointer to detect drag-to-edge gestures in real-time.
 Works even during window manager grabs (Openbox, etc.)
 
+Backends:
+- xi2:  sleeps until XInput2 raw motion/button events arrive on the root window
+        (delivered even during grabs), polls only while a drag is tracked
+- poll: queries the pointer every POLL_INTERVAL_MS (fallback without XI 2.1+)
+
 v3 Changes:
 - STICKY ZONES: Once popup is shown, it stays until mouse leaves zone OR button released
 - Track XID at drag START, don't re-check during drag (popup stealing focus doesn't break it)
 - Longer hold requirement before emitting zone_enter (200ms hold)
 - Only emit zone_leave if button still held AND mouse far from zone
 
+Output (stdout): one JSON object per line, or with --format binary a stream of
+fixed-size EVENT_RECORD frames (20 bytes, little-endian):
+
+    u8 event, u8 zone, i16 x, i16 y, u32 xid, i16 monitor x, i16 monitor y,
+    u16 monitor width, u16 monitor height, 2 pad bytes
+
+with event/zone as indexes into EVENT_CODES/ZONE_CODES (0 = none), xid 0 for
+null and a zero-sized monitor when there is none. An error record's xid field
+is instead the byte length of the UTF-8 message that follows it; errors are
+also logged to stderr. drag_position repeats are dropped and motion is capped
+at --max-motion-hz in both formats; the last position before any other event
+is always sent.
+
 Usage:
     python3 snap-detector.py --protected 0x1a00003 0x1b00004
+    python3 snap-detector.py --format binary --max-motion-hz 60
+    python3 snap-detector.py --backend poll --stats 10   # compare wakeups/CPU per backend
+    python3 snap-detector.py --scheduler fixed --stats 10  # ... and per scheduler
+    python3 snap-detector.py --record drag.trace  # then: scripts/bench-snap-detector.py replay drag.trace
+
+--record writes a trace (JSON lines): a monitors record, then pointer samples
+{"t", "x", "y", "mask", "xid", "window"} every --record-interval ms, each
+written only when it changed. xid/window are the active window and its frame
+position, read only while button 1 is held. t is time.monotonic() seconds.
 """
 
 import json
 import sys
 import time
 import argparse
+import select
 import signal
+import struct
+from bisect import bisect_right
+from collections import namedtuple
 
 try:
     from Xlib import X, display, Xatom
 except ImportError:
-    print('{"event": "error", "message": "python3-xlib not installed. Run: sudo apt install python3-xlib"}', flush=True)
-    sys.exit(1)
+    X = display = Xatom = None  # main() reports it in the requested --format
 
-import subprocess
+try:
+    from Xlib.ext import ge, xinput  # python-xlib >= 0.20; without it only polling works
+except ImportError:
+    ge = xinput = None
+
+try:
+    from Xlib.ext import randr  # without it the root window is one monitor
+except ImportError:
+    randr = None
 
 # Configuration - ANTI-FLICKER TUNED
-POLL_INTERVAL_MS = 25        # Fast polling for responsiveness
+POLL_INTERVAL_MS = 25        # Fast polling for responsiveness (button held)
+IDLE_POLL_INTERVAL_MS = 100  # Button up, polling backend, adaptive scheduler
 TOP_TRIGGER_ZONE = 250       # LARGE zone from top for snap layouts menu (user requested)
 EDGE_TRIGGER_ZONE = 40       # pixels from left/right edge
 CORNER_TRIGGER_ZONE = 70     # pixels from corner
@@ -50,16 +89,122 @@ REENTER_GRACE_MS = 500
 MOVEMENT_THRESHOLD_PX = 8    # Window must move at least 8px to be considered a real drag
 MOVEMENT_CHECK_DELAY_MS = 100  # Wait this long before checking if window moved
 
+# Height of the strip at the very top that is always 'top' (never a corner)
+TOP_STRIP_ZONE = 40
+
+# drag_position events per second at most (0 = one per poll that moved)
+MAX_MOTION_HZ = 60
+
+# Binary output (--format binary): codes are indexes, keep in sync with main.cjs
+EVENT_CODES = (None, 'zone_enter', 'zone_leave', 'drag_position', 'snap_apply', 'drag_end', 'error')
+ZONE_CODES = (None, 'top', 'topleft', 'topright', 'left', 'right', 'bottomleft', 'bottomright')
+EVENT_RECORD = struct.Struct('<BBhhIhhHH2x')
+
 # Button masks (from X11)
 Button1Mask = 1 << 8  # Left mouse button (256)
 
+# Scheduler wakeups for a deadline land this much after it (float rounding)
+DEADLINE_SLACK_MS = 0.5
+
+# XI2 raw events reach root-window clients during grabs only from XI 2.1 on
+XI2_MIN_VERSION = (2, 1)
+# Raw motion arrives at the mouse's report rate; polls it triggers stay this far apart
+XI2_MIN_POLL_MS = 10
+# Raw button presses can beat the WM's _NET_ACTIVE_WINDOW update; read it this much later
+XI2_PRESS_SETTLE_MS = 25
+
+
+# One monitor's zone thresholds in root coordinates, measured from its work area
+# (the monitor minus panels/struts); area is that work area for the events
+Monitor = namedtuple('Monitor', [
+    'name', 'x', 'y', 'width', 'height', 'area',
+    'left_edge', 'right_edge', 'top_zone', 'top_strip', 'corner_left', 'corner_right', 'bottom_corner',
+])
+
+
+def build_monitor(name, x, y, width, height, workarea=None):
+    """Monitor for a RandR rectangle, clipped to _NET_WORKAREA when they overlap"""
+    ax, ay, aw, ah = x, y, width, height
+    if workarea:
+        wx, wy, ww, wh = workarea
+        left, top = max(x, wx), max(y, wy)
+        right, bottom = min(x + width, wx + ww), min(y + height, wy + wh)
+        if right > left and bottom > top:
+            ax, ay, aw, ah = left, top, right - left, bottom - top
+    return Monitor(
+        name=name, x=x, y=y, width=width, height=height,
+        area={'x': ax, 'y': ay, 'width': aw, 'height': ah},
+        left_edge=ax + EDGE_TRIGGER_ZONE,
+        right_edge=ax + aw - EDGE_TRIGGER_ZONE,
+        top_zone=ay + TOP_TRIGGER_ZONE,
+        top_strip=ay + TOP_STRIP_ZONE,
+        corner_left=ax + CORNER_TRIGGER_ZONE,
+        corner_right=ax + aw - CORNER_TRIGGER_ZONE,
+        bottom_corner=ay + ah - CORNER_TRIGGER_ZONE,
+    )
+
+
+def encode_event(event_data, output_format):
+    """Event dict -> bytes: a JSON line, or an EVENT_RECORD (+ message for errors)"""
+    if output_format == 'json':
+        return (json.dumps(event_data) + '\n').encode()
+    if event_data['event'] == 'error':
+        message = str(event_data.get('message', '')).encode()
+        return EVENT_RECORD.pack(EVENT_CODES.index('error'), 0, 0, 0, len(message), 0, 0, 0, 0) + message
+    monitor = event_data.get('monitor') or {}
+    xid = event_data.get('xid')
+    return EVENT_RECORD.pack(
+        EVENT_CODES.index(event_data['event']),
+        ZONE_CODES.index(event_data.get('zone')),
+        event_data.get('x', 0), event_data.get('y', 0),
+        int(xid, 16) if xid else 0,
+        monitor.get('x', 0), monitor.get('y', 0), monitor.get('width', 0), monitor.get('height', 0),
+    )
+
+
+def exit_with_error(message, output_format):
+    """Report a startup failure on stdout (for main.cjs) and stderr, then exit"""
+    print(f"[SnapDetector] {message}", file=sys.stderr, flush=True)
+    sys.stdout.buffer.write(encode_event({'event': 'error', 'message': message}, output_format))
+    sys.stdout.buffer.flush()
+    sys.exit(1)
+
+
+class MonitorIndex:
+    """
+    Point -> Monitor lookup. The layout is cut into vertical slabs at every
+    monitor's left/right edge; each slab lists its monitors by top edge, so a
+    lookup is two bisects. Points in gaps between monitors map to the nearest.
+    """
+
+    def __init__(self, monitors):
+        self.monitors = list(monitors)
+        self.xs = sorted({m.x for m in self.monitors} | {m.x + m.width for m in self.monitors})
+        self.slabs = []
+        for left in self.xs[:-1]:
+            column = sorted((m for m in self.monitors if m.x <= left < m.x + m.width), key=lambda m: m.y)
+            self.slabs.append(([m.y for m in column], column))
+    
+    def find(self, x, y):
+        i = bisect_right(self.xs, x) - 1
+        if 0 <= i < len(self.slabs):
+            tops, column = self.slabs[i]
+            j = bisect_right(tops, y) - 1
+            while j >= 0:
+                if y < column[j].y + column[j].height:
+                    return column[j]
+                j -= 1
+        return min(self.monitors, key=lambda m: (max(m.x - x, 0, x - m.x - m.width + 1) ** 2 +
+                                                 max(m.y - y, 0, y - m.y - m.height + 1) ** 2))
+
 
 class SnapDetector:
     def __init__(self, protected_xids=None):
-        self.display = display.Display()
-        self.root = self.display.screen().root
-        self.screen_width = self.root.get_geometry().width
-        self.screen_height = self.root.get_geometry().height
+        # Monitor zone table, rebuilt on RandR screen changes and work area changes (at drag start)
+        self.monitor_index = None
+        self.monitors_stale = False
+        self.workarea = None           # _NET_WORKAREA the table was built with
+        self.zone_monitor = None       # Monitor the activated zone belongs to
         
         # Store protected XIDs (main Electron window, etc.)
         self.protected_xids = set()
@@ -78,43 +223,96 @@ class SnapDetector:
         self.drag_xid = None           # XID captured at drag START - doesn't change
         self.drag_start_time = 0       # When the drag started (for movement check delay)
         self.initial_window_pos = None  # (x, y) of window when drag started
+        self.drag_frame = None         # (xid, frame window, border width) found at drag start
         self.current_zone = None       # Current zone mouse is in
         self.zone_enter_time = 0       # When mouse entered current zone
         self.zone_activated = False    # True if we've emitted zone_enter for current zone
         self.last_activated_zone = None  # Track last zone for grace period re-entry
         self.last_zone_leave_time = 0    # When we left an activated zone
         self.running = True
+        self.clock = time.monotonic    # All state machine times are monotonic ms
+        
+        # Output: format, drag_position coalescing and byte accounting
+        self.output_format = 'json'
+        self.motion_interval = 1.0 / MAX_MOTION_HZ
+        self.last_position = None      # (x, y) of the last drag_position sent
+        self.last_position_time = 0.0
+        self.pending_position = None   # held back by the rate cap: (x, y, xid)
+        self.events_out = 0
+        self.bytes_out = 0
+        
+        # XI2 raw motion is only selected while a drag is tracked (None = not set up)
+        self.raw_motion_selected = None
+        
+        # Wakeup/CPU accounting (--stats)
+        self.backend = None
+        self.wakeups = 0
+        self.input_wakeups = 0
+        self.poll_seconds = 0.0
+        self.poll_max = 0.0
+        self.geometry_queries = 0
+        self.zone_enter_lateness = []  # ms between a hold deadline and its zone_enter
+        self.stats_started = time.monotonic()
+        self.cpu_started = time.process_time()
+        
+        self.connect()
+    
+    def connect(self):
+        """
+        Open the X connection, select screen change events and build the
+        monitor table. Everything poll() reads from X goes through
+        query_pointer, get_active_window_xid, get_window_position and the
+        monitor table, so a replay backend (scripts/bench-snap-detector.py)
+        overrides those and this.
+        """
+        self.display = display.Display()
+        self.root = self.display.screen().root
         
         # EWMH atoms
         self._NET_ACTIVE_WINDOW = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self._NET_WORKAREA = self.display.intern_atom('_NET_WORKAREA')
+        self._NET_CURRENT_DESKTOP = self.display.intern_atom('_NET_CURRENT_DESKTOP')
+        self.randr_event_base = None
+        self.select_screen_changes()
+        self.rebuild_monitors()
         
     def log(self, message):
         """Debug logging to stderr"""
         print(f"[SnapDetector] {message}", file=sys.stderr, flush=True)
     
+    def find_frame(self, xid):
+        """
+        The top-level window holding xid: the WM's frame when the client is
+        reparented, else xid itself. The frame is what moves during a drag.
+        """
+        window = self.display.create_resource_object('window', xid)
+        while True:
+            tree = window.query_tree()
+            self.geometry_queries += 1
+            if not tree.parent or tree.parent == self.root:
+                return window
+            window = tree.parent
+    
     def get_window_position(self, xid):
-        """Get window position (x, y) using xwininfo. Returns None on failure."""
+        """
+        Get the outer top-left (x, y) of xid's frame on the root window over
+        the existing connection. The frame and its border width are looked up
+        once per drag; later calls cost one translate_coords round trip.
+        Returns None on failure (e.g. the window is gone).
+        """
         try:
-            result = subprocess.run(
-                ['xwininfo', '-id', hex(xid)],
-                capture_output=True,
-                text=True,
-                timeout=0.5
-            )
-            if result.returncode != 0:
-                return None
-            
-            x, y = None, None
-            for line in result.stdout.split('\n'):
-                if 'Absolute upper-left X:' in line:
-                    x = int(line.split(':')[1].strip())
-                elif 'Absolute upper-left Y:' in line:
-                    y = int(line.split(':')[1].strip())
-            
-            if x is not None and y is not None:
-                return (x, y)
+            if not self.drag_frame or self.drag_frame[0] != xid:
+                frame = self.find_frame(xid)
+                border = frame.get_geometry().border_width
+                self.geometry_queries += 1
+                self.drag_frame = (xid, frame, border)
+            _, frame, border = self.drag_frame
+            # translate_coords is relative to the root whatever the frame's parent is
+            origin = self.root.translate_coords(frame, -border, -border)
+            self.geometry_queries += 1
+            return (origin.x, origin.y)
         except Exception:
-            pass
+            self.drag_frame = None  # re-resolve next time (frame destroyed or replaced)
         return None
         
     def get_active_window_xid(self):
@@ -129,36 +327,140 @@ class SnapDetector:
             pass
         return None
     
+    def query_pointer(self):
+        """(root x, root y, button/modifier mask) of the pointer"""
+        result = self.root.query_pointer()
+        return result.root_x, result.root_y, result.mask
+    
     def is_button1_pressed(self, mask):
         """Check if left mouse button is currently held down"""
         return bool(mask & Button1Mask)
     
+    def select_screen_changes(self):
+        """
+        Ask for RRScreenChangeNotify. Root PropertyNotify isn't selected: the
+        root's properties (_NET_ACTIVE_WINDOW, _NET_CLIENT_LIST, pagers,
+        clocks) change constantly and would wake the idle loop, so the work
+        area is re-read at drag start instead (check_workarea).
+        """
+        if randr is None or not self.display.has_extension('RANDR'):
+            self.log("RandR not available, using the root window as one monitor")
+            return
+        try:
+            self.display.xrandr_query_version()
+            self.root.xrandr_select_input(randr.RRScreenChangeNotifyMask)
+            self.randr_event_base = self.display.query_extension('RANDR').first_event
+        except Exception as e:
+            self.log(f"RandR setup failed: {e}")
+    
+    def read_monitors(self):
+        """(name, x, y, width, height) of each active monitor, root window if RandR can't tell"""
+        if self.randr_event_base is not None:
+            try:
+                if hasattr(self.root, 'xrandr_get_monitors'):  # RandR 1.5
+                    monitors = [(self.display.get_atom_name(m.name), m.x, m.y, m.width_in_pixels, m.height_in_pixels)
+                                for m in self.root.xrandr_get_monitors(is_active=True).monitors]
+                else:
+                    resources = self.root.xrandr_get_screen_resources_current()
+                    monitors = []
+                    for crtc in resources.crtcs:
+                        info = self.display.xrandr_get_crtc_info(crtc, resources.config_timestamp)
+                        if info.mode and info.width and info.height:
+                            monitors.append((f"crtc-{crtc}", info.x, info.y, info.width, info.height))
+                if monitors:
+                    return monitors
+            except Exception as e:
+                self.log(f"RandR monitor query failed: {e}")
+        geometry = self.root.get_geometry()
+        return [('root', 0, 0, geometry.width, geometry.height)]
+    
+    def read_workarea(self):
+        """_NET_WORKAREA (x, y, width, height) of the current desktop, or None"""
+        try:
+            areas = self.root.get_full_property(self._NET_WORKAREA, X.AnyPropertyType)
+            if not areas or len(areas.value) < 4:
+                return None
+            desktop = self.root.get_full_property(self._NET_CURRENT_DESKTOP, X.AnyPropertyType)
+            index = desktop.value[0] if desktop and len(desktop.value) else 0
+            if (index + 1) * 4 > len(areas.value):
+                index = 0
+            return tuple(int(v) for v in areas.value[index * 4:index * 4 + 4])
+        except Exception:
+            return None
+    
+    def rebuild_monitors(self):
+        """Re-read monitors and work area and rebuild the zone index"""
+        self.workarea = self.read_workarea()
+        self.set_monitors(build_monitor(*m, workarea=self.workarea) for m in self.read_monitors())
+        geometry = self.root.get_geometry()
+        self.screen_width = geometry.width
+        self.screen_height = geometry.height
+        self.monitors_stale = False
+        self.log(f"Monitors: {', '.join(f'{m.name} {m.width}x{m.height}+{m.x}+{m.y} (work area {m.area})' for m in self.monitor_index.monitors)}")
+    
+    def set_monitors(self, monitors):
+        """
+        Install a new zone index. An activated zone's monitor is looked up again
+        by geometry, so its hysteresis and event area follow the same screen;
+        if that monitor is gone or resized, the hysteresis is dropped.
+        """
+        self.monitor_index = MonitorIndex(monitors)
+        if self.zone_monitor is not None:
+            old = self.zone_monitor
+            self.zone_monitor = next((m for m in self.monitor_index.monitors
+                                      if (m.x, m.y, m.width, m.height) == (old.x, old.y, old.width, old.height)), None)
+    
+    def check_workarea(self):
+        """
+        Rebuild the zone index if _NET_WORKAREA moved (panels, desktop switch)
+        since it was built. Returns True if it did.
+        """
+        if self.read_workarea() == self.workarea:
+            return False
+        self.rebuild_monitors()
+        return True
+    
+    def handle_x_event(self, event):
+        """Note screen changes; the zone index is rebuilt before the next poll"""
+        if self.randr_event_base is not None and event.type == self.randr_event_base + randr.RRScreenChangeNotify:
+            self.monitors_stale = True
+    
+    def drain_events(self):
+        """Handle queued X events without blocking"""
+        while self.display.pending_events():
+            self.handle_x_event(self.display.next_event())
+    
+    def monitor_area(self, x, y):
+        """Work area of the monitor under (x, y), for event payloads"""
+        return self.monitor_index.find(x, y).area
+    
     def get_zone(self, x, y):
-        """Determine which snap zone the mouse coordinates are in"""
+        """Determine which snap zone the mouse coordinates are in (zones of the monitor under it)"""
+        m = self.monitor_index.find(x, y)
         # Top zone has highest priority
-        if y < TOP_TRIGGER_ZONE:
+        if y < m.top_zone:
             # Very top = always snap layouts menu
-            if y < 40:
+            if y < m.top_strip:
                 return 'top'
             # Corners in the 40-100px range
-            if x < CORNER_TRIGGER_ZONE:
+            if x < m.corner_left:
                 return 'topleft'
-            elif x > self.screen_width - CORNER_TRIGGER_ZONE:
+            elif x > m.corner_right:
                 return 'topright'
             else:
                 return 'top'
         
         # Bottom corners
-        if y > self.screen_height - CORNER_TRIGGER_ZONE:
-            if x < CORNER_TRIGGER_ZONE:
+        if y > m.bottom_corner:
+            if x < m.corner_left:
                 return 'bottomleft'
-            elif x > self.screen_width - CORNER_TRIGGER_ZONE:
+            elif x > m.corner_right:
                 return 'bottomright'
         
-        # Side edges
-        if x < EDGE_TRIGGER_ZONE:
+        # Side edges (inner edges between monitors included)
+        if x < m.left_edge:
             return 'left'
-        elif x > self.screen_width - EDGE_TRIGGER_ZONE:
+        elif x > m.right_edge:
             return 'right'
         
         return None
@@ -175,39 +477,69 @@ class SnapDetector:
         if not self.zone_activated:
             return actual_zone
         
+        # Hysteresis only holds on the monitor the zone was activated on
+        m = self.zone_monitor
+        if m is None or self.monitor_index.find(x, y) is not m:
+            return actual_zone
+        
         # If we have an active zone, check if we're still "close enough" to it
         # Use larger hysteresis for top zone since the popup is more important
         if self.current_zone == 'top':
-            if y < TOP_TRIGGER_ZONE + TOP_HYSTERESIS_PIXELS:
+            if y < m.top_zone + TOP_HYSTERESIS_PIXELS:
                 return 'top'  # Still counts as top
         elif self.current_zone == 'left':
-            if x < EDGE_TRIGGER_ZONE + HYSTERESIS_PIXELS:
+            if x < m.left_edge + HYSTERESIS_PIXELS:
                 return 'left'
         elif self.current_zone == 'right':
-            if x > self.screen_width - EDGE_TRIGGER_ZONE - HYSTERESIS_PIXELS:
+            if x > m.right_edge - HYSTERESIS_PIXELS:
                 return 'right'
         elif self.current_zone in ('topleft', 'topright', 'bottomleft', 'bottomright'):
             # For corners, check both x and y
-            if y < TOP_TRIGGER_ZONE + HYSTERESIS_PIXELS or y > self.screen_height - CORNER_TRIGGER_ZONE - HYSTERESIS_PIXELS:
-                if x < CORNER_TRIGGER_ZONE + HYSTERESIS_PIXELS or x > self.screen_width - CORNER_TRIGGER_ZONE - HYSTERESIS_PIXELS:
+            if y < m.top_zone + HYSTERESIS_PIXELS or y > m.bottom_corner - HYSTERESIS_PIXELS:
+                if x < m.corner_left + HYSTERESIS_PIXELS or x > m.corner_right - HYSTERESIS_PIXELS:
                     return self.current_zone
         
         return actual_zone
     
+    def encode(self, event_data):
+        """Event dict -> bytes in the output format"""
+        return encode_event(event_data, self.output_format)
+    
+    def write_event(self, event_data):
+        data = self.encode(event_data)
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        self.events_out += 1
+        self.bytes_out += len(data)
+    
     def emit(self, event_data):
-        """Output a JSON event to stdout"""
-        print(json.dumps(event_data), flush=True)
+        """Output an event to stdout (any held-back drag_position goes first)"""
+        if self.pending_position:
+            self.write_position(*self.pending_position)
+        self.write_event(event_data)
+    
+    def write_position(self, x, y, xid):
+        self.pending_position = None
+        self.last_position = (x, y)
+        self.last_position_time = self.clock()
+        self.write_event({'event': 'drag_position', 'x': x, 'y': y, 'xid': xid})
+    
+    def emit_position(self, x, y, xid):
+        """drag_position, minus repeats of the last one sent and capped at --max-motion-hz"""
+        if (x, y) == self.last_position:
+            self.pending_position = None
+        elif self.motion_interval and self.clock() - self.last_position_time < self.motion_interval:
+            self.pending_position = (x, y, xid)  # sent by a later poll (see next_deadline) or event
+        else:
+            self.write_position(x, y, xid)
     
     def poll(self):
         """Single poll iteration - check mouse state and emit events"""
         try:
-            result = self.root.query_pointer()
+            x, y, mask = self.query_pointer()
+            button1_held = self.is_button1_pressed(mask)
             
-            x = result.root_x
-            y = result.root_y
-            button1_held = self.is_button1_pressed(result.mask)
-            
-            now = time.time() * 1000
+            now = self.clock() * 1000
             
             # === BUTTON PRESSED ===
             if button1_held:
@@ -217,10 +549,12 @@ class SnapDetector:
                     
                     # Check if it's a protected window
                     if active_xid and active_xid not in self.protected_xids:
+                        self.check_workarea()
                         self.is_dragging = True
                         self.drag_confirmed = False  # NOT confirmed until window moves
                         self.drag_xid = active_xid  # LOCKED for entire drag
                         self.drag_start_time = now
+                        self.drag_frame = None  # frames can change between drags
                         self.initial_window_pos = self.get_window_position(active_xid)
                         self.current_zone = None
                         self.zone_enter_time = 0
@@ -311,12 +645,14 @@ class SnapDetector:
                                 if time_since_leave < REENTER_GRACE_MS:
                                     # Immediate re-activation! No hold time needed.
                                     self.zone_activated = True
+                                    self.zone_monitor = self.monitor_index.find(x, y)
                                     self.emit({
                                         'event': 'zone_enter',
                                         'zone': zone,
                                         'x': x,
                                         'y': y,
-                                        'xid': hex(self.drag_xid) if self.drag_xid else None
+                                        'xid': hex(self.drag_xid) if self.drag_xid else None,
+                                        'monitor': self.zone_monitor.area
                                     })
                                     self.log(f"Zone RE-ACTIVATED (grace period): {zone}")
                             
@@ -339,30 +675,29 @@ class SnapDetector:
                     
                     if hold_time >= required_hold:
                         self.zone_activated = True
+                        self.zone_enter_lateness.append(hold_time - required_hold)
+                        self.zone_monitor = self.monitor_index.find(x, y)
                         self.emit({
                             'event': 'zone_enter',
                             'zone': zone,
                             'x': x,
                             'y': y,
-                            'xid': hex(self.drag_xid) if self.drag_xid else None
+                            'xid': hex(self.drag_xid) if self.drag_xid else None,
+                            'monitor': self.zone_monitor.area
                         })
                         self.log(f"Zone activated: {zone}")
                 
                 # Stream mouse position while top popup is active (even if outside top zone)
                 # This allows the popup to update highlighting based on mouse position
                 if self.last_activated_zone == 'top' or (self.current_zone == 'top' and self.zone_activated):
-                    self.emit({
-                        'event': 'drag_position',
-                        'x': x,
-                        'y': y,
-                        'xid': hex(self.drag_xid) if self.drag_xid else None
-                    })
+                    self.emit_position(x, y, hex(self.drag_xid) if self.drag_xid else None)
             
             # === BUTTON RELEASED ===
             elif self.is_dragging:
                 zone = self.current_zone
                 xid = self.drag_xid
                 activated = self.zone_activated
+                zone_monitor = self.zone_monitor
                 sticky_top_popup = self.last_activated_zone == 'top'
                 was_confirmed = self.drag_confirmed  # Was this an actual drag?
                 
@@ -372,11 +707,14 @@ class SnapDetector:
                 self.drag_xid = None
                 self.drag_start_time = 0
                 self.initial_window_pos = None
+                self.drag_frame = None
                 self.current_zone = None
                 self.zone_enter_time = 0
                 self.zone_activated = False
+                self.zone_monitor = None
                 self.last_activated_zone = None  # Clear sticky state
                 self.last_zone_leave_time = 0
+                self.last_position = None
                 
                 # If drag was never confirmed (window didn't move), silently ignore
                 # This is the key fix for scrollbar/text selection interactions
@@ -385,9 +723,7 @@ class SnapDetector:
                     return
                 
                 # Query current mouse position for popup hit detection
-                result = self.root.query_pointer()
-                final_x = result.root_x
-                final_y = result.root_y
+                final_x, final_y, _ = self.query_pointer()
                 
                 # If we had a sticky top popup, emit zone_leave now (it was deferred)
                 if sticky_top_popup:
@@ -396,14 +732,15 @@ class SnapDetector:
                     
                     # Check if mouse is at top of screen (user wants to snap)
                     # or on the popup window (handled by main.cjs)
-                    if final_y < TOP_TRIGGER_ZONE or (zone == 'top' and activated):
+                    if final_y < self.monitor_index.find(final_x, final_y).top_zone or (zone == 'top' and activated):
                         # Apply snap with zone='top' - main.cjs will check popup buttons
                         self.emit({
                             'event': 'snap_apply',
                             'zone': 'top',
                             'x': final_x,
                             'y': final_y,
-                            'xid': hex(xid) if xid else None
+                            'xid': hex(xid) if xid else None,
+                            'monitor': self.monitor_area(final_x, final_y)
                         })
                         self.log(f"Snap apply (sticky): top at ({final_x}, {final_y}) to {hex(xid) if xid else 'unknown'}")
                     else:
@@ -416,7 +753,8 @@ class SnapDetector:
                         'zone': zone,
                         'x': final_x,
                         'y': final_y,
-                        'xid': hex(xid) if xid else None
+                        'xid': hex(xid) if xid else None,
+                        'monitor': zone_monitor.area if zone_monitor else self.monitor_area(final_x, final_y)
                     })
                     self.log(f"Snap apply: {zone} at ({final_x}, {final_y}) to {hex(xid) if xid else 'unknown'}")
                 else:
@@ -427,16 +765,257 @@ class SnapDetector:
             self.emit({'event': 'error', 'message': str(e)})
             self.log(f"Error: {e}")
     
-    def run(self):
+    def select_raw_events(self, motion=False):
+        """
+        Subscribe to XI2 raw button events (and raw motion if motion) on the
+        root window. Returns False (caller falls back to polling) if XI 2.1+
+        is missing.
+        """
+        if self.raw_motion_selected is not None:
+            if motion != self.raw_motion_selected:
+                mask = xinput.RawButtonPressMask | xinput.RawButtonReleaseMask
+                if motion:
+                    mask |= xinput.RawMotionMask
+                self.root.xinput_select_events([(xinput.AllMasterDevices, mask)])
+                self.display.flush()
+                self.raw_motion_selected = motion
+            return True
+        if xinput is None:
+            self.log("python-xlib has no XInput support")
+            return False
+        try:
+            if not self.display.has_extension('XInputExtension'):
+                self.log("XInputExtension not available")
+                return False
+            # Announce 2.2 ourselves: python-xlib's query_version asks for 2.0,
+            # and the server would then withhold raw events during grabs
+            reply = xinput.XIQueryVersion(
+                display=self.display.display,
+                opcode=self.display.get_extension_major(xinput.extname),
+                major_version=2,
+                minor_version=2,
+            )
+            version = (reply.major_version, reply.minor_version)
+            if version < XI2_MIN_VERSION:
+                self.log(f"XInput {version[0]}.{version[1]} too old for raw events during grabs")
+                return False
+            self.raw_motion_selected = not motion
+            self.select_raw_events(motion)
+            self.display.sync()
+            self.log(f"XInput {version[0]}.{version[1]}: waiting for raw button events (motion while dragging)")
+            return True
+        except Exception as e:
+            self.log(f"XI2 setup failed: {e}")
+            return False
+    
+    def wait_for_input(self, timeout):
+        """
+        Sleep until X events arrive or timeout seconds pass (None = no limit).
+        Drains the queued events: raw input only matters as a wakeup (poll()
+        reads the pointer itself), others go to handle_x_event. Returns True
+        if input arrived.
+        """
+        if not self.display.pending_events():
+            readable, _, _ = select.select([self.display.fileno()], [], [], timeout)
+            if not readable:
+                return False
+        got_input = False
+        while self.display.pending_events():
+            event = self.display.next_event()
+            if ge is not None and event.type == ge.GenericEventCode:
+                got_input = True
+            else:
+                self.handle_x_event(event)
+        return got_input
+    
+    def next_deadline(self):
+        """
+        Monotonic ms time of the state machine's next timer (movement check,
+        zone hold, re-entry grace), or None if none is pending.
+        """
+        if not self.is_dragging:
+            return None
+        # (pending_position is the rate cap's, all others are the state machine's)
+        deadlines = []
+        if not self.drag_confirmed:
+            deadlines += [self.drag_start_time + MOVEMENT_CHECK_DELAY_MS,
+                          self.drag_start_time + MOVEMENT_CHECK_DELAY_MS * 3]
+        if self.current_zone and not self.zone_activated and self.zone_enter_time > 0 \
+                and self.last_activated_zone != 'top':
+            required_hold = HOLD_TIME_TOP_MS if self.current_zone == 'top' else HOLD_TIME_EDGE_MS
+            deadlines.append(self.zone_enter_time + required_hold)
+        if self.last_activated_zone and self.last_zone_leave_time:
+            deadlines.append(self.last_zone_leave_time + REENTER_GRACE_MS)
+        if self.pending_position:
+            deadlines.append((self.last_position_time + self.motion_interval) * 1000)
+        now = self.clock() * 1000
+        future = [deadline for deadline in deadlines if deadline > now]
+        return min(future) if future else None
+    
+    def poll_delay(self, event_driven, scheduler='adaptive'):
+        """
+        Seconds to sleep before the next poll (None = until input arrives).
+        
+        fixed:    POLL_INTERVAL_MS (event-driven: only while tracking a drag)
+        adaptive: button up -> IDLE_POLL_INTERVAL_MS (event-driven: no polls);
+                  tracking a drag -> POLL_INTERVAL_MS, cut short to land on the
+                  next deadline; event-driven once confirmed, motion drives the
+                  polls and only deadlines need a timed wakeup
+        """
+        if scheduler == 'fixed':
+            if event_driven and not self.is_dragging:
+                return None
+            return POLL_INTERVAL_MS / 1000.0
+        if not self.is_dragging:
+            return None if event_driven else IDLE_POLL_INTERVAL_MS / 1000.0
+        deadline = self.next_deadline()
+        # Land just past the deadline: waking exactly on it can leave poll()'s
+        # hold_time a rounding error short, after next_deadline() dropped it
+        until_deadline = None
+        if deadline is not None:
+            until_deadline = max(0.0, deadline / 1000.0 - self.clock()) + DEADLINE_SLACK_MS / 1000.0
+        if event_driven and self.drag_confirmed:
+            return until_deadline
+        interval = POLL_INTERVAL_MS / 1000.0
+        return interval if until_deadline is None else min(interval, until_deadline)
+    
+    def log_stats(self):
+        """Log wakeups per second and CPU use since the last call"""
+        now = time.monotonic()
+        cpu = time.process_time()
+        elapsed = max(now - self.stats_started, 1e-9)
+        self.log(f"Stats ({self.backend}): {self.wakeups} wakeups in {elapsed:.1f}s "
+                 f"({self.wakeups / elapsed:.2f}/s, {self.input_wakeups} on input), "
+                 f"CPU {(cpu - self.cpu_started) * 1000:.0f}ms ({(cpu - self.cpu_started) / elapsed * 100:.2f}%), "
+                 f"poll {self.poll_seconds / max(self.wakeups, 1) * 1000:.2f}ms avg / {self.poll_max * 1000:.2f}ms max, "
+                 f"{self.geometry_queries} geometry round trips, "
+                 f"{self.events_out} events / {self.bytes_out} bytes out ({self.output_format})")
+        if self.zone_enter_lateness:
+            lateness = self.zone_enter_lateness
+            self.log(f"Stats ({self.backend}): {len(lateness)} zone_enter, "
+                     f"{sum(lateness) / len(lateness):.1f}ms avg / {max(lateness):.1f}ms max after the hold time")
+        self.zone_enter_lateness = []
+        self.wakeups = 0
+        self.input_wakeups = 0
+        self.poll_seconds = 0.0
+        self.poll_max = 0.0
+        self.geometry_queries = 0
+        self.events_out = 0
+        self.bytes_out = 0
+        self.stats_started = now
+        self.cpu_started = cpu
+    
+    def run(self, backend='auto', stats_interval=None, scheduler='adaptive'):
         """Main loop"""
-        self.log(f"Started v4 (anti-flicker + grace period). Screen: {self.screen_width}x{self.screen_height}")
+        self.log(f"Started v4 (anti-flicker + grace period). Screen: {self.screen_width}x{self.screen_height}, "
+                 f"{len(self.monitor_index.monitors)} monitor(s)")
         self.log(f"Top zone: {TOP_TRIGGER_ZONE}px, Hold time: {HOLD_TIME_TOP_MS}ms, Hysteresis: {HYSTERESIS_PIXELS}px (top: {TOP_HYSTERESIS_PIXELS}px)")
         self.log(f"Re-entry grace period: {REENTER_GRACE_MS}ms")
         self.log(f"Protected XIDs: {[hex(x) for x in self.protected_xids]}")
         
+        self.backend = 'poll'
+        if backend != 'poll':
+            if self.select_raw_events():
+                self.backend = 'xi2'
+            elif backend == 'xi2':
+                self.log("XI2 unavailable, falling back to polling")
+        self.log(f"Backend: {self.backend}, scheduler: {scheduler}")
+        self.loop(self.backend == 'xi2', scheduler, stats_interval)
+    
+    def loop(self, event_driven, scheduler='adaptive', stats_interval=None, sleep=None, wait=None):
+        """
+        Poll until stop(). Time only passes through self.clock, sleep(seconds)
+        (default time.sleep) and wait(timeout) -> True if input arrived
+        (default wait_for_input), so a replay can drive this loop in virtual time.
+        """
+        sleep = sleep or time.sleep
+        wait = wait or self.wait_for_input
+        next_stats = self.clock() + stats_interval if stats_interval else None
+        last_poll = 0.0
         while self.running:
+            # Idle with XI2: sleep until a button event. Tracking a drag: motion
+            # wakes too, plus timed wakeups from the scheduler (see poll_delay)
+            timeout = self.poll_delay(event_driven, scheduler)
+            if next_stats is not None:
+                until_stats = max(0.0, next_stats - self.clock())
+                timeout = until_stats if timeout is None else min(timeout, until_stats)
+            if event_driven:
+                if self.is_dragging:
+                    spacing = XI2_MIN_POLL_MS / 1000.0 - (self.clock() - last_poll)
+                    if spacing > 0:
+                        sleep(spacing)
+                        timeout = None if timeout is None else max(0.0, timeout - spacing)
+                if wait(timeout):
+                    self.input_wakeups += 1
+                    if not self.is_dragging:
+                        sleep(XI2_PRESS_SETTLE_MS / 1000.0)
+            else:
+                sleep(timeout)
+                self.drain_events()
+            if not self.running:
+                break
+            if self.monitors_stale:
+                self.rebuild_monitors()
+            self.wakeups += 1
+            last_poll = self.clock()
             self.poll()
-            time.sleep(POLL_INTERVAL_MS / 1000.0)
+            poll_time = self.clock() - last_poll
+            self.poll_seconds += poll_time
+            self.poll_max = max(self.poll_max, poll_time)
+            if event_driven:
+                self.select_raw_events(motion=self.is_dragging)
+            if next_stats is not None and self.clock() >= next_stats:
+                self.log_stats()
+                next_stats = self.clock() + stats_interval
+    
+    def sample(self):
+        """
+        One trace sample: pointer and button mask, plus the active window and
+        its frame position while button 1 is held (what poll() can ask for)
+        """
+        x, y, mask = self.query_pointer()
+        xid = position = None
+        if self.is_button1_pressed(mask):
+            xid = self.get_active_window_xid()
+            if xid:
+                position = self.get_window_position(xid)
+        return {'x': x, 'y': y, 'mask': mask, 'xid': xid, 'window': list(position) if position else None}
+    
+    def monitors_record(self):
+        """Trace record for the current monitor table"""
+        return {
+            't': self.clock(),
+            'monitors': [{'name': m.name, 'x': m.x, 'y': m.y, 'width': m.width, 'height': m.height, 'area': m.area}
+                         for m in self.monitor_index.monitors],
+            'screen': [self.screen_width, self.screen_height],
+            'protected': [hex(xid) for xid in sorted(self.protected_xids)],
+        }
+    
+    def record(self, path, interval_ms):
+        """
+        Write a replay trace instead of detecting: a monitors record, then a
+        sample every interval_ms (only when it changed), with monotonic times
+        """
+        self.log(f"Recording to {path} every {interval_ms:g}ms (Ctrl+C to stop)")
+        samples = 0
+        with open(path, 'w') as trace:
+            trace.write(json.dumps(self.monitors_record()) + '\n')
+            last = None
+            while self.running:
+                self.drain_events()
+                if self.monitors_stale:
+                    self.rebuild_monitors()
+                    trace.write(json.dumps(self.monitors_record()) + '\n')
+                sample = self.sample()
+                # Work area changes are only looked for at drag start, as poll() does
+                if sample['xid'] and not (last and last['xid']) and self.check_workarea():
+                    trace.write(json.dumps(self.monitors_record()) + '\n')
+                if sample != last:
+                    trace.write(json.dumps(dict(sample, t=self.clock())) + '\n')
+                    samples += 1
+                    last = sample
+                time.sleep(interval_ms / 1000.0)
+            self.log(f"Recorded {samples} samples")
     
     def stop(self):
         """Stop the detector gracefully"""
@@ -447,20 +1026,50 @@ def main():
     parser = argparse.ArgumentParser(description='X11 Snap Layout Detector v4 (Anti-Flicker + Grace Period)')
     parser.add_argument('--protected', nargs='*', default=[], 
                         help='Protected window XIDs to ignore (hex, e.g., 0x1a00003)')
+    parser.add_argument('--backend', choices=['auto', 'xi2', 'poll'], default='auto',
+                        help='Pointer tracking: XI2 raw events (auto: when available) or fixed-rate polling')
+    parser.add_argument('--scheduler', choices=['adaptive', 'fixed'], default='adaptive',
+                        help='Poll timing: adaptive (slow when idle, on hold deadlines while dragging) or fixed 25ms')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                        help='Event output: JSON lines or fixed-size binary records (see module docstring)')
+    parser.add_argument('--max-motion-hz', type=float, default=MAX_MOTION_HZ,
+                        help=f'Cap on drag_position events per second (default {MAX_MOTION_HZ}, 0 = no cap)')
+    parser.add_argument('--stats', type=float, metavar='SECONDS',
+                        help='Log wakeups per second, CPU use and zone_enter latency every SECONDS (and on exit)')
+    parser.add_argument('--record', metavar='TRACE',
+                        help='Record pointer/button/window samples to TRACE (JSON lines) instead of detecting')
+    parser.add_argument('--record-interval', type=float, default=5, metavar='MS',
+                        help='Sampling interval for --record (default 5ms)')
     args = parser.parse_args()
     
-    detector = SnapDetector(protected_xids=args.protected)
+    if display is None:
+        exit_with_error("python3-xlib not installed. Run: sudo apt install python3-xlib", args.format)
+    try:
+        detector = SnapDetector(protected_xids=args.protected)
+    except Exception as e:
+        exit_with_error(f"Couldn't connect to the X server: {e}", args.format)
+    detector.output_format = args.format
+    detector.motion_interval = 1.0 / args.max_motion_hz if args.max_motion_hz > 0 else 0.0
     
     def signal_handler(sig, frame):
+        if args.record:
+            detector.stop()  # record() finishes the trace and returns
+            return
         detector.log("Shutting down...")
+        if args.stats:
+            detector.log_stats()
         detector.stop()
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    if args.record:
+        detector.record(args.record, args.record_interval)
+        return
+    
     try:
-        detector.run()
+        detector.run(backend=args.backend, stats_interval=args.stats, scheduler=args.scheduler)
     except KeyboardInterrupt:
         detector.stop()
 
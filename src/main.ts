@@ -274,6 +274,7 @@ declare global {
       ttsGetDefaults?: () => Promise<Record<string, unknown>>;
       ttsRecheckEffects?: () => Promise<{ success: boolean; effectsAvailable: boolean }>;
       onTtsProgress?: (callback: (progress: { current: number; total: number; text: string }) => void) => () => void;
+      onTtsPlayback?: (callback: (playback: { text: string; startedAt: number; envelope: { frameMs: number; sampleRate: number; frames: number; rms: number[]; peak: number[] } | null }) => void) => () => void;
 
     };
   }